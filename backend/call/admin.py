@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CallGroup, Call, Contact, CallGroupAgent, CallGroupContact, ContactProduct, Agent
+from .models import CallGroup, Call, Contact, CallGroupAgent, CallGroupContact, ContactProduct, Agent, ImportJob, DailyCallRollup
 
 admin.site.register(CallGroup)
 admin.site.register(Call)
@@ -7,4 +7,6 @@ admin.site.register(Contact)
 admin.site.register(CallGroupAgent)
 admin.site.register(CallGroupContact)
 admin.site.register(Agent)
-admin.site.register(ContactProduct)
\ No newline at end of file
+admin.site.register(ContactProduct)
+admin.site.register(ImportJob)
+admin.site.register(DailyCallRollup)
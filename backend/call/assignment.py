@@ -0,0 +1,109 @@
+import logging
+from collections import Counter
+
+from django.db import transaction
+
+from .models import CallGroupContact, ContactProduct
+
+logger = logging.getLogger(__name__)
+
+ASSIGNMENT_CHUNK_SIZE = 2000
+
+
+def select_contact_products(institution, product=None, statuses=None, contact_product_ids=None):
+    """``ContactProduct`` rows of ``institution`` matching every selector that was given."""
+    contact_products = ContactProduct.objects.filter(product__institution=institution)
+    if product is not None:
+        contact_products = contact_products.filter(product=product)
+    if statuses:
+        contact_products = contact_products.filter(contact__status__in=statuses)
+    if contact_product_ids is not None:
+        contact_products = contact_products.filter(pk__in=contact_product_ids)
+    return contact_products
+
+
+def weighted_round_robin(keys, weights):
+    """
+    Yield ``keys`` forever, each in proportion to its weight.
+
+    Uses smooth weighted round robin, so with weights 2 and 1 the sequence
+    is a, b, a, a, b, a... rather than a, a, b: every prefix of the
+    sequence is as close to the requested split as it can be, which keeps
+    groups balanced however many contacts turn out to match.
+    """
+    total = sum(weights)
+    current = [0] * len(keys)
+    while True:
+        for index, weight in enumerate(weights):
+            current[index] += weight
+        chosen = max(range(len(keys)), key=current.__getitem__)
+        current[chosen] -= total
+        yield keys[chosen]
+
+
+def assign_contacts(contact_products, call_groups, weights=None, chunk_size=ASSIGNMENT_CHUNK_SIZE):
+    """
+    Add the selected contacts to ``call_groups``, split evenly or by ``weights``.
+
+    Contacts that are already a member of any of the target groups are
+    left where they are. The remaining ids are read in primary key order,
+    one keyset page at a time, and written with one
+    ``bulk_create(ignore_conflicts=True)`` per page in its own transaction,
+    so a large campaign never holds a long lock and a membership created
+    concurrently by another request is skipped instead of failing the
+    batch.
+
+    Returns ``{call_group_pk: memberships created}``, counting only the
+    rows this call inserted.
+    """
+    weights = list(weights) if weights else [1] * len(call_groups)
+    if len(weights) != len(call_groups):
+        raise ValueError("Give one weight per call group")
+    if any(weight <= 0 for weight in weights):
+        raise ValueError("Weights must be positive")
+
+    group_ids = [group.pk for group in call_groups]
+    created = Counter({group_id: 0 for group_id in group_ids})
+    pending = contact_products.order_by('pk').values_list('pk', flat=True)
+    targets = weighted_round_robin(group_ids, weights)
+    last_id = None
+    while True:
+        page = pending if last_id is None else pending.filter(pk__gt=last_id)
+        ids = list(page[:chunk_size])
+        if not ids:
+            break
+        created.update(_assign_page(ids, set(group_ids), targets))
+        last_id = ids[-1]
+
+    created = dict(created)
+    logger.info("Assigned %s contacts across call groups %s", sum(created.values()), created)
+    return created
+
+
+def _assign_page(ids, target_ids, targets):
+    """Add the contacts of ``ids`` not yet in a target group; returns the rows inserted per group."""
+    with transaction.atomic():
+        # Probe the page's ids on the contact index alone; an anti-join, or
+        # a filter on call_group as well, lets the planner walk the whole
+        # group instead, which gets slower as the group fills up.
+        assigned = {
+            contact_id
+            for contact_id, call_group_id in CallGroupContact.objects.filter(contact_id__in=ids).values_list(
+                'contact_id', 'call_group_id'
+            )
+            if call_group_id in target_ids
+        }
+        memberships = [
+            CallGroupContact(call_group_id=next(targets), contact_id=contact_id)
+            for contact_id in ids
+            if contact_id not in assigned
+        ]
+        if not memberships:
+            return Counter()
+        CallGroupContact.objects.bulk_create(memberships, ignore_conflicts=True)
+        # Primary keys are generated here, so the rows carrying them are
+        # exactly the ones this page inserted; conflicts were skipped.
+        return Counter(
+            CallGroupContact.objects.filter(pk__in=[membership.pk for membership in memberships])
+            .values_list('call_group_id', flat=True)
+        )
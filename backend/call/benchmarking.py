@@ -0,0 +1,46 @@
+import time
+import uuid as uuid_module
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from institution.models import Institution, Product
+from users.models import CustomUser
+
+
+@contextmanager
+def scratch_product(feedback_fields=None):
+    """
+    Yield a throwaway institution product for benchmark commands.
+
+    Everything created inside the block is rolled back on exit so the
+    benchmarks can run against a real database without leaving data behind.
+    """
+    suffix = uuid_module.uuid4().hex[:8]
+    with transaction.atomic():
+        owner = CustomUser.objects.create_user(
+            email=f"benchmark-{suffix}@example.com", fullname="Benchmark Owner"
+        )
+        institution = Institution.objects.create(
+            institution_owner=owner, institution_name=f"Benchmark {suffix}", created_by=owner
+        )
+        product = Product.objects.create(
+            institution=institution, name=f"Benchmark {suffix}", feedback_fields=feedback_fields or []
+        )
+        yield product
+        transaction.set_rollback(True)
+
+
+@contextmanager
+def rolled_back():
+    """Run a block inside a savepoint that is always discarded."""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def timed(func, *args, **kwargs):
+    """Call ``func`` and return ``(result, elapsed_seconds)``."""
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
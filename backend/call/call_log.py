@@ -0,0 +1,138 @@
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .feedback import product_feedback_schema
+from .models import Call, CallGroupContact, ContactProduct
+from .rollups import record_calls
+
+logger = logging.getLogger(__name__)
+
+MAX_CALL_BATCH_SIZE = 500
+
+
+def _first_error(detail):
+    if isinstance(detail, (list, tuple)):
+        return str(detail[0]) if detail else ""
+    return str(detail)
+
+
+def _made_by(call_group_agents, contact_ids):
+    """
+    Map ContactProduct id to the caller's ``CallGroupAgent`` that reached it.
+
+    A contact can sit in several of the caller's groups; the group where
+    the caller holds the dialer claim wins, otherwise the first group.
+    """
+    agents = {agent.call_group_id: agent for agent in call_group_agents}
+    made_by = {}
+    memberships = CallGroupContact.objects.filter(
+        contact_id__in=contact_ids, call_group_id__in=list(agents)
+    ).values_list('contact_id', 'call_group_id', 'claimed_by_id').order_by('call_group_id')
+    for contact_id, call_group_id, claimed_by_id in memberships:
+        agent = agents[call_group_id]
+        if contact_id not in made_by or claimed_by_id == agent.pk:
+            made_by[contact_id] = agent
+    return made_by
+
+
+def log_call_batch(items, institution_id, call_group_agents):
+    """
+    Record a batch of calls logged offline by one agent, once per idempotency key.
+
+    ``items`` are validated ``CallLogItemSerializer`` data, or the
+    serializer errors of an item that failed, keyed ``'errors'``. Contacts,
+    known keys and the agent's memberships are each read with one query
+    for the whole batch, feedback is checked with the cached product
+    schema and the new calls go in with one ``bulk_create``. The unique
+    constraint on ``Call.idempotency_key`` turns a replay, or a retry that
+    races the first attempt, into a ``duplicate`` result instead of a
+    second call.
+
+    Returns one result per item, in order: ``{'idempotency_key', 'status',
+    'uuid'}`` with status ``created`` or ``duplicate``, or ``{'status':
+    'invalid', 'errors'}``.
+    """
+    results = [None] * len(items)
+    pending = []
+    for index, item in enumerate(items):
+        if 'errors' in item:
+            results[index] = {'idempotency_key': item.get('idempotency_key'), 'status': 'invalid', 'errors': item['errors']}
+        else:
+            pending.append((index, item))
+
+    contacts = {
+        contact.uuid: contact
+        for contact in ContactProduct.objects.filter(
+            uuid__in={item['contact'] for _, item in pending}, product__institution_id=institution_id
+        ).select_related('product')
+    }
+    known = dict(
+        Call.objects.filter(idempotency_key__in=[item['idempotency_key'] for _, item in pending])
+        .values_list('idempotency_key', 'uuid')
+    )
+    made_by = _made_by(call_group_agents, [contact.pk for contact in contacts.values()])
+
+    now = timezone.now()
+    calls = []
+    for index, item in pending:
+        key = item['idempotency_key']
+        if key in known:
+            results[index] = {'idempotency_key': str(key), 'status': 'duplicate', 'uuid': str(known[key])}
+            continue
+        contact = contacts.get(item['contact'])
+        if contact is None:
+            results[index] = {
+                'idempotency_key': str(key),
+                'status': 'invalid',
+                'errors': {'contact': ['ContactProduct not found in this institution.']},
+            }
+            continue
+        try:
+            product_feedback_schema(contact.product).validate(item['feedback'])
+        except serializers.ValidationError as exc:
+            results[index] = {
+                'idempotency_key': str(key),
+                'status': 'invalid',
+                'errors': {'feedback': [_first_error(exc.detail)]},
+            }
+            continue
+        call = Call(
+            contact=contact,
+            institution_id=contact.product.institution_id,
+            product=contact.product,
+            feedback=item['feedback'],
+            status=item['status'],
+            made_by=made_by.get(contact.pk),
+            made_on=item.get('made_on') or now,
+            idempotency_key=key,
+        )
+        # A key repeated inside the batch is a replay of the earlier item
+        known[key] = call.uuid
+        calls.append((index, call))
+        results[index] = {'idempotency_key': str(key), 'status': 'created', 'uuid': str(call.uuid)}
+
+    created = []
+    if calls:
+        with transaction.atomic():
+            Call.objects.bulk_create([call for _, call in calls], ignore_conflicts=True)
+            stored = {
+                str(key): uuid
+                for key, uuid in Call.objects.filter(
+                    idempotency_key__in=[call.idempotency_key for _, call in calls]
+                ).values_list('idempotency_key', 'uuid')
+            }
+            created = [call for _, call in calls if stored.get(str(call.idempotency_key)) == call.uuid]
+            # bulk_create skips the post_save signal that keeps rollups current
+            record_calls(created)
+        for index, call in calls:
+            if stored[str(call.idempotency_key)] != call.uuid:
+                # A concurrent replay stored this key first
+                results[index]['status'] = 'duplicate'
+        for result in results:
+            if result['status'] == 'duplicate' and result['idempotency_key'] in stored:
+                result['uuid'] = str(stored[result['idempotency_key']])
+    logger.info("Logged %s of %s offline calls", len(created), len(items))
+    return results
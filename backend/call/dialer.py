@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CLAIMABLE_CONTACT_STATUSES, CallGroupContact
+
+DEFAULT_LEASE_SECONDS = 300
+MAX_LEASE_SECONDS = 3600
+CLAIM_ATTEMPTS = 5
+
+
+def _unclaimed(now):
+    return Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=now)
+
+
+def _next_candidate(memberships, now):
+    # Never-claimed rows and previously claimed rows are read separately:
+    # databases disagree on where NULLs sort, and each query walks
+    # callgroupcontact_claim_idx in order on both backends.
+    free = memberships.select_for_update(skip_locked=True).filter(
+        _unclaimed(now), status__in=CLAIMABLE_CONTACT_STATUSES
+    )
+    return (
+        free.filter(claimed_at__isnull=True).order_by('uuid').first()
+        or free.filter(claimed_at__isnull=False).order_by('claimed_at', 'uuid').first()
+    )
+
+
+def claim_next_contact(call_group_agent, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Hand the next dialable membership of the agent's call group to that agent.
+
+    The candidate row is read with ``SELECT ... FOR UPDATE SKIP LOCKED`` so
+    agents claiming at the same moment each lock a different row instead of
+    queueing behind one another. The claim itself is a conditional UPDATE
+    that only succeeds while the lease is still free, which keeps claims
+    exclusive on databases without row locks (SQLite) as well.
+
+    Contacts never claimed come first, then the ones claimed longest ago;
+    expired leases are free again, so abandoned claims are picked up
+    automatically. An agent that already holds a live claim on a dialable
+    contact of the group gets it back with the lease extended. Returns
+    ``None`` when nothing is left to dial.
+    """
+    now = timezone.now()
+    expires = now + timedelta(seconds=lease_seconds)
+    memberships = CallGroupContact.objects.filter(call_group_id=call_group_agent.call_group_id)
+
+    with transaction.atomic():
+        held = memberships.filter(
+            claimed_by=call_group_agent, lease_expires_at__gt=now, status__in=CLAIMABLE_CONTACT_STATUSES
+        ).first()
+        if held is not None:
+            memberships.filter(pk=held.pk).update(lease_expires_at=expires)
+            held.lease_expires_at = expires
+            return held
+
+        for _ in range(CLAIM_ATTEMPTS):
+            candidate = _next_candidate(memberships, now)
+            if candidate is None:
+                return None
+            claimed = memberships.filter(_unclaimed(now), pk=candidate.pk).update(
+                claimed_by=call_group_agent, claimed_at=now, lease_expires_at=expires
+            )
+            if claimed:
+                candidate.claimed_by = call_group_agent
+                candidate.claimed_at = now
+                candidate.lease_expires_at = expires
+                return candidate
+    return None
+
+
+def release_contact(membership, call_group_agent, status=None):
+    """
+    Give up the agent's claim on ``membership``, optionally moving it to ``status``.
+
+    ``claimed_at`` is kept so a released contact goes to the back of the
+    queue. Returns ``False`` when the agent no longer held the claim.
+    """
+    updates = {'claimed_by': None, 'lease_expires_at': None}
+    if status:
+        updates['status'] = status
+    return bool(
+        CallGroupContact.objects.filter(pk=membership.pk, claimed_by=call_group_agent).update(**updates)
+    )
@@ -0,0 +1,191 @@
+import csv
+import tempfile
+from itertools import islice
+
+import xlsxwriter
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .models import Call, CallGroupContact, Contact, ContactProduct
+
+EXPORT_CHUNK_SIZE = 2000
+# Rows flipped to "exported" per UPDATE, kept under SQLite's bound parameter limit
+STATUS_UPDATE_BATCH_SIZE = 10000
+
+CONTACT_EXPORT_COLUMNS = [
+    ('contact_uuid', 'Contact UUID'),
+    ('name', 'Name'),
+    ('phone_number', 'Phone Number'),
+    ('country', 'Country'),
+    ('country_code', 'Country Code'),
+    ('contact_status', 'Contact Status'),
+    ('remarks', 'Remarks'),
+    ('contact_product_uuid', 'Contact Product UUID'),
+    ('product', 'Product'),
+    ('linked_on', 'Linked On'),
+    ('call_uuid', 'Call UUID'),
+    ('call_status', 'Call Status'),
+    ('made_on', 'Made On'),
+    ('made_by', 'Made By'),
+]
+
+
+class Echo:
+    """File-like object that hands back what is written, for streaming ``csv.writer`` output."""
+
+    def write(self, value):
+        return value
+
+
+class ContactExport:
+    """
+    Rows of contacts that are ready to export for one product.
+
+    Without a call group the selection is every contact of the product
+    whose own status is ``ready_to_export``; with one it is the group's
+    memberships in that status. Each call made to a contact becomes a row,
+    with the product's feedback fields flattened into one column each, and
+    contacts never called get a single row with empty call columns.
+    """
+
+    def __init__(self, product, call_group=None, chunk_size=EXPORT_CHUNK_SIZE):
+        self.product = product
+        self.call_group = call_group
+        self.chunk_size = chunk_size
+        self.feedback_fields = [field.get('name') for field in product.feedback_fields if field.get('name')]
+        self.exported_ids = []
+
+    @property
+    def headers(self):
+        return [label for _, label in CONTACT_EXPORT_COLUMNS] + self.feedback_fields
+
+    def _membership_queryset(self):
+        return CallGroupContact.objects.filter(
+            call_group=self.call_group, status='ready_to_export', contact__product=self.product
+        )
+
+    def _contact_product_queryset(self):
+        contact_products = ContactProduct.objects.filter(product=self.product)
+        if self.call_group is not None:
+            contact_products = contact_products.filter(
+                call_groups__call_group=self.call_group, call_groups__status='ready_to_export'
+            )
+        else:
+            contact_products = contact_products.filter(contact__status='ready_to_export')
+        calls = Call.objects.select_related('made_by__agent__user__user').order_by('made_on')
+        return (
+            contact_products
+            .select_related('contact')
+            .prefetch_related(Prefetch('calls', queryset=calls))
+            .order_by('created_at', 'pk')
+        )
+
+    def _feedback_value(self, value):
+        if isinstance(value, dict):
+            return value.get('file_url', '')
+        if isinstance(value, list):
+            return ', '.join(str(item) for item in value)
+        return '' if value is None else value
+
+    def _call_columns(self, call):
+        if call is None:
+            return ['', '', '', ''] + [''] * len(self.feedback_fields)
+        made_by = call.made_by.agent.user.user.fullname if call.made_by else ''
+        feedback = call.feedback or {}
+        return [
+            str(call.uuid),
+            call.status,
+            timezone.localtime(call.made_on).isoformat(),
+            made_by,
+        ] + [self._feedback_value(feedback.get(name)) for name in self.feedback_fields]
+
+    def rows(self):
+        """
+        Yield export rows straight off a server-side cursor.
+
+        ``iterator(chunk_size=...)`` keeps one chunk of contact products and
+        their prefetched calls in memory at a time.
+        """
+        for contact_product in self._contact_product_queryset().iterator(chunk_size=self.chunk_size):
+            contact = contact_product.contact
+            self.exported_ids.append(contact.pk if self.call_group is None else contact_product.pk)
+            contact_columns = [
+                str(contact.uuid),
+                contact.name,
+                contact.phone_number,
+                contact.country or '',
+                contact.country_code or '',
+                contact.status,
+                contact.remarks or '',
+                str(contact_product.uuid),
+                self.product.name,
+                timezone.localtime(contact_product.created_at).isoformat(),
+            ]
+            calls = list(contact_product.calls.all()) or [None]
+            for call in calls:
+                yield contact_columns + self._call_columns(call)
+
+    def mark_exported(self):
+        """Flip every row that went out to ``exported`` and return how many changed."""
+        if self.call_group is not None:
+            queryset, lookup = self._membership_queryset(), 'contact__in'
+        else:
+            queryset, lookup = Contact.objects.filter(status='ready_to_export'), 'pk__in'
+        updated = 0
+        for start in range(0, len(self.exported_ids), STATUS_UPDATE_BATCH_SIZE):
+            batch = self.exported_ids[start:start + STATUS_UPDATE_BATCH_SIZE]
+            updated += queryset.filter(**{lookup: batch}).update(status='exported')
+        self.exported_ids = []
+        return updated
+
+    def iter_csv(self):
+        """Yield CSV lines for the export and mark the rows exported once all are sent."""
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.headers)
+        for row in self.rows():
+            yield writer.writerow(row)
+        self.mark_exported()
+
+    def write_xlsx(self):
+        """
+        Write the export to a temporary XLSX file and return it rewound.
+
+        xlsxwriter's ``constant_memory`` mode flushes each row to disk as
+        soon as the next one starts, so memory stays flat however many
+        rows there are.
+        """
+        output = tempfile.TemporaryFile()
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+        worksheet = workbook.add_worksheet('Contacts')
+        header_format = workbook.add_format({'bold': True, 'font_color': '#FFFFFF', 'bg_color': '#366092'})
+        worksheet.write_row(0, 0, self.headers, header_format)
+        for row_number, row in enumerate(self.rows(), start=1):
+            worksheet.write_row(row_number, 0, row)
+        workbook.close()
+        self.mark_exported()
+        output.seek(0)
+        return output
+
+
+def streaming_content(iterator, request, batch_size=100):
+    """
+    Adapt a sync generator to the server in use.
+
+    Under ASGI Django would drain a sync iterator into a list before sending
+    anything, so there the generator is pulled ``batch_size`` items at a time
+    through ``sync_to_async``, which keeps it on the thread that owns the
+    database connection.
+    """
+    if not isinstance(getattr(request, '_request', request), ASGIRequest):
+        return iterator
+
+    next_batch = sync_to_async(lambda: list(islice(iterator, batch_size)), thread_sensitive=True)
+
+    async def stream():
+        while batch := await next_batch():
+            for part in batch:
+                yield part
+
+    return stream()
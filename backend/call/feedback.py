@@ -0,0 +1,223 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import date
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import validate_email
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+# Compiled schemas kept per process; products rarely change their fields.
+SCHEMA_CACHE_SIZE = 512
+FILE_SIZE_UNITS = {"KB": 1024, "MB": 1024 * 1024, "GB": 1024 * 1024 * 1024}
+OPTION_TYPES = ("select", "radio")
+TEXT_TYPES = ("text", "textarea")
+
+
+def parse_file_size(value):
+    """Turn a ``max_file_size`` such as ``"5MB"`` into bytes, or ``None`` when absent or unreadable."""
+    if not value:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    value = str(value).strip()
+    unit = value[-2:]
+    if unit not in FILE_SIZE_UNITS:
+        return None
+    try:
+        return int(float(value[:-2]) * FILE_SIZE_UNITS[unit])
+    except ValueError:
+        logger.warning("Ignoring unreadable max_file_size %r", value)
+        return None
+
+
+def _bound(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class FeedbackField:
+    """One entry of a product's ``feedback_fields`` with its limits parsed up front."""
+
+    def __init__(self, config):
+        self.name = config.get("name")
+        self.type = config.get("type")
+        self.is_required = bool(config.get("is_required", False))
+        self.options = config.get("options", [])
+        try:
+            self.option_set = frozenset(self.options)
+        except TypeError:
+            # Options given as objects; fall back to scanning the list
+            self.option_set = None
+        self.min_value = _bound(config.get("min_value"))
+        self.max_value = _bound(config.get("max_value"))
+        self.raw_min_value = config.get("min_value")
+        self.raw_max_value = config.get("max_value")
+        self.allowed_extensions = config.get("allowed_extensions") or []
+        self.extension_set = frozenset(ext.lower() for ext in self.allowed_extensions)
+        self.max_file_size = config.get("max_file_size")
+        self.max_file_bytes = parse_file_size(self.max_file_size)
+
+    @property
+    def is_file(self):
+        return self.type == "file"
+
+    def _contains(self, value):
+        if self.option_set is None:
+            return value in self.options
+        try:
+            return value in self.option_set
+        except TypeError:
+            return False
+
+    def validate(self, value):
+        name = self.name
+        if self.type == "number":
+            try:
+                number = float(value)
+            except (ValueError, TypeError):
+                raise serializers.ValidationError(f"Field '{name}' must be a valid number")
+            if self.min_value is not None and number < self.min_value:
+                raise serializers.ValidationError(f"Field '{name}' must be at least {self.raw_min_value}")
+            if self.max_value is not None and number > self.max_value:
+                raise serializers.ValidationError(f"Field '{name}' must be at most {self.raw_max_value}")
+        elif self.type == "email":
+            try:
+                validate_email(value)
+            except DjangoValidationError:
+                raise serializers.ValidationError(f"Field '{name}' must be a valid email")
+        elif self.type in OPTION_TYPES:
+            if not self._contains(value):
+                raise serializers.ValidationError(f"Field '{name}' must be one of: {self.options}")
+        elif self.type == "checkbox":
+            if not isinstance(value, list):
+                raise serializers.ValidationError(f"Field '{name}' must be a list")
+            for item in value:
+                if not self._contains(item):
+                    raise serializers.ValidationError(f"Field '{name}' contains invalid option: {item}")
+        elif self.type in TEXT_TYPES:
+            if isinstance(value, (dict, list)):
+                raise serializers.ValidationError(f"Field '{name}' must be text")
+        elif self.type == "date":
+            try:
+                date.fromisoformat(str(value)[:10])
+            except ValueError:
+                raise serializers.ValidationError(f"Field '{name}' must be a date in YYYY-MM-DD format")
+
+    def validate_file(self, file):
+        name = self.name
+        if self.extension_set:
+            extension = os.path.splitext(file.name)[1].lower().lstrip(".")
+            if extension not in self.extension_set:
+                raise serializers.ValidationError(
+                    f"File extension '{extension}' not allowed for '{name}'. Allowed: {self.allowed_extensions}"
+                )
+        if self.max_file_bytes is not None and file.size > self.max_file_bytes:
+            raise serializers.ValidationError(
+                f"File size exceeds maximum allowed size of {self.max_file_size} for '{name}'"
+            )
+
+
+class FeedbackSchema:
+    """
+    A product's ``feedback_fields`` compiled into a name-indexed validator.
+
+    Lookups by field name are dictionary hits and option sets, numeric
+    bounds and file limits are parsed once, so validating a call is linear
+    in the size of the submitted feedback rather than quadratic in the
+    number of configured fields.
+    """
+
+    def __init__(self, feedback_fields):
+        self.fields = {}
+        for config in feedback_fields or []:
+            field = FeedbackField(config)
+            # The first definition of a name wins, as the old linear scans did
+            self.fields.setdefault(field.name, field)
+        self.required = [field.name for field in self.fields.values() if field.is_required and not field.is_file]
+        self.file_fields = [field.name for field in self.fields.values() if field.is_file]
+
+    def validate(self, feedback):
+        """Check submitted feedback values, raising on the first problem found."""
+        feedback = feedback or {}
+        for name in self.required:
+            if name not in feedback:
+                raise serializers.ValidationError(f"Required field '{name}' is missing")
+        for name, value in feedback.items():
+            field = self.fields.get(name)
+            if field is None:
+                raise serializers.ValidationError(f"Unknown field '{name}'")
+            if field.is_file and isinstance(value, dict) and "file_url" in value:
+                continue
+            field.validate(value)
+        return feedback
+
+    def validate_file(self, name, file):
+        field = self.fields.get(name)
+        if field is None:
+            raise serializers.ValidationError(f"Unknown field '{name}'")
+        if not field.is_file:
+            raise serializers.ValidationError(f"Field '{name}' is not a file field")
+        field.validate_file(file)
+
+    def file_values(self, data):
+        """The subset of ``data`` holding uploads for this schema's file fields."""
+        return {name: data[name] for name in self.file_fields if name in data}
+
+
+def schema_hash(feedback_fields):
+    """Stable digest of a ``feedback_fields`` value, independent of key order."""
+    encoded = json.dumps(feedback_fields or [], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+_schemas = {}
+_product_schemas = {}
+_schemas_lock = threading.Lock()
+
+
+def _remember(cache, key, value):
+    with _schemas_lock:
+        if len(cache) >= SCHEMA_CACHE_SIZE:
+            cache.clear()
+        cache[key] = value
+
+
+def get_feedback_schema(feedback_fields):
+    """
+    Return the compiled schema for ``feedback_fields``, compiling it on first use.
+
+    Schemas are cached by content hash, so every product sharing a field
+    layout shares one validator and an edited product simply hashes to a
+    new entry.
+    """
+    digest = schema_hash(feedback_fields)
+    schema = _schemas.get(digest)
+    if schema is None:
+        schema = FeedbackSchema(feedback_fields)
+        _remember(_schemas, digest, schema)
+    return schema
+
+
+def product_feedback_schema(product):
+    """
+    Compiled schema for ``product``.
+
+    Serialising the schema to hash it costs about as much as validating a
+    call, so the last schema seen for each product is kept next to its
+    validator and the hash is only taken again when the stored fields no
+    longer compare equal.
+    """
+    entry = _product_schemas.get(product.pk)
+    if entry is not None and entry[0] == product.feedback_fields:
+        return entry[1]
+    schema = get_feedback_schema(product.feedback_fields)
+    _remember(_product_schemas, product.pk, (copy.deepcopy(product.feedback_fields), schema))
+    return schema
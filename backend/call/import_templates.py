@@ -0,0 +1,174 @@
+import hashlib
+import io
+import json
+import logging
+
+import pandas as pd
+from django.core.cache import cache
+from openpyxl.styles import Alignment, Font, PatternFill
+
+logger = logging.getLogger(__name__)
+
+# Bump when the workbook layout below changes so cached files are rebuilt
+TEMPLATE_VERSION = 1
+TEMPLATE_CACHE_TIMEOUT = 60 * 60 * 24
+CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def template_fields(product):
+    """The product values written into the template; nothing else changes the file."""
+    return {
+        'product_name': product.name,
+        'institution_name': product.institution.institution_name,
+    }
+
+
+def template_digest(product):
+    encoded = json.dumps([TEMPLATE_VERSION, template_fields(product)], sort_keys=True)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def _cache_key(product_uuid):
+    return f'contact-template:{product_uuid}'
+
+
+def build_contact_template(fields):
+    """Render the three-sheet contact import workbook for ``template_fields`` output."""
+    # Create template with empty rows
+    template_data = {
+        'name': [''] * 10,
+        'phone_number': [''] * 10,
+        'country': [''] * 10,
+        'country_code': [''] * 10,
+        'status': [''] * 10,
+        'remarks': [''] * 10,
+    }
+
+    # Create Excel file in memory
+    output = io.BytesIO()
+
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        # Main template sheet
+        df = pd.DataFrame(template_data)
+        df.to_excel(writer, sheet_name='Contacts', index=False)
+
+        # Get worksheet
+        worksheet = writer.sheets['Contacts']
+
+        # Set column widths
+        column_widths = {
+            'A': 25,  # name
+            'B': 20,  # phone_number
+            'C': 15,  # country
+            'D': 15,  # country_code
+            'E': 15,  # status
+            'F': 30,  # remarks
+        }
+
+        for col, width in column_widths.items():
+            worksheet.column_dimensions[col].width = width
+
+        # Header styling
+        header_font = Font(bold=True, color="FFFFFF")
+        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        center_alignment = Alignment(horizontal="center", vertical="center")
+
+        for col in range(1, len(df.columns) + 1):
+            cell = worksheet.cell(row=1, column=col)
+            cell.font = header_font
+            cell.fill = header_fill
+            cell.alignment = center_alignment
+
+        # Instructions sheet
+        instructions_df = pd.DataFrame({
+            'Field': ['name', 'phone_number', 'country', 'country_code', 'status', 'remarks'],
+            'Description': [
+                'Full name of the contact',
+                'Phone number with country code',
+                'Country name (optional)',
+                'Country calling code (optional)',
+                'Contact status (optional, default: new)',
+                'Additional remarks (optional)'
+            ],
+            'Required': ['Yes', 'Yes', 'No', 'No', 'No', 'No'],
+            'Examples': [
+                'John Doe',
+                '+256701234567',
+                'Uganda',
+                '+256',
+                'new, assigned, attended_to, archived, flagged, ready_to_export, exported',
+                'Met at conference'
+            ]
+        })
+        instructions_df.to_excel(writer, sheet_name='Instructions', index=False)
+
+        instructions_sheet = writer.sheets['Instructions']
+        for col in ['A', 'B', 'C', 'D']:
+            instructions_sheet.column_dimensions[col].width = 30
+
+        for col in range(1, len(instructions_df.columns) + 1):
+            cell = instructions_sheet.cell(row=1, column=col)
+            cell.font = header_font
+            cell.fill = header_fill
+            cell.alignment = center_alignment
+
+        # Product Info sheet
+        product_info_df = pd.DataFrame({
+            'Product Information': [
+                'Selected Product',
+                'Product Name',
+                'Institution',
+                'Upload Instructions',
+                '',
+                '1. Fill in the Contacts sheet',
+                '2. Save the file',
+                '3. Upload using the bulk upload feature',
+                '4. Contacts will be linked to the selected product'
+            ],
+            'Details': [
+                '',
+                fields['product_name'],
+                fields['institution_name'],
+                '',
+                '',
+                '',
+                '',
+                '',
+                ''
+            ]
+        })
+        product_info_df.to_excel(writer, sheet_name='Product_Info', index=False)
+
+        product_info_sheet = writer.sheets['Product_Info']
+        product_info_sheet.column_dimensions['A'].width = 30
+        product_info_sheet.column_dimensions['B'].width = 30
+
+        for col in range(1, len(product_info_df.columns) + 1):
+            cell = product_info_sheet.cell(row=1, column=col)
+            cell.font = header_font
+            cell.fill = header_fill
+            cell.alignment = center_alignment
+
+    return output.getvalue()
+
+
+def contact_template(product, digest=None):
+    """
+    Bytes of the product's import template, built once per set of template fields.
+
+    The cache entry is keyed by product UUID and holds the digest it was
+    built from, so a renamed product or institution misses even if the
+    ``Product`` save that normally drops the entry never happened.
+    """
+    digest = digest or template_digest(product)
+    key = _cache_key(product.uuid)
+    cached = cache.get(key)
+    if cached is not None and cached[0] == digest:
+        return cached[1]
+    content = build_contact_template(template_fields(product))
+    cache.set(key, (digest, content), TEMPLATE_CACHE_TIMEOUT)
+    return content
+
+
+def invalidate_contact_template(product_uuid):
+    cache.delete(_cache_key(product_uuid))
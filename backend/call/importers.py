@@ -0,0 +1,383 @@
+import logging
+from itertools import islice
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from django.db import IntegrityError, transaction
+
+from .models import Contact, ContactProduct
+from .phones import normalize_e164
+
+logger = logging.getLogger(__name__)
+
+CONTACT_COLUMNS = ['name', 'phone_number', 'country', 'country_code', 'status', 'remarks']
+REQUIRED_COLUMNS = ['name', 'phone_number']
+IMPORT_BATCH_SIZE = 1000
+KNOWN_NUMBERS_CHUNK_SIZE = 20000
+CONTACT_FILE_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+
+# Spreadsheet row of a DataFrame index: one header row plus 1-based numbering.
+ROW_OFFSET = 2
+
+
+class ContactFileError(ValueError):
+    """Raised when an uploaded contacts file cannot be imported at all."""
+
+
+class ContactImportResult:
+    """Outcome of an import: created contact summaries and per-row error strings."""
+
+    def __init__(self):
+        self.created_contacts = []
+        self._errors = {}
+
+    def add_error(self, index, message):
+        self._errors.setdefault(index, message)
+
+    @property
+    def errors(self):
+        return [f'Row {index + ROW_OFFSET}: {message}' for index, message in sorted(self._errors.items())]
+
+    @property
+    def created_count(self):
+        return len(self.created_contacts)
+
+    @property
+    def error_count(self):
+        return len(self._errors)
+
+
+class KnownPhoneNumbers:
+    """
+    Exact in-memory set of E.164 numbers, for duplicate checks without queries.
+
+    Each number is packed into an ``int64`` (a leading ``1`` stands in for
+    the ``+`` so no digits are lost) and kept in one sorted array, so a
+    million numbers take 8 MB where a Python ``set`` of the strings takes
+    about 90 MB. A whole chunk is checked with one vectorized binary
+    search. There are no false positives: a Bloom filter would need about
+    1.2 bytes a number at a 1% error rate, but every hit would then have
+    to be confirmed in the database, and hits are the common case in lead
+    lists full of repeats. Numbers added during the import go to a plain
+    ``set`` next to the array.
+
+    The set is a snapshot of one institution. Numbers stored afterwards by
+    another upload, or held by other institutions, are still caught by
+    the unique index, and the import re-checks that batch in the database.
+    """
+
+    def __init__(self, numbers=()):
+        packed = np.fromiter((self._pack(number) for number in numbers), dtype=np.int64)
+        self._sorted = np.unique(packed)
+        self._added = set()
+
+    @classmethod
+    def for_institution(cls, institution_id, chunk_size=KNOWN_NUMBERS_CHUNK_SIZE):
+        """Load the normalized numbers of an institution's contacts, streamed in chunks."""
+        numbers = Contact.objects.filter(
+            institution_id=institution_id, phone_e164__isnull=False
+        ).values_list('phone_e164', flat=True)
+        return cls(numbers.iterator(chunk_size=chunk_size))
+
+    @staticmethod
+    def _pack(number):
+        return int('1' + number[1:])
+
+    def __len__(self):
+        return len(self._sorted) + len(self._added)
+
+    @property
+    def nbytes(self):
+        return self._sorted.nbytes
+
+    def contains(self, numbers):
+        """Boolean array telling which of ``numbers`` are known; ``None`` never is."""
+        numbers = list(numbers)
+        present = np.array([number is not None for number in numbers], dtype=bool)
+        packed = np.fromiter(
+            (self._pack(number) if number is not None else 0 for number in numbers), dtype=np.int64
+        )
+        if len(self._sorted):
+            positions = np.searchsorted(self._sorted, packed).clip(max=len(self._sorted) - 1)
+            found = self._sorted[positions] == packed
+        else:
+            found = np.zeros(len(packed), dtype=bool)
+        if self._added:
+            found |= np.fromiter((value in self._added for value in packed.tolist()), dtype=bool)
+        return found & present
+
+    def add(self, numbers):
+        self._added.update(self._pack(number) for number in numbers if number is not None)
+
+
+def _unique_message(field_name):
+    field = Contact._meta.get_field(field_name)
+    return f'{Contact._meta.verbose_name} with this {field.verbose_name} already exists.'
+
+
+def iter_contact_chunks(file, file_name, chunk_size=IMPORT_BATCH_SIZE, start_row=0):
+    """
+    Stream an uploaded contacts file as ``(next_row, frame)`` chunks.
+
+    ``next_row`` is the number of data rows consumed once the chunk is
+    handled, which makes it usable as a resume checkpoint: passing it back
+    as ``start_row`` skips everything already read. Frame indexes are the
+    absolute data row positions so error row numbers stay stable across
+    resumes. Comment and blank rows are dropped but still counted.
+    """
+    if file_name.endswith('.csv'):
+        # Read as text so phone numbers keep leading zeros and "+" prefixes
+        chunks = pd.read_csv(file, dtype=str, chunksize=chunk_size, skiprows=range(1, start_row + 1))
+        offset = start_row
+    elif file_name.endswith('.xlsx'):
+        chunks = iter_excel_chunks(file, 'Contacts', chunk_size, start_row)
+        offset = 0
+    else:
+        # Legacy .xls workbooks are not supported by openpyxl's streaming reader
+        df = pd.read_excel(file, sheet_name='Contacts', dtype=str)
+        chunks = (df.iloc[start:start + chunk_size] for start in range(start_row, len(df), chunk_size))
+        offset = 0
+
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        chunk.index += offset
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
+        if missing_columns:
+            raise ContactFileError(f'Missing required columns: {", ".join(missing_columns)}')
+        next_row = int(chunk.index[-1]) + 1
+        if file_name.endswith('.csv'):
+            chunk = chunk[~chunk.iloc[:, 0].astype(str).str.startswith('#')]
+        yield next_row, chunk.dropna(how='all')
+
+
+def _cell_text(value):
+    if value is None:
+        return None
+    # Excel stores every number as a float; keep phone numbers free of ".0"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def iter_excel_chunks(file, sheet_name, chunk_size=IMPORT_BATCH_SIZE, start_row=0):
+    """
+    Stream a worksheet as DataFrames of at most ``chunk_size`` rows.
+
+    The workbook is opened in openpyxl's read-only mode, which parses the
+    sheet XML lazily, so only one chunk of rows is held in memory at a time
+    however large the file is. Cells are converted to text like
+    ``read_excel(dtype=str)`` and indexes are absolute data row positions.
+    """
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        if sheet_name not in workbook.sheetnames:
+            raise ContactFileError(f"Worksheet named '{sheet_name}' not found")
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [
+            str(cell).strip() if cell is not None else f'Unnamed: {position}'
+            for position, cell in enumerate(header)
+        ]
+        width = len(columns)
+
+        position = start_row
+        rows = islice(rows, start_row, None)
+        while True:
+            batch = [
+                tuple(_cell_text(cell) for cell in row[:width]) + (None,) * (width - len(row))
+                for row in islice(rows, chunk_size)
+            ]
+            if not batch:
+                break
+            yield pd.DataFrame(batch, columns=columns, index=range(position, position + len(batch)))
+            position += len(batch)
+    finally:
+        workbook.close()
+
+
+def clean_contact_frame(df):
+    """
+    Normalise an uploaded contacts DataFrame column-wise.
+
+    Every known column is coerced to a stripped string, missing optional
+    columns are added as blanks and ``status`` falls back to ``new``.
+    Rows without a name are dropped, matching the per-row upload which
+    skipped them silently. ``phone_e164`` holds each number normalized
+    for duplicate checks, or ``None`` when it cannot be.
+    """
+    frame = df.reindex(columns=CONTACT_COLUMNS)
+    frame = frame.fillna('').astype(str).apply(lambda column: column.str.strip())
+    frame['status'] = frame['status'].mask(frame['status'] == '', 'new')
+    frame = frame[frame['name'] != ''].copy()
+    frame['phone_e164'] = [
+        normalize_e164(phone, code) for phone, code in zip(frame['phone_number'], frame['country_code'])
+    ]
+    return frame
+
+
+def validate_contact_frame(frame, result):
+    """
+    Run the serializer checks over whole columns and return the valid rows.
+
+    Failing rows are recorded on ``result`` with the same messages the
+    ``BulkContactSerializer`` produced, keyed by their original index.
+    """
+    missing_phone = frame['phone_number'] == ''
+    for index in frame.index[missing_phone]:
+        result.add_error(index, 'Phone number is required')
+    frame = frame[~missing_phone]
+
+    field_errors = {}
+
+    def flag(mask, field_name, message):
+        for index in frame.index[mask]:
+            field_errors.setdefault(index, {}).setdefault(field_name, []).append(message)
+
+    for field_name in CONTACT_COLUMNS:
+        max_length = Contact._meta.get_field(field_name).max_length
+        if max_length:
+            flag(
+                frame[field_name].str.len() > max_length,
+                field_name,
+                f'Ensure this field has no more than {max_length} characters.',
+            )
+
+    status_choices = {choice for choice, _ in Contact._meta.get_field('status').choices}
+    invalid_status = ~frame['status'].isin(status_choices)
+    for index in frame.index[invalid_status]:
+        field_errors.setdefault(index, {}).setdefault('status', []).append(
+            f'"{frame.at[index, "status"]}" is not a valid choice.'
+        )
+
+    for index, errors in field_errors.items():
+        result.add_error(index, errors)
+    frame = frame.drop(index=list(field_errors))
+
+    # Later repeats of a number inside the file would fail the unique check
+    # once the first occurrence has been inserted, however it is written.
+    repeated = _phone_keys(frame).duplicated(keep='first')
+    for index in frame.index[repeated]:
+        result.add_error(index, {'phone_number': [_unique_message('phone_number')]})
+    return frame[~repeated]
+
+
+def _phone_keys(frame):
+    # The E.164 form where the number has one, the text as typed otherwise
+    return frame['phone_e164'].where(frame['phone_e164'].notna(), frame['phone_number'])
+
+
+def find_existing_phone_numbers(phone_numbers, batch_size=IMPORT_BATCH_SIZE, field_name='phone_number'):
+    """Return the subset of ``phone_numbers`` already stored, in chunked ``IN`` lookups."""
+    phone_numbers = list(phone_numbers)
+    existing = set()
+    for start in range(0, len(phone_numbers), batch_size):
+        existing.update(
+            Contact.objects.filter(
+                **{f'{field_name}__in': phone_numbers[start:start + batch_size]}
+            ).values_list(field_name, flat=True)
+        )
+    return existing
+
+
+def find_taken_rows(frame, batch_size=IMPORT_BATCH_SIZE, known_numbers=None):
+    """
+    Boolean mask of ``frame`` rows whose number another contact already holds.
+
+    Normalized numbers are probed on the unique ``phone_e164`` index, so
+    ``0712 345678`` finds a stored ``+254712345678``, or looked up in
+    ``known_numbers`` without a query when one is given; numbers that do
+    not normalize fall back to the exact ``phone_number`` text.
+    """
+    normalized = frame['phone_e164'].notna()
+    if known_numbers is not None:
+        taken = pd.Series(known_numbers.contains(frame['phone_e164']), index=frame.index)
+    else:
+        taken = frame['phone_e164'].isin(
+            find_existing_phone_numbers(frame.loc[normalized, 'phone_e164'], batch_size, field_name='phone_e164')
+        ) & normalized
+    if (~normalized).any():
+        taken |= frame['phone_number'].isin(
+            find_existing_phone_numbers(frame.loc[~normalized, 'phone_number'], batch_size)
+        ) & ~normalized
+    return taken
+
+
+def _insert_batch(batch, product, created_by, result, known_numbers=None):
+    contacts = [
+        Contact(
+            institution_id=product.institution_id,
+            name=row.name,
+            phone_number=row.phone_number,
+            phone_e164=row.phone_e164,
+            country=row.country,
+            country_code=row.country_code,
+            status=row.status,
+            remarks=row.remarks,
+        )
+        for row in batch.itertuples()
+    ]
+    with transaction.atomic():
+        Contact.objects.bulk_create(contacts)
+        ContactProduct.objects.bulk_create(
+            [ContactProduct(contact=contact, product=product, created_by=created_by) for contact in contacts]
+        )
+    if known_numbers is not None:
+        known_numbers.add(batch['phone_e164'])
+    result.created_contacts.extend(
+        {
+            'uuid': str(contact.uuid),
+            'name': contact.name,
+            'phone_number': contact.phone_number,
+            'product_name': product.name,
+        }
+        for contact in contacts
+    )
+
+
+def import_contacts(df, product, created_by=None, batch_size=IMPORT_BATCH_SIZE, result=None, known_numbers=None):
+    """
+    Create contacts linked to ``product`` from an uploaded DataFrame.
+
+    Validation runs on whole columns, phone numbers already in the database
+    are found with chunked probes of the E.164 index, and the surviving
+    rows are written with one ``bulk_create`` per chunk for ``Contact`` and
+    ``ContactProduct``. With ``known_numbers`` (a ``KnownPhoneNumbers``
+    shared by every chunk of a job) normalized numbers are checked in
+    memory instead, and the numbers inserted are added to it.
+    """
+    result = result or ContactImportResult()
+    frame = validate_contact_frame(clean_contact_frame(df), result)
+
+    duplicated = find_taken_rows(frame, batch_size, known_numbers)
+    for index in frame.index[duplicated]:
+        result.add_error(index, {'phone_number': [_unique_message('phone_number')]})
+    frame = frame[~duplicated]
+
+    for start in range(0, len(frame), batch_size):
+        batch = frame.iloc[start:start + batch_size]
+        try:
+            _insert_batch(batch, product, created_by, result, known_numbers)
+        except IntegrityError:
+            # A concurrent upload claimed some of these numbers after the
+            # lookup above; re-check the chunk and retry without them.
+            logger.warning('Contact import batch hit a unique conflict, re-checking %s rows', len(batch))
+            taken = find_taken_rows(batch, batch_size) | batch['phone_number'].isin(
+                find_existing_phone_numbers(batch['phone_number'], batch_size)
+            )
+            for index in batch.index[taken]:
+                result.add_error(index, {'phone_number': [_unique_message('phone_number')]})
+            if (~taken).any():
+                _insert_batch(batch[~taken], product, created_by, result, known_numbers)
+    return result
+
+
+def import_contact_file(file, file_name, product, created_by=None, chunk_size=IMPORT_BATCH_SIZE):
+    """Import a whole uploaded contacts file chunk by chunk into one result."""
+    result = ContactImportResult()
+    for _, chunk in iter_contact_chunks(file, file_name, chunk_size):
+        import_contacts(chunk, product, created_by=created_by, batch_size=chunk_size, result=result)
+    return result
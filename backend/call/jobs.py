@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .importers import (
+    ContactFileError, ContactImportResult, IMPORT_BATCH_SIZE, KnownPhoneNumbers, import_contacts, iter_contact_chunks,
+)
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+# Seconds without a checkpoint before a running job counts as abandoned
+IMPORT_STALE_AFTER = 300
+
+# Row errors kept on a job; ``rows_failed`` still counts every failed row
+MAX_STORED_ERRORS = 1000
+
+
+def start_import_job(job):
+    """Run ``job`` on a background thread once the creating transaction commits."""
+    def launch():
+        threading.Thread(target=_run_in_thread, args=(job.pk,), daemon=True).start()
+
+    transaction.on_commit(launch)
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        run_import_job(job_id)
+    except Exception:
+        logger.exception("Import job %s crashed", job_id)
+    finally:
+        connection.close()
+
+
+def _claim(job_id, stale_before=None):
+    """
+    Mark ``job_id`` running and return it, or ``None`` if another worker owns it or it is done.
+
+    A pending job is always claimed. A running one only when
+    ``stale_before`` is given and its last checkpoint is older, meaning its
+    worker stopped; otherwise it is being imported right now.
+    """
+    with transaction.atomic():
+        job = ImportJob.objects.select_for_update().select_related('product').get(pk=job_id)
+        abandoned = job.status == 'running' and stale_before is not None and job.updated_at < stale_before
+        if job.status != 'pending' and not abandoned:
+            return None
+        job.status = 'running'
+        job.started_at = timezone.now()
+        job.finished_at = None
+        job.resumed_from_row = job.rows_processed
+        job.save(update_fields=['status', 'started_at', 'finished_at', 'resumed_from_row', 'updated_at'])
+        return job
+
+
+def run_import_job(job_id, chunk_size=IMPORT_BATCH_SIZE, stale_before=None):
+    """
+    Import an uploaded contacts file in fixed-size chunks.
+
+    Each chunk is written in its own transaction together with the job's
+    counters and ``rows_processed`` checkpoint, so a job interrupted by a
+    worker restart picks up from the last committed row when run again.
+    The institution's phone numbers are loaded into memory once at the
+    start, so chunks check for duplicates without querying. Only the
+    first ``MAX_STORED_ERRORS`` row errors are kept. A running job
+    is only taken over when its last checkpoint is older than
+    ``stale_before``; ``None`` is returned for a job another worker owns.
+    """
+    job = _claim(job_id, stale_before)
+    if job is None:
+        return None
+
+    try:
+        started = time.perf_counter()
+        known_numbers = KnownPhoneNumbers.for_institution(job.product.institution_id)
+        logger.info(
+            "Import job %s loaded %s known numbers (%s bytes) in %.2fs",
+            job.pk, len(known_numbers), known_numbers.nbytes, time.perf_counter() - started,
+        )
+        with job.file.open('rb') as file:
+            for next_row, chunk in iter_contact_chunks(file, job.file_name, chunk_size, start_row=job.rows_processed):
+                result = ContactImportResult()
+                with transaction.atomic():
+                    import_contacts(
+                        chunk, job.product, created_by=job.created_by, batch_size=chunk_size, result=result,
+                        known_numbers=known_numbers,
+                    )
+                    job.rows_processed = next_row
+                    job.rows_created += result.created_count
+                    job.rows_failed += result.error_count
+                    fields = ['rows_processed', 'rows_created', 'rows_failed', 'updated_at']
+                    # Once the list is full it is no longer rewritten with every chunk
+                    room = MAX_STORED_ERRORS - len(job.errors)
+                    if room > 0 and result.errors:
+                        job.errors.extend(result.errors[:room])
+                        fields.append('errors')
+                    job.save(update_fields=fields)
+    except ContactFileError as e:
+        job.status = 'failed'
+        job.error_message = str(e)
+    except Exception as e:
+        logger.exception("Import job %s failed", job.pk)
+        job.status = 'failed'
+        job.error_message = f'Error processing file: {str(e)}'
+    else:
+        job.status = 'completed'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error_message', 'finished_at', 'updated_at'])
+    return job
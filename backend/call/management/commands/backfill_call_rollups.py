@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from call.rollups import BACKFILL_DAYS_PER_BATCH, rebuild_rollups
+from institution.models import Institution
+
+
+class Command(BaseCommand):
+    help = "Rebuild daily call rollups from the Call table, one window of days per transaction"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", type=date.fromisoformat, help="First local date to rebuild (YYYY-MM-DD)")
+        parser.add_argument("--end", type=date.fromisoformat, help="Last local date to rebuild (YYYY-MM-DD)")
+        parser.add_argument("--institution", type=int, help="Only rebuild this institution id")
+        parser.add_argument("--days-per-batch", type=int, default=BACKFILL_DAYS_PER_BATCH)
+
+    def handle(self, *args, **options):
+        institution = None
+        if options["institution"] is not None:
+            institution = Institution.objects.filter(id=options["institution"]).first()
+            if institution is None:
+                raise CommandError(f"Institution {options['institution']} does not exist")
+
+        total = 0
+        for first_day, next_day, written in rebuild_rollups(
+            start=options["start"],
+            end=options["end"],
+            institution=institution,
+            days_per_batch=options["days_per_batch"],
+        ):
+            total += written
+            self.stdout.write(f"{first_day} to {next_day}: {written} rollup rows")
+        self.stdout.write(self.style.SUCCESS(f"Wrote {total} rollup rows"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from call.tenancy import BACKFILL_BATCH_SIZE, backfill_call_tenants
+
+
+class Command(BaseCommand):
+    help = "Fill Call.institution and Call.product for calls saved before they existed, one batch per transaction"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        total = 0
+        for batch, filled in enumerate(backfill_call_tenants(batch_size=options["batch_size"]), start=1):
+            total += filled
+            self.stdout.write(f"Batch {batch}: {filled} calls")
+        self.stdout.write(self.style.SUCCESS(f"Filled {total} calls"))
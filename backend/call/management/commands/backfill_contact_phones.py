@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from call.phones import BACKFILL_BATCH_SIZE, backfill_phone_e164
+
+
+class Command(BaseCommand):
+    help = "Fill Contact.phone_e164 for contacts saved before it existed, one batch per transaction"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        totals = [0, 0, 0]
+        for batch, counts in enumerate(backfill_phone_e164(batch_size=options["batch_size"]), start=1):
+            totals = [total + count for total, count in zip(totals, counts)]
+            self.stdout.write(f"Batch {batch}: {counts[0]} normalized, {counts[1]} duplicates, {counts[2]} invalid")
+        normalized, duplicates, invalid = totals
+        self.stdout.write(self.style.SUCCESS(f"Normalized {normalized} phone numbers"))
+        if duplicates:
+            self.stdout.write(self.style.WARNING(
+                f"{duplicates} contacts share a number with another contact and were left empty; "
+                "they are listed in the log"
+            ))
+        if invalid:
+            self.stdout.write(self.style.WARNING(f"{invalid} phone numbers could not be normalized"))
@@ -0,0 +1,114 @@
+import json
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.core.validators import validate_email
+
+import users.serializers  # noqa: F401  (must load before call.serializers, see InstitutionUserLoginResponseSerializer)
+from call.benchmarking import rolled_back, scratch_product, timed
+from call.feedback import product_feedback_schema
+from call.models import Contact, ContactProduct
+from call.serializers import CallSerializer
+
+FIELD_TYPES = ["text", "number", "select", "checkbox", "email", "date", "textarea"]
+
+
+def generate_feedback_fields(count):
+    """A product schema of ``count`` fields cycling through every validated type."""
+    fields = []
+    for i in range(count):
+        field_type = FIELD_TYPES[i % len(FIELD_TYPES)]
+        field = {"name": f"field_{i}", "type": field_type, "is_required": i % 2 == 0}
+        if field_type in ("select", "checkbox"):
+            field["options"] = [f"option_{n}" for n in range(10)]
+        if field_type == "number":
+            field.update(min_value=0, max_value=1000)
+        fields.append(field)
+    fields.append({"name": "recording", "type": "file", "max_file_size": "5MB", "allowed_extensions": ["mp3"]})
+    return fields
+
+
+def generate_feedback(feedback_fields):
+    values = {
+        "text": "Spoke to the client",
+        "textarea": "Wants a call back next week",
+        "number": 250,
+        "select": "option_7",
+        "checkbox": ["option_2", "option_9"],
+        "email": "client@example.com",
+        "date": "2025-06-01",
+    }
+    return {field["name"]: values[field["type"]] for field in feedback_fields if field["type"] in values}
+
+
+def legacy_validate_feedback(feedback_fields, feedback):
+    """The checks ``CallSerializer`` used to run, rescanning the schema for every submitted field."""
+    for field_config in feedback_fields:
+        if field_config.get("type") != "file" and field_config.get("is_required", False):
+            assert field_config.get("name") in feedback
+    for field_name, field_value in feedback.items():
+        field_config = next((f for f in feedback_fields if f.get("name") == field_name), None)
+        field_type = field_config.get("type")
+        if field_type == "number":
+            float(field_value)
+        elif field_type == "email":
+            validate_email(field_value)
+        elif field_type in ["select", "radio"]:
+            assert field_value in field_config.get("options", [])
+        elif field_type == "checkbox":
+            for value in field_value:
+                assert value in field_config.get("options", [])
+    # The file checks walked the schema twice more before and after validation
+    for _ in range(2):
+        [f for f in feedback_fields if f.get("type") == "file" and f.get("name") in feedback]
+
+
+def validate_repeatedly(validate, iterations):
+    for _ in range(iterations):
+        validate()
+
+
+class Command(BaseCommand):
+    help = "Measure feedback validation and end-to-end call logging throughput"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fields", type=int, default=60, help="Feedback fields on the product")
+        parser.add_argument("--iterations", type=int, default=5000, help="Validations per validator run")
+        parser.add_argument("--calls", type=int, default=500, help="Calls logged through CallSerializer")
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        feedback_fields = generate_feedback_fields(options["fields"])
+        feedback = generate_feedback(feedback_fields)
+
+        _, legacy = timed(
+            validate_repeatedly, lambda: legacy_validate_feedback(feedback_fields, feedback), iterations
+        )
+        self.stdout.write(f"linear scans: {iterations / legacy:10.0f} validations/s")
+
+        # A freshly decoded copy, as each request loads the product from the database
+        product = SimpleNamespace(pk="benchmark", feedback_fields=json.loads(json.dumps(feedback_fields)))
+        _, compiled = timed(
+            validate_repeatedly, lambda: product_feedback_schema(product).validate(feedback), iterations
+        )
+        self.stdout.write(f"compiled:     {iterations / compiled:10.0f} validations/s")
+        self.stdout.write(self.style.SUCCESS(f"Validator speed-up: {legacy / compiled:.1f}x"))
+
+        calls = options["calls"]
+        with scratch_product(feedback_fields=feedback_fields) as product:
+            contact = Contact.objects.create(
+                institution=product.institution, name="Benchmark Lead", phone_number="+254799999999"
+            )
+            contact_product = ContactProduct.objects.create(contact=contact, product=product)
+
+            def log_calls():
+                for _ in range(calls):
+                    serializer = CallSerializer(
+                        data={"contact": contact_product.pk, "status": "completed", "feedback": feedback}
+                    )
+                    serializer.is_valid(raise_exception=True)
+                    serializer.save()
+
+            with rolled_back():
+                _, elapsed = timed(log_calls)
+        self.stdout.write(f"call logging: {calls / elapsed:10.0f} calls/s ({options['fields']} feedback fields)")
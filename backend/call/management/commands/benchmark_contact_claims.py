@@ -0,0 +1,127 @@
+import threading
+import time
+import uuid as uuid_module
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from call.dialer import claim_next_contact, release_contact
+from call.models import Agent, CallGroup, CallGroupAgent, CallGroupContact, Contact, ContactProduct
+from institution.models import Branch, Institution, Product
+from users.models import CustomUser, Profile
+
+
+def create_dialer_fixture(agents, contacts):
+    """Commit a call group with ``agents`` active agents and ``contacts`` new memberships."""
+    suffix = uuid_module.uuid4().hex[:8]
+    owner = CustomUser.objects.create_user(email=f"claims-{suffix}@example.com", fullname="Benchmark Owner")
+    institution = Institution.objects.create(
+        institution_owner=owner, institution_name=f"Benchmark {suffix}", created_by=owner
+    )
+    product = Product.objects.create(institution=institution, name=f"Benchmark {suffix}")
+    group = CallGroup.objects.create(institution=institution, name=f"Benchmark {suffix}")
+
+    users = CustomUser.objects.bulk_create(
+        CustomUser(email=f"agent-{i}-{suffix}@example.com", fullname=f"Agent {i}") for i in range(agents)
+    )
+    profiles = Profile.objects.bulk_create(Profile(user=user, institution=institution) for user in users)
+    dialer_agents = Agent.objects.bulk_create(
+        Agent(user=profile, device_id=f"device-{i}", extension=str(100 + i)) for i, profile in enumerate(profiles)
+    )
+    call_group_agents = CallGroupAgent.objects.bulk_create(
+        CallGroupAgent(call_group=group, agent=agent) for agent in dialer_agents
+    )
+
+    leads = Contact.objects.bulk_create(
+        Contact(institution=institution, name=f"Lead {i}", phone_number=f"+9{suffix[:4]}{i:09d}")
+        for i in range(contacts)
+    )
+    contact_products = ContactProduct.objects.bulk_create(ContactProduct(contact=lead, product=product) for lead in leads)
+    CallGroupContact.objects.bulk_create(
+        CallGroupContact(call_group=group, contact=contact_product) for contact_product in contact_products
+    )
+    if connection.vendor == "postgresql":
+        # Give the planner real statistics, as autovacuum would on a live table
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {CallGroupContact._meta.db_table}")
+    return institution, call_group_agents
+
+
+def delete_dialer_fixture(institution):
+    CallGroupContact.objects.filter(call_group__institution=institution).delete()
+    ContactProduct.objects.filter(product__institution=institution).delete()
+    Contact.objects.filter(institution=institution).delete()
+    agents = list(Agent.objects.filter(user__institution=institution).values_list("pk", flat=True))
+    CallGroup.objects.filter(institution=institution).delete()
+    Agent.objects.filter(pk__in=agents).delete()
+    Product.objects.filter(institution=institution).delete()
+    Branch.objects.filter(institution=institution).delete()
+    owner_id = institution.institution_owner_id
+    users = list(Profile.objects.filter(institution=institution).values_list("user_id", flat=True))
+    institution.delete()
+    CustomUser.objects.filter(pk__in=users + [owner_id]).delete()
+
+
+class Command(BaseCommand):
+    help = (
+        "Let many agents claim and complete contacts of one call group at the same time "
+        "and check that no contact is handed out twice"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--agents", type=int, default=80)
+        parser.add_argument("--contacts", type=int, default=4000)
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite":
+            self.stdout.write(self.style.WARNING(
+                "SQLite has no row locks: claims stay exclusive but agents serialise on the database lock"
+            ))
+        institution, call_group_agents = create_dialer_fixture(options["agents"], options["contacts"])
+        claimed = Counter()
+        claims_per_agent = Counter()
+        errors = []
+        start = threading.Barrier(len(call_group_agents) + 1)
+
+        def dial(call_group_agent):
+            try:
+                start.wait()
+                while True:
+                    membership = claim_next_contact(call_group_agent)
+                    if membership is None:
+                        break
+                    claimed[membership.pk] += 1
+                    claims_per_agent[call_group_agent.pk] += 1
+                    release_contact(membership, call_group_agent, status="attended_to")
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=dial, args=(agent,)) for agent in call_group_agents]
+        try:
+            for thread in threads:
+                thread.start()
+            start.wait()
+            started = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            delete_dialer_fixture(institution)
+
+        if errors:
+            raise CommandError(f"{len(errors)} agents failed, first error: {errors[0]!r}")
+        total = sum(claimed.values())
+        doubled = sum(1 for count in claimed.values() if count > 1)
+        self.stdout.write(
+            f"{len(call_group_agents)} agents claimed {total} contacts in {elapsed:.2f}s "
+            f"({total / elapsed:.0f} claims/s, busiest agent {max(claims_per_agent.values(), default=0)}, "
+            f"idlest {min(claims_per_agent.values(), default=0)})"
+        )
+        if doubled or len(claimed) != options["contacts"]:
+            raise CommandError(
+                f"{doubled} contacts were handed out more than once; {len(claimed)} of {options['contacts']} claimed"
+            )
+        self.stdout.write(self.style.SUCCESS("Every contact was claimed exactly once"))
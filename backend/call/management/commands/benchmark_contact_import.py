@@ -0,0 +1,116 @@
+from types import SimpleNamespace
+
+import pandas as pd
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+
+import users.serializers  # noqa: F401  (must load before call.serializers, see InstitutionUserLoginResponseSerializer)
+from call.benchmarking import rolled_back, scratch_product, timed
+from call.importers import IMPORT_BATCH_SIZE, KnownPhoneNumbers, import_contacts
+from call.models import Contact
+from call.serializers import BulkContactSerializer
+
+
+def generate_contacts_frame(rows, duplicate_ratio, prefix="2547"):
+    """Build an upload-shaped DataFrame where ``duplicate_ratio`` of rows repeat a number."""
+    unique_rows = max(1, int(rows * (1 - duplicate_ratio)))
+    phones = [f"+{prefix}{i:08d}" for i in range(unique_rows)]
+    phones += [phones[i % unique_rows] for i in range(rows - unique_rows)]
+    return pd.DataFrame({
+        "name": [f"Lead {i}" for i in range(rows)],
+        "phone_number": phones,
+        "country": ["Kenya"] * rows,
+        "country_code": ["+254"] * rows,
+        "status": ["new"] * rows,
+        "remarks": [""] * rows,
+    })
+
+
+def preload_contacts(product, count, first, prefix="2547"):
+    """Store ``count`` contacts numbered from ``first`` in the generated file's sequence."""
+    for start in range(first, first + count, IMPORT_BATCH_SIZE * 5):
+        Contact.objects.bulk_create([
+            Contact(
+                institution_id=product.institution_id,
+                name=f"Existing {i}",
+                phone_number=f"+{prefix}{i:08d}",
+                phone_e164=f"+{prefix}{i:08d}",
+            )
+            for i in range(start, min(start + IMPORT_BATCH_SIZE * 5, first + count))
+        ])
+
+
+def import_in_chunks(df, product, known_numbers=None):
+    """Feed ``df`` to ``import_contacts`` chunk by chunk, like an import job."""
+    created, errors = 0, 0
+    for start in range(0, len(df), IMPORT_BATCH_SIZE):
+        result = import_contacts(df.iloc[start:start + IMPORT_BATCH_SIZE], product, known_numbers=known_numbers)
+        created += result.created_count
+        errors += result.error_count
+    return created, errors
+
+
+def import_contacts_per_row(df, product):
+    """The original upload loop: one serializer, lookup and insert pair per row."""
+    request = SimpleNamespace(user=AnonymousUser())
+    created, errors = 0, 0
+    for index, row in df.iterrows():
+        serializer = BulkContactSerializer(
+            data={**row.to_dict(), "product": str(product.uuid)}, context={"request": request}
+        )
+        if serializer.is_valid():
+            serializer.save()
+            created += 1
+        else:
+            errors += 1
+    return created, errors
+
+
+class Command(BaseCommand):
+    help = "Compare the per-row and set-based contact import paths on generated data"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5000)
+        parser.add_argument("--duplicates", type=float, default=0.1, help="Share of repeated phone numbers")
+        parser.add_argument(
+            "--existing", type=int, default=0, help="Contacts already stored, sharing half of the file's numbers"
+        )
+        parser.add_argument("--skip-per-row", action="store_true", help="Leave out the slow per-row baseline")
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        df = generate_contacts_frame(rows, options["duplicates"])
+
+        with scratch_product() as product:
+            if options["existing"]:
+                # Half of the file's distinct numbers are already stored
+                first = int(rows * (1 - options["duplicates"])) // 2
+                _, loading = timed(preload_contacts, product, options["existing"], first)
+                self.stdout.write(f"Stored {options['existing']} existing contacts in {loading:.1f}s")
+
+            if not options["skip_per_row"]:
+                with rolled_back():
+                    (created, errors), per_row = timed(import_contacts_per_row, df, product)
+                self.stdout.write(
+                    f"per-row:     {per_row:8.2f}s  {rows / per_row:10.0f} rows/s  created={created} errors={errors}"
+                )
+
+            with rolled_back():
+                (created, errors), set_based = timed(import_in_chunks, df, product)
+            self.stdout.write(
+                f"set-based:   {set_based:8.2f}s  {rows / set_based:10.0f} rows/s  created={created} errors={errors}"
+            )
+
+            with rolled_back():
+                known_numbers, loading = timed(KnownPhoneNumbers.for_institution, product.institution_id)
+                known, nbytes = len(known_numbers), known_numbers.nbytes
+                (created, errors), pre_checked = timed(import_in_chunks, df, product, known_numbers)
+            self.stdout.write(
+                f"pre-checked: {pre_checked:8.2f}s  {rows / pre_checked:10.0f} rows/s  created={created} "
+                f"errors={errors}  (set of {known} numbers, {nbytes} bytes, "
+                f"built in {loading:.2f}s)"
+            )
+
+        if not options["skip_per_row"]:
+            self.stdout.write(self.style.SUCCESS(f"Speed-up: {per_row / set_based:.1f}x"))
+        self.stdout.write(self.style.SUCCESS(f"Pre-check speed-up: {set_based / (loading + pre_checked):.2f}x"))
@@ -0,0 +1,123 @@
+import random
+import statistics
+import time
+import uuid as uuid_module
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from call.models import Contact
+from institution.models import Institution
+from users.models import CustomUser
+
+FIRST_NAMES = [
+    "Grace", "Peter", "Mary", "John", "Faith", "James", "Joyce", "David", "Mercy", "Samuel", "Esther", "Daniel",
+    "Ruth", "Joseph", "Ann", "Paul", "Lucy", "Brian", "Janet", "Kevin", "Naomi", "Dennis", "Sarah", "Collins",
+    "Agnes", "Moses", "Irene", "Victor", "Caroline", "Isaac", "Beatrice", "Felix", "Winnie", "George", "Diana",
+]
+LAST_NAMES = [
+    "Wanjiru", "Otieno", "Kamau", "Mwangi", "Achieng", "Kiptoo", "Njoroge", "Wambui", "Ochieng", "Mutua",
+    "Chebet", "Kariuki", "Atieno", "Kimani", "Nyambura", "Odhiambo", "Kiprono", "Muthoni", "Omondi", "Wafula",
+    "Nakato", "Mugisha", "Namutebi", "Okello", "Nansubuga", "Tumusiime", "Byaruhanga", "Akello", "Ssempala",
+]
+REMARKS = ["Met at the expo", "Asked for a callback", "Prefers WhatsApp", "Referred by a client", "Existing customer"]
+INSERT_BATCH_SIZE = 5000
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = "Measure contact search latency through the search endpoint on a large institution"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--contacts", type=int, default=1_000_000)
+        parser.add_argument("--queries", type=int, default=300)
+        parser.add_argument("--institution", type=int, help="Search an institution loaded by an earlier --keep run")
+        parser.add_argument("--keep", action="store_true", help="Leave the generated contacts in place")
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        if options["institution"]:
+            institution = Institution.objects.get(pk=options["institution"])
+        else:
+            institution = self.create_fixture(options["contacts"], rng)
+        try:
+            self.run_queries(institution, options["queries"], rng)
+        finally:
+            if options["keep"] or options["institution"]:
+                self.stdout.write(f"Contacts kept; rerun with --institution {institution.pk}")
+            else:
+                self.delete_fixture(institution)
+
+    def create_fixture(self, count, rng):
+        suffix = uuid_module.uuid4().hex[:8]
+        owner = CustomUser.objects.create_user(email=f"search-{suffix}@example.com", fullname="Benchmark Owner")
+        institution = Institution.objects.create(
+            institution_owner=owner, institution_name=f"Search {suffix}", created_by=owner
+        )
+        # A per-run prefix keeps numbers clear of the global unique constraint
+        area = rng.randint(100, 999)
+        started = time.perf_counter()
+        for offset in range(0, count, INSERT_BATCH_SIZE):
+            Contact.objects.bulk_create([
+                Contact(
+                    institution=institution,
+                    name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                    phone_number=f"+{area}7{index:08d}",
+                    phone_e164=f"+{area}7{index:08d}",
+                    remarks=rng.choice(REMARKS) if rng.random() < 0.3 else None,
+                )
+                for index in range(offset, min(offset + INSERT_BATCH_SIZE, count))
+            ])
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {Contact._meta.db_table}")
+        self.stdout.write(f"Loaded {count} contacts in {time.perf_counter() - started:.1f}s")
+        return institution
+
+    def delete_fixture(self, institution):
+        owner_id = institution.institution_owner_id
+        Contact.objects.filter(institution=institution).delete()
+        institution.delete()
+        CustomUser.objects.filter(pk=owner_id).delete()
+
+    def queries(self, institution, count, rng):
+        sample = Contact.objects.filter(institution=institution).order_by("?").values_list("phone_number", flat=True)[:1]
+        number = next(iter(sample), None)
+        if number is None:
+            raise CommandError("The institution has no contacts to search")
+        kinds = [
+            ("first name", lambda: rng.choice(FIRST_NAMES)),
+            ("last name prefix", lambda: rng.choice(LAST_NAMES)[:5].lower()),
+            ("full name", lambda: f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"),
+            ("misspelt name", lambda: f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)[:-1]}x"),
+            ("remarks word", lambda: rng.choice(["expo", "callback", "whatsapp", "referred"])),
+            ("phone prefix", lambda: f"{number[:4]} {number[4:4 + rng.randint(2, 6)]}"),
+        ]
+        return [(kinds[i % len(kinds)][0], kinds[i % len(kinds)][1]()) for i in range(count)]
+
+    def run_queries(self, institution, count, rng):
+        client = APIClient()
+        client.force_authenticate(institution.institution_owner)
+        url = reverse("contact-search", args=[institution.pk])
+        timings = {}
+        for kind, query in self.queries(institution, count, rng):
+            started = time.perf_counter()
+            response = client.get(url, {"q": query})
+            elapsed = (time.perf_counter() - started) * 1000
+            if response.status_code != 200:
+                raise CommandError(f"Search for {query!r} failed with {response.status_code}")
+            timings.setdefault(kind, []).append(elapsed)
+
+        everything = [sample for samples in timings.values() for sample in samples]
+        for kind, samples in [*timings.items(), ("all", everything)]:
+            self.stdout.write(
+                f"{kind:>18}: p50 {statistics.median(samples):6.1f} ms  p95 {percentile(samples, 0.95):6.1f} ms  "
+                f"max {max(samples):6.1f} ms  ({len(samples)} queries)"
+            )
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from call.jobs import IMPORT_STALE_AFTER, run_import_job
+from call.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = "Run pending contact import jobs and resume running ones whose worker has stopped"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=IMPORT_STALE_AFTER,
+            help="Seconds without a checkpoint before a running job is considered abandoned",
+        )
+
+    def handle(self, *args, **options):
+        stale_before = timezone.now() - timedelta(seconds=options["stale_after"])
+        jobs = ImportJob.objects.filter(
+            Q(status="pending") | Q(status="running", updated_at__lt=stale_before)
+        ).order_by("created_at").values_list("pk", flat=True)
+
+        for job_id in jobs:
+            job = run_import_job(job_id, stale_before=stale_before)
+            if job is None:
+                continue
+            self.stdout.write(
+                f"{job.file_name}: {job.status}, {job.rows_processed} rows processed, "
+                f"{job.rows_created} created, {job.rows_failed} failed"
+            )
+
+        self.stdout.write(self.style.SUCCESS("Import jobs processed"))
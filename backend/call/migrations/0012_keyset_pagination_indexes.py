@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-17 17:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('call', '0011_importjob'),
+        ('institution', '0008_alter_clientcompany_api_key'),
+        ('users', '0002_rename_institution_role_institution_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='call',
+            index=models.Index(fields=['made_on', 'uuid'], name='call_made_on_uuid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['institution', 'name', 'uuid'], name='contact_inst_name_uuid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactproduct',
+            index=models.Index(fields=['created_at', 'id'], name='contactproduct_created_id_idx'),
+        ),
+    ]
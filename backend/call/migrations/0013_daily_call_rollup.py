@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-17 17:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('call', '0012_keyset_pagination_indexes'),
+        ('institution', '0008_alter_clientcompany_api_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCallRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('agent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_call_rollups', to='call.callgroupagent')),
+                ('institution', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_call_rollups', to='institution.institution')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_call_rollups', to='institution.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['institution', 'date'], name='daily_call_rollup_inst_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('agent__isnull', False)), fields=('date', 'institution', 'product', 'agent', 'status'), name='daily_call_rollup_agent_key'), models.UniqueConstraint(condition=models.Q(('agent__isnull', True)), fields=('date', 'institution', 'product', 'status'), name='daily_call_rollup_no_agent_key')],
+            },
+        ),
+    ]
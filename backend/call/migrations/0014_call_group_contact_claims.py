@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-17 18:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('call', '0013_daily_call_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callgroupcontact',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='callgroupcontact',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='claimed_contacts', to='call.callgroupagent'),
+        ),
+        migrations.AddField(
+            model_name='callgroupcontact',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, help_text='The claim lapses at this time and the contact can be handed to another agent', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='callgroupcontact',
+            index=models.Index(condition=models.Q(('status__in', ('new', 'follow_up', 'not_attended'))), fields=['call_group', 'claimed_at', 'uuid'], name='callgroupcontact_claim_idx'),
+        ),
+    ]
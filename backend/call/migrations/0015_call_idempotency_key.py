@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-17 18:22
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('call', '0014_call_group_contact_claims'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='call',
+            name='idempotency_key',
+            field=models.UUIDField(blank=True, help_text='Client generated key of an offline logged call; a replay with the same key is ignored', null=True),
+        ),
+        migrations.AlterField(
+            model_name='contactproduct',
+            name='uuid',
+            field=models.UUIDField(db_index=True, default=uuid.uuid4, editable=False),
+        ),
+        migrations.AddConstraint(
+            model_name='call',
+            constraint=models.UniqueConstraint(fields=('idempotency_key',), name='call_idempotency_key_uniq'),
+        ),
+    ]
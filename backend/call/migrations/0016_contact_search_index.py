@@ -0,0 +1,87 @@
+from django.contrib.postgres.indexes import OpClass
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.functions import Cast, Concat, Upper
+
+from utilities.indexes import PostgresGinIndex
+
+# PostgreSQL: the trigram GIN index on call.models.CONTACT_SEARCH_TEXT, added
+# below, serves LIKE '%TERM%' and the %> word similarity operator that
+# call.search filters with; a byte-ordered btree serves phone prefixes as
+# ranges.
+POSTGRESQL_FORWARD = [
+    'CREATE INDEX IF NOT EXISTS contact_phone_prefix_idx ON call_contact ((phone_number COLLATE "C"))',
+]
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS contact_phone_prefix_idx",
+]
+
+# SQLite: an external content FTS5 table with the trigram tokenizer, kept in
+# step with call_contact by triggers. Phone prefixes use the unique index.
+# SQLite migrations that remake call_contact drop the triggers and renumber
+# rowids, so such migrations must run create_search_index again.
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS call_contact_fts USING fts5("
+    "name, remarks, content='call_contact', content_rowid='rowid', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS call_contact_fts_insert AFTER INSERT ON call_contact BEGIN "
+    "INSERT INTO call_contact_fts(rowid, name, remarks) VALUES (new.rowid, new.name, new.remarks); END",
+    "CREATE TRIGGER IF NOT EXISTS call_contact_fts_delete AFTER DELETE ON call_contact BEGIN "
+    "INSERT INTO call_contact_fts(call_contact_fts, rowid, name, remarks) "
+    "VALUES ('delete', old.rowid, old.name, old.remarks); END",
+    "CREATE TRIGGER IF NOT EXISTS call_contact_fts_update AFTER UPDATE OF name, remarks ON call_contact BEGIN "
+    "INSERT INTO call_contact_fts(call_contact_fts, rowid, name, remarks) "
+    "VALUES ('delete', old.rowid, old.name, old.remarks); "
+    "INSERT INTO call_contact_fts(rowid, name, remarks) VALUES (new.rowid, new.name, new.remarks); END",
+    "INSERT INTO call_contact_fts(call_contact_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS call_contact_fts_update",
+    "DROP TRIGGER IF EXISTS call_contact_fts_delete",
+    "DROP TRIGGER IF EXISTS call_contact_fts_insert",
+    "DROP TABLE IF EXISTS call_contact_fts",
+]
+
+STATEMENTS = {
+    "postgresql": (POSTGRESQL_FORWARD, POSTGRESQL_BACKWARD),
+    "sqlite": (SQLITE_FORWARD, SQLITE_BACKWARD),
+}
+
+
+def _run(schema_editor, direction):
+    statements = STATEMENTS.get(schema_editor.connection.vendor)
+    if statements is None:
+        # Other backends fall back to unindexed icontains scans
+        return
+    for sql in statements[direction]:
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, 0)
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('call', '0015_call_idempotency_key'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='contact',
+            index=PostgresGinIndex(
+                OpClass(
+                    Upper(Concat(Cast('name', models.TextField()), Value(' ', output_field=models.TextField()), 'remarks')),
+                    name='gin_trgm_ops',
+                ),
+                name='contact_search_trgm_idx',
+            ),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.7 on 2026-10-17 18:45
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+search_index = import_module('call.migrations.0016_contact_search_index')
+
+# Phone prefix search moves from phone_number to the E.164 column
+POSTGRESQL_FORWARD = [
+    "DROP INDEX IF EXISTS contact_phone_prefix_idx",
+    'CREATE INDEX IF NOT EXISTS contact_phone_e164_prefix_idx ON call_contact ((phone_e164 COLLATE "C"))',
+]
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS contact_phone_e164_prefix_idx",
+    'CREATE INDEX IF NOT EXISTS contact_phone_prefix_idx ON call_contact ((phone_number COLLATE "C"))',
+]
+
+
+def _run_postgresql(schema_editor, statements):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in statements:
+            schema_editor.execute(sql)
+
+
+def rebuild_sqlite_search_index(apps, schema_editor):
+    # Adding or removing a unique column remakes call_contact on SQLite,
+    # which drops the FTS triggers and renumbers rowids.
+    if schema_editor.connection.vendor == 'sqlite':
+        search_index.create_search_index(apps, schema_editor)
+
+
+def move_phone_prefix_index(apps, schema_editor):
+    _run_postgresql(schema_editor, POSTGRESQL_FORWARD)
+    rebuild_sqlite_search_index(apps, schema_editor)
+
+
+def restore_phone_prefix_index(apps, schema_editor):
+    _run_postgresql(schema_editor, POSTGRESQL_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('call', '0016_contact_search_index'),
+    ]
+
+    operations = [
+        # Only does work when unapplied, after the column is gone again
+        migrations.RunPython(migrations.RunPython.noop, rebuild_sqlite_search_index),
+        migrations.AddField(
+            model_name='contact',
+            name='phone_e164',
+            field=models.CharField(blank=True, editable=False, max_length=16, null=True, unique=True),
+        ),
+        migrations.RunPython(move_phone_prefix_index, restore_phone_prefix_index),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.7 on 2026-10-17 19:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('call', '0017_contact_phone_e164'),
+        ('institution', '0008_alter_clientcompany_api_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='call',
+            name='institution',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='calls', to='institution.institution'),
+        ),
+        migrations.AddField(
+            model_name='call',
+            name='product',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='calls', to='institution.product'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, transaction
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 5000
+
+
+def fill_tenants(apps, schema_editor):
+    # A copy of call.tenancy.fill_call_tenants as it was when this migration
+    # was written, so later changes to that module cannot change it.
+    # Before the indexes exist, so they are built once over filled rows.
+    Call = apps.get_model('call', 'Call')
+    ContactProduct = apps.get_model('call', 'ContactProduct')
+    pending = Call.objects.filter(institution__isnull=True).order_by('pk')
+    contact = ContactProduct.objects.filter(pk=OuterRef('contact_id'))
+    last_pk = None
+    while True:
+        page = pending if last_pk is None else pending.filter(pk__gt=last_pk)
+        pks = list(page.values_list('pk', flat=True)[:BATCH_SIZE])
+        if not pks:
+            break
+        last_pk = pks[-1]
+        with transaction.atomic():
+            Call.objects.filter(pk__in=pks).update(
+                product_id=Subquery(contact.values('product_id')[:1]),
+                institution_id=Subquery(contact.values('product__institution_id')[:1]),
+            )
+
+
+class Migration(migrations.Migration):
+    # One transaction per batch rather than one holding the whole table
+    atomic = False
+
+    dependencies = [
+        ('call', '0018_call_institution_product'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_tenants, migrations.RunPython.noop),
+    ]
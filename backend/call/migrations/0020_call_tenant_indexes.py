@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('call', '0019_fill_call_tenants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='call',
+            index=models.Index(fields=['institution', 'made_on', 'uuid'], name='call_inst_made_on_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='call',
+            index=models.Index(fields=['institution', 'status', 'made_on'], name='call_inst_status_made_on_idx'),
+        ),
+    ]
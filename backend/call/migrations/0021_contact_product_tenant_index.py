@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('call', '0020_call_tenant_indexes'),
+        ('institution', '0008_alter_clientcompany_api_key'),
+        ('users', '0002_rename_institution_role_institution_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='contactproduct',
+            name='contactproduct_created_id_idx',
+        ),
+        migrations.AddIndex(
+            model_name='contactproduct',
+            index=models.Index(fields=['product', 'created_at', 'id'], name='contactprod_prod_created_idx'),
+        ),
+    ]
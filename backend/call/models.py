@@ -1,8 +1,14 @@
+from django.contrib.postgres.indexes import OpClass
 from django.db import models
+from django.db.models import Q, Value
+from django.db.models.functions import Cast, Concat, Upper
 import uuid
 from django.utils import timezone
 
 from users.models import Profile
+from utilities.indexes import PostgresGinIndex
+
+from .phones import normalize_e164
 
 
 class CallGroup(models.Model):
@@ -62,6 +68,16 @@ class CallGroupAgent(models.Model):
     def __str__(self):
         return f"{self.agent.user.user.fullname} in {self.call_group.name}"    
 
+
+# Name and remarks as one upper-cased text: what contact search matches
+# words against, so a query of several words is one trigram index scan.
+# Every part is text, so Concat needs no output_field, which would keep the
+# index in the migrations from ever comparing equal to this one.
+CONTACT_SEARCH_TEXT = Upper(
+    Concat(Cast('name', models.TextField()), Value(' ', output_field=models.TextField()), 'remarks')
+)
+
+
 class Contact(models.Model):
     uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     institution = models.ForeignKey(
@@ -71,6 +87,9 @@ class Contact(models.Model):
     )
     name = models.CharField(max_length=255)
     phone_number = models.CharField(max_length=20, unique=True)
+    # phone_number in E.164 form, derived on save; empty when it cannot be
+    # normalized or, for legacy rows, another contact holds the number.
+    phone_e164 = models.CharField(max_length=16, unique=True, null=True, blank=True, editable=False)
     country = models.CharField(max_length=100, blank=True, null=True)
     country_code = models.CharField(max_length=10, blank=True, null=True)
     status = models.CharField(
@@ -88,16 +107,65 @@ class Contact(models.Model):
     )
     remarks = models.TextField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['institution', 'name', 'uuid'], name='contact_inst_name_uuid_idx'),
+            PostgresGinIndex(OpClass(CONTACT_SEARCH_TEXT, name='gin_trgm_ops'), name='contact_search_trgm_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored number so a save that leaves it alone keeps
+        # phone_e164 as it is: backfill_phone_e164 leaves it empty on
+        # legacy duplicates, which recomputing it would collide with.
+        instance._stored_phone = instance._loaded_phone()
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if self.phone_changed(update_fields):
+            self.phone_e164 = normalize_e164(self.phone_number, self.country_code)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'phone_e164'}
+        super().save(*args, **kwargs)
+        self._stored_phone = self._loaded_phone()
+
+    def _loaded_phone(self):
+        if {'phone_number', 'country_code'} & self.get_deferred_fields():
+            return None
+        return (self.phone_number, self.country_code)
+
+    def phone_changed(self, update_fields=None):
+        """Whether saving with ``update_fields`` writes a new ``phone_number`` or ``country_code``."""
+        if update_fields is not None:
+            return bool({'phone_number', 'country_code'} & set(update_fields))
+        if self._state.adding:
+            return True
+        stored = getattr(self, '_stored_phone', None)
+        if stored is None:
+            # Loaded without the number, or not loaded at all: recompute
+            # whenever the save writes either field.
+            return not {'phone_number', 'country_code'} <= self.get_deferred_fields()
+        return (self.phone_number, self.country_code) != stored
+
     @property
     def call_count(self):
-        """Returns the total number of calls made to this contact."""
-        return self.calls.count()
+        """
+        Returns the total number of calls made to this contact.
+
+        List querysets annotate ``calls_total`` so the count comes back with
+        the contact row instead of costing a query per contact.
+        """
+        if hasattr(self, 'calls_total'):
+            return self.calls_total
+        return Call.objects.filter(contact__contact=self).count()
 
     def __str__(self):
         return f"{self.name} - {self.phone_number}"
 
 class ContactProduct(models.Model):
-    uuid = models.UUIDField(default=uuid.uuid4, editable=False)
+    uuid = models.UUIDField(default=uuid.uuid4, editable=False, db_index=True)
     contact = models.ForeignKey(
         'Contact',
         related_name="contact_products",
@@ -121,8 +189,15 @@ class ContactProduct(models.Model):
         return f"{self.contact.name} - {self.product.name}"
 
     class Meta:
-        unique_together = ('contact', 'product') 
+        unique_together = ('contact', 'product')
+        indexes = [
+            models.Index(fields=['product', 'created_at', 'id'], name='contactprod_prod_created_idx'),
+        ]
     
+# Membership statuses the dialer can still hand to an agent
+CLAIMABLE_CONTACT_STATUSES = ('new', 'follow_up', 'not_attended')
+
+
 class CallGroupContact(models.Model):
     uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     call_group = models.ForeignKey(
@@ -148,9 +223,31 @@ class CallGroupContact(models.Model):
         ],
         default='new'
     )
+    claimed_by = models.ForeignKey(
+        CallGroupAgent,
+        related_name="claimed_contacts",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    lease_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="The claim lapses at this time and the contact can be handed to another agent"
+    )
     
     class Meta:
         unique_together = ('call_group', 'contact')
+        indexes = [
+            # Serves the dialer queue: walk a group's dialable rows in claim order
+            # and stop at the first one that is neither leased nor locked.
+            models.Index(
+                fields=['call_group', 'claimed_at', 'uuid'],
+                condition=Q(status__in=CLAIMABLE_CONTACT_STATUSES),
+                name='callgroupcontact_claim_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.contact.contact.name} in {self.call_group.name}"
@@ -163,6 +260,26 @@ class Call(models.Model):
         related_name="calls",
         on_delete=models.PROTECT
     )
+    # Copied from ``contact`` on save so tenant-scoped queries skip the
+    # ContactProduct -> Product join; the composite indexes below lead
+    # with the institution, so it needs no index of its own.
+    institution = models.ForeignKey(
+        "institution.Institution",
+        related_name="calls",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False
+    )
+    product = models.ForeignKey(
+        "institution.Product",
+        related_name="calls",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        editable=False
+    )
     feedback = models.JSONField(
         blank=True, 
         null=True,
@@ -185,9 +302,154 @@ class Call(models.Model):
         blank=True
     )
     made_on = models.DateTimeField(default=timezone.now)
+    idempotency_key = models.UUIDField(
+        null=True,
+        blank=True,
+        help_text="Client generated key of an offline logged call; a replay with the same key is ignored"
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['made_on', 'uuid'], name='call_made_on_uuid_idx'),
+            models.Index(fields=['institution', 'made_on', 'uuid'], name='call_inst_made_on_idx'),
+            models.Index(fields=['institution', 'status', 'made_on'], name='call_inst_status_made_on_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['idempotency_key'], name='call_idempotency_key_uniq'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the rollups counted this call under so a later save
+        # can move it to its new bucket without re-reading the row.
+        instance._rollup_state = instance.rollup_state()
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'contact' in update_fields:
+            self.copy_tenant()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'institution', 'product'}
+        super().save(*args, **kwargs)
+
+    def copy_tenant(self):
+        """Fill ``institution`` and ``product`` from ``contact``, reading the product only when they change."""
+        if self.product_id != self.contact.product_id or self.institution_id is None:
+            self.product = self.contact.product
+            self.institution_id = self.product.institution_id
+
+    def rollup_state(self):
+        return (self.made_on, self.status, self.institution_id, self.product_id, self.made_by_id)
     
     def __str__(self):
         return f"Call to {self.contact.contact.name} - {self.status}"
+
+
+class DailyCallRollup(models.Model):
+    """
+    Number of calls per local day, institution, product, agent and status.
+
+    Kept current by the ``Call`` signals in ``call.signals`` and rebuilt by
+    the ``backfill_call_rollups`` command, so reports never scan ``Call``.
+    ``date`` is the day in ``settings.TIME_ZONE`` (Africa/Nairobi).
+    """
+    date = models.DateField()
+    institution = models.ForeignKey(
+        "institution.Institution",
+        related_name="daily_call_rollups",
+        on_delete=models.CASCADE
+    )
+    product = models.ForeignKey(
+        "institution.Product",
+        related_name="daily_call_rollups",
+        on_delete=models.CASCADE
+    )
+    agent = models.ForeignKey(
+        CallGroupAgent,
+        related_name="daily_call_rollups",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )
+    status = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'institution', 'product', 'agent', 'status'],
+                condition=models.Q(agent__isnull=False),
+                name='daily_call_rollup_agent_key',
+            ),
+            # NULLs never collide in a unique index, so calls without an agent get their own key
+            models.UniqueConstraint(
+                fields=['date', 'institution', 'product', 'status'],
+                condition=models.Q(agent__isnull=True),
+                name='daily_call_rollup_no_agent_key',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['institution', 'date'], name='daily_call_rollup_inst_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.status}: {self.count}"
     
     
 
+
+class ImportJob(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    product = models.ForeignKey(
+        'institution.Product',
+        related_name="import_jobs",
+        on_delete=models.CASCADE
+    )
+    created_by = models.ForeignKey(
+        "users.Profile",
+        related_name="created_import_jobs",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    file = models.FileField(upload_to="uploads/imports/")
+    file_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    rows_processed = models.PositiveIntegerField(
+        default=0,
+        help_text="Data rows committed so far; the worker resumes reading after this row"
+    )
+    rows_created = models.PositiveIntegerField(default=0)
+    rows_failed = models.PositiveIntegerField(default=0)
+    resumed_from_row = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    error_message = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    @property
+    def rows_per_second(self):
+        """Throughput of the current (or last) run of the worker."""
+        if not self.started_at:
+            return 0.0
+        elapsed = ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+        if elapsed <= 0:
+            return 0.0
+        return round((self.rows_processed - self.resumed_from_row) / elapsed, 2)
+
+    def __str__(self):
+        return f"Import {self.file_name} - {self.status}"
@@ -0,0 +1,138 @@
+import logging
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 2000
+# E.164 allows at most 15 digits; anything under 8 is an extension or a typo
+MIN_E164_DIGITS = 8
+MAX_E164_DIGITS = 15
+# Longest number still read as national when it lacks both '+' and a trunk '0'
+MAX_NATIONAL_DIGITS = 10
+
+NON_DIGITS = re.compile(r"\D")
+
+
+def _digits(value):
+    return NON_DIGITS.sub("", value or "")
+
+
+def default_country_code():
+    return _digits(getattr(settings, "PHONE_DEFAULT_COUNTRY_CODE", ""))
+
+
+def normalize_e164(phone_number, country_code=None):
+    """
+    ``phone_number`` in E.164 form (``+254712345678``), or ``None``.
+
+    Spaces and punctuation are dropped. A leading ``+`` or ``00`` marks an
+    international number; a leading ``0`` is a national trunk prefix that
+    gives way to ``country_code``, or ``PHONE_DEFAULT_COUNTRY_CODE`` when
+    the row has none. A short number without either is national too, and
+    anything longer is taken to start with its country code already.
+    """
+    raw = (phone_number or "").strip()
+    digits = _digits(raw)
+    if not digits:
+        return None
+    if not raw.startswith("+"):
+        calling_code = _digits(country_code) or default_country_code()
+        if digits.startswith("00"):
+            digits = digits[2:]
+        elif digits.startswith("0"):
+            if not calling_code:
+                return None
+            digits = calling_code + digits[1:]
+        elif calling_code and not digits.startswith(calling_code) and len(digits) <= MAX_NATIONAL_DIGITS:
+            digits = calling_code + digits
+    if not MIN_E164_DIGITS <= len(digits) <= MAX_E164_DIGITS:
+        return None
+    return f"+{digits}"
+
+
+def e164_prefixes(query):
+    """
+    E.164 prefixes a partly typed number could stand for, most likely first.
+
+    Unlike ``normalize_e164`` this accepts short input: ``0712`` is a
+    national prefix, ``+2547`` an international one, and bare digits may
+    be either a number with its country code or a national one without
+    the trunk ``0``.
+    """
+    raw = query.strip()
+    digits = _digits(raw)
+    if not digits:
+        return []
+    if raw.startswith("+"):
+        return [f"+{digits}"]
+    if digits.startswith("00"):
+        return [f"+{digits[2:]}"] if len(digits) > 2 else []
+    calling_code = default_country_code()
+    if digits.startswith("0"):
+        return [f"+{calling_code}{digits[1:]}"] if calling_code else []
+    prefixes = [f"+{digits}"]
+    if calling_code and not digits.startswith(calling_code):
+        prefixes.append(f"+{calling_code}{digits}")
+    return prefixes
+
+
+def _write_phone_e164(model, contacts):
+    pk = model._meta.pk
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {model._meta.db_table} SET phone_e164 = %s WHERE {pk.column} = %s",
+            [(contact.phone_e164, pk.get_db_prep_value(contact.pk, connection)) for contact in contacts],
+        )
+
+
+def backfill_phone_e164(batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Fill ``Contact.phone_e164`` for rows that lack it, one batch per transaction.
+
+    Contacts are walked in primary key order. Each batch checks the
+    numbers it normalized against stored ones with a single ``IN`` query,
+    so a number already held by another contact, or by an earlier row of
+    the same batch, is left empty instead of breaking the unique index.
+    Rows are written with one parameterized ``UPDATE`` run through
+    ``executemany``; ``bulk_update`` spent most of its time building a
+    ``CASE`` expression with a branch per row.
+
+    Yields ``(normalized, duplicates, invalid)`` counts per batch; the
+    duplicates are the existing contacts an operator has to merge.
+    """
+    from .models import Contact
+
+    pending = Contact.objects.filter(phone_e164__isnull=True).order_by("pk")
+    last_pk = None
+    while True:
+        page = pending if last_pk is None else pending.filter(pk__gt=last_pk)
+        contacts = list(page.only("pk", "phone_number", "country_code")[:batch_size])
+        if not contacts:
+            break
+        last_pk = contacts[-1].pk
+
+        invalid = 0
+        normalized = {}
+        for contact in contacts:
+            contact.phone_e164 = normalize_e164(contact.phone_number, contact.country_code)
+            if contact.phone_e164 is None:
+                invalid += 1
+            else:
+                normalized.setdefault(contact.phone_e164, []).append(contact)
+
+        with transaction.atomic():
+            taken = set(
+                Contact.objects.filter(phone_e164__in=list(normalized)).values_list("phone_e164", flat=True)
+            )
+            updates, duplicates = [], []
+            for number, holders in normalized.items():
+                keep = [] if number in taken else holders[:1]
+                updates.extend(keep)
+                duplicates.extend(holders[len(keep):])
+            _write_phone_e164(Contact, updates)
+        for contact in duplicates:
+            logger.warning("Contact %s shares E.164 number %s with another contact", contact.pk, contact.phone_e164)
+        yield len(updates), len(duplicates), invalid
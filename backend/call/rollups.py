@@ -0,0 +1,177 @@
+import logging
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Call, DailyCallRollup
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_DAYS_PER_BATCH = 31
+ROLLUP_INSERT_BATCH_SIZE = 1000
+
+# Report dimensions and the rollup columns each one reads
+REPORT_DIMENSIONS = {
+    'date': ['date'],
+    'product': ['product_id', 'product__name'],
+    'agent': ['agent_id', 'agent__agent__user__user__fullname'],
+    'status': ['status'],
+}
+
+
+def local_date(moment):
+    """The calendar day of ``moment`` in the project time zone, whatever zone is active."""
+    return timezone.localtime(moment, timezone.get_default_timezone()).date()
+
+
+def day_start(day):
+    return datetime.combine(day, time.min, tzinfo=timezone.get_default_timezone())
+
+
+def _collect(deltas, states, sign):
+    """Add ``sign`` to the rollup key of every ``Call.rollup_state()`` in ``states``."""
+    for state in states:
+        if state is not None:
+            made_on, status, institution_id, product_id, made_by_id = state
+            deltas[(local_date(made_on), institution_id, product_id, made_by_id, status)] += sign
+
+
+def _increment(key, delta):
+    day, institution_id, product_id, agent_id, status = key
+    lookup = {
+        'date': day,
+        'institution_id': institution_id,
+        'product_id': product_id,
+        'agent_id': agent_id,
+        'status': status,
+    }
+    if DailyCallRollup.objects.filter(**lookup).update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            DailyCallRollup.objects.create(count=delta, **lookup)
+    except IntegrityError:
+        # Another transaction created the bucket after our update missed it
+        DailyCallRollup.objects.filter(**lookup).update(count=F('count') + delta)
+
+
+def apply_deltas(deltas):
+    """
+    Add per-key count changes to the rollup table.
+
+    Keys are applied in a fixed order so concurrent writers lock rollup
+    rows in the same sequence and cannot deadlock each other.
+    """
+    with transaction.atomic():
+        for key, delta in sorted(deltas.items(), key=lambda item: tuple(str(part) for part in item[0])):
+            if delta:
+                _increment(key, delta)
+
+
+def record_calls(calls):
+    """Count newly created calls, for paths such as ``bulk_create`` that skip model signals."""
+    deltas = Counter()
+    _collect(deltas, [call.rollup_state() for call in calls], 1)
+    apply_deltas(deltas)
+    for call in calls:
+        call._rollup_state = call.rollup_state()
+
+
+def record_call_saved(call, created):
+    """Move a saved call from the bucket it was counted in to the one it belongs in now."""
+    previous = None if created else getattr(call, '_rollup_state', None)
+    current = call.rollup_state()
+    if previous == current:
+        return
+    if not created and previous is None:
+        # Saved through an instance that was never loaded from the
+        # database, so there is no record of where it was counted.
+        logger.warning('Call %s saved without a loaded state; rollups not adjusted', call.pk)
+        return
+    deltas = Counter()
+    _collect(deltas, [previous], -1)
+    _collect(deltas, [current], 1)
+    apply_deltas(deltas)
+    call._rollup_state = current
+
+
+def record_call_deleted(call):
+    deltas = Counter()
+    _collect(deltas, [getattr(call, '_rollup_state', None) or call.rollup_state()], -1)
+    apply_deltas(deltas)
+
+
+def rebuild_rollups(start=None, end=None, institution=None, days_per_batch=BACKFILL_DAYS_PER_BATCH):
+    """
+    Recompute rollups from ``Call`` one window of local days at a time.
+
+    Each window is deleted and re-aggregated with a single ``GROUP BY``
+    inside its own transaction, so the command can be stopped and rerun
+    safely. Yields ``(first_day, next_day, rows_written)`` per window.
+    """
+    calls = Call.objects.all()
+    rollups = DailyCallRollup.objects.all()
+    if institution is not None:
+        calls = calls.filter(institution=institution)
+        rollups = rollups.filter(institution=institution)
+
+    made_on = calls.order_by().values_list('made_on', flat=True)
+    if start is None:
+        first = made_on.order_by('made_on').first()
+        if first is None:
+            return
+        start = local_date(first)
+    if end is None:
+        last = made_on.order_by('-made_on').first()
+        if last is None:
+            return
+        end = local_date(last)
+
+    tz = timezone.get_default_timezone()
+    day = start
+    while day <= end:
+        next_day = min(day + timedelta(days=days_per_batch), end + timedelta(days=1))
+        rows = (
+            calls.filter(made_on__gte=day_start(day), made_on__lt=day_start(next_day))
+            .annotate(day=TruncDate('made_on', tzinfo=tz))
+            .values('day', 'product_id', 'institution_id', 'made_by_id', 'status')
+            .annotate(total=Count('pk'))
+            .order_by()
+        )
+        with transaction.atomic():
+            rollups.filter(date__gte=day, date__lt=next_day).delete()
+            written = DailyCallRollup.objects.bulk_create(
+                [
+                    DailyCallRollup(
+                        date=row['day'],
+                        institution_id=row['institution_id'],
+                        product_id=row['product_id'],
+                        agent_id=row['made_by_id'],
+                        status=row['status'],
+                        count=row['total'],
+                    )
+                    for row in rows
+                ],
+                batch_size=ROLLUP_INSERT_BATCH_SIZE,
+            )
+        yield day, next_day, len(written)
+        day = next_day
+
+
+def rollup_report(institution, start, end, group_by, product=None, agent=None, status=None):
+    """Sum rollup counts for ``institution`` between two local dates, grouped by ``group_by``."""
+    rollups = DailyCallRollup.objects.filter(institution=institution, date__gte=start, date__lte=end)
+    if product:
+        rollups = rollups.filter(product_id=product)
+    if agent:
+        rollups = rollups.filter(agent_id=agent)
+    if status:
+        rollups = rollups.filter(status=status)
+    columns = [column for dimension in group_by for column in REPORT_DIMENSIONS[dimension]]
+    if not columns:
+        return [{'calls': rollups.aggregate(calls=Sum('count'))['calls'] or 0}]
+    return rollups.values(*columns).annotate(calls=Sum('count')).order_by(*columns)
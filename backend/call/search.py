@@ -0,0 +1,137 @@
+import re
+from functools import reduce
+from operator import and_
+
+from django.db import connection
+from django.db.models import F, Q, Subquery
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Collate, Upper
+
+from .models import CONTACT_SEARCH_TEXT, Contact
+from .phones import e164_prefixes
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+# Shortest token the trigram indexes can serve; shorter tokens only narrow
+# the rows the longer ones already found.
+MIN_INDEXED_TOKEN = 3
+# Contacts containing every token that PostgreSQL ranks by similarity. A
+# very common word matches thousands; ranking a bounded sample keeps the
+# query fast, at the cost of an arbitrary pick among equally good matches.
+MAX_RANKED_MATCHES = 200
+
+PHONE_QUERY = re.compile(r"^\+?[\d\s().-]+$")
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_phone_query(query):
+    """Digits of ``query`` when it looks like a phone number, else ``None``."""
+    if not PHONE_QUERY.match(query):
+        return None
+    digits = re.sub(r"\D", "", query)
+    return digits or None
+
+
+def _phone_matches(contacts, prefixes, limit):
+    # Compare bytes so a prefix is a contiguous range of the phone index;
+    # PostgreSQL needs an explicit collation for that, SQLite does it already.
+    if connection.vendor == "postgresql":
+        contacts = contacts.annotate(phone_key=Collate("phone_e164", "C"))
+    else:
+        contacts = contacts.annotate(phone_key=F("phone_e164"))
+    ids = []
+    for prefix in prefixes:
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        matches = contacts.filter(phone_key__gte=prefix, phone_key__lt=upper).exclude(pk__in=ids).order_by("phone_key")
+        ids += matches.values_list("pk", flat=True)[:limit - len(ids)]
+        if len(ids) >= limit:
+            break
+    return ids
+
+
+def _token_filter(token):
+    return Q(name_upper__contains=token.upper()) | Q(remarks_upper__contains=token.upper())
+
+
+def _fts_query(tokens):
+    return " ".join('"{}"'.format(token.replace('"', '""')) for token in tokens)
+
+
+def _rank_by_similarity(matches, query, limit):
+    from django.contrib.postgres.search import TrigramSimilarity
+
+    ranked = (
+        Contact.objects.filter(pk__in=Subquery(matches.values("pk")[:MAX_RANKED_MATCHES]))
+        .annotate(similarity=TrigramSimilarity(Upper("name"), query.upper()))
+        .order_by("-similarity", "name", "uuid")
+    )
+    return list(ranked.values_list("pk", flat=True)[:limit])
+
+
+def _search_postgresql(contacts, tokens, query, limit):
+    # Every token is a condition on the same indexed expression, so
+    # PostgreSQL intersects them inside one GIN scan instead of building
+    # and ANDing a bitmap per token.
+    contacts = contacts.annotate(search_text=CONTACT_SEARCH_TEXT, name_upper=Upper("name"))
+    exact = [Q(search_text__contains=token.upper()) for token in tokens]
+    ids = _rank_by_similarity(contacts.filter(*exact), query, limit)
+    if len(ids) < limit and any(len(token) >= MIN_INDEXED_TOKEN for token in tokens):
+        # Too few exact hits: a word may match a similar word of the name
+        # instead, so a typo still finds the contact. Word similarity also
+        # covers whole words and prefixes. The index finds contacts with a
+        # similar word anywhere; the name or an exact remarks match must
+        # then account for it. Reading the posting lists of every trigram
+        # of the tokens is most of this query's time for common names.
+        similar = [
+            Q(search_text__trigram_word_similar=token.upper())
+            & (Q(name_upper__trigram_word_similar=token.upper()) | Q(search_text__contains=token.upper()))
+            if len(token) >= MIN_INDEXED_TOKEN
+            else Q(search_text__contains=token.upper())
+            for token in tokens
+        ]
+        ids += _rank_by_similarity(contacts.filter(*similar).exclude(pk__in=ids), query, limit - len(ids))
+    return ids
+
+
+def search_contacts(institution, query, limit=DEFAULT_SEARCH_LIMIT):
+    """
+    Primary keys of the contacts of ``institution`` matching ``query``, best first.
+
+    A query made of digits and phone punctuation is a prefix of the
+    contacts' E.164 numbers, read as ``e164_prefixes`` does. Anything
+    else is split into tokens that must each appear in the name or the
+    remarks. On PostgreSQL up to ``MAX_RANKED_MATCHES`` such
+    contacts are ranked by trigram similarity of the name to the query,
+    and when fewer than ``limit`` match, contacts whose name holds a word
+    similar to each token fill the rest so small typos still find them.
+
+    Index use per backend: PostgreSQL answers tokens and word similarity
+    from the trigram GIN index on ``CONTACT_SEARCH_TEXT`` and prefixes
+    from a btree on ``phone_e164 COLLATE "C"``; SQLite answers tokens
+    from the ``call_contact_fts`` FTS5 trigram table and prefixes from
+    the unique E.164 index. Other backends scan.
+    """
+    contacts = Contact.objects.filter(institution=institution)
+    query = query.strip()
+    digits = normalize_phone_query(query)
+    if digits:
+        return _phone_matches(contacts, e164_prefixes(query), limit)
+
+    tokens = TOKEN.findall(query)
+    if not tokens:
+        return []
+    if connection.vendor == "postgresql":
+        return _search_postgresql(contacts, tokens, query, limit)
+
+    indexed = [token for token in tokens if len(token) >= MIN_INDEXED_TOKEN]
+    contacts = contacts.annotate(name_upper=Upper("name"), remarks_upper=Upper("remarks"))
+    if connection.vendor == "sqlite" and indexed:
+        contacts = contacts.filter(pk__in=RawSQL(
+            "SELECT uuid FROM call_contact WHERE rowid IN "
+            "(SELECT rowid FROM call_contact_fts WHERE call_contact_fts MATCH %s)",
+            [_fts_query(indexed)],
+        ))
+        tokens = [token for token in tokens if len(token) < MIN_INDEXED_TOKEN]
+    if tokens:
+        contacts = contacts.filter(reduce(and_, (_token_filter(token) for token in tokens)))
+    return list(contacts.order_by("name", "uuid").values_list("pk", flat=True)[:limit])
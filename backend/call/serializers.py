@@ -1,6 +1,14 @@
+from datetime import timedelta
+
+from django.db.models import Count, Prefetch
 from django.utils import timezone
 from rest_framework import serializers
+from .feedback import product_feedback_schema
+from .phones import normalize_e164
+from .transitions import allowed_sources
+from .uploads import store_upload
 from .models import (
+    CLAIMABLE_CONTACT_STATUSES,
     Agent,
     CallGroup,
     Call,
@@ -8,32 +16,72 @@ from .models import (
     CallGroupAgent,
     CallGroupContact,
     ContactProduct,
+    ImportJob,
 )
 from institution.models import Institution, Product
 from institution.serializers import InstitutionSerializer, ProductSerializer
 from users.models import CustomUser, Profile
 from users.serializers import CustomUserSerializer, ProfileSerializer
-from django.core.validators import validate_email
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
 from django.conf import settings
-import uuid as uuid_lib
-import os
+
+
+# Tolerated difference between an agent's device clock and the server
+CALL_LOG_CLOCK_SKEW = timedelta(minutes=5)
+
+CALL_GROUP_CONTACT_STATUSES = [choice for choice, _ in CallGroupContact._meta.get_field('status').choices]
+
+
+def call_group_contact_counts(call_group_ids):
+    """
+    Per-status membership counts for several call groups in one aggregate query.
+
+    Returns ``{call_group_uuid: {"total": n, "<status>": n, ...}}`` with every
+    status present, including groups that have no contacts at all.
+    """
+    call_group_ids = set(call_group_ids)
+    counts = {
+        call_group_id: dict.fromkeys(['total'] + CALL_GROUP_CONTACT_STATUSES, 0)
+        for call_group_id in call_group_ids
+    }
+    rows = (
+        CallGroupContact.objects.filter(call_group_id__in=call_group_ids)
+        .values_list('call_group_id', 'status')
+        .annotate(count=Count('pk'))
+        .order_by()
+    )
+    for call_group_id, contact_status, count in rows:
+        counts[call_group_id][contact_status] = count
+        counts[call_group_id]['total'] += count
+    return counts
 
 
 class CallGroupSerializer(serializers.ModelSerializer):
+    """
+    Call group summary: membership counts per status rather than the contacts themselves.
+
+    List views pass ``contact_counts`` from ``call_group_contact_counts`` in
+    the context so a page of groups (or of rows nesting a group) costs one
+    aggregate query. Members are listed through the paginated group
+    contacts endpoint or ``?expand=contacts`` on the group detail view.
+    """
     institution = serializers.PrimaryKeyRelatedField(queryset=Institution.objects.all())
-    contacts = serializers.SerializerMethodField()
+    contact_counts = serializers.SerializerMethodField()
 
     class Meta:
         model = CallGroup
         fields = "__all__"
         read_only_fields = ["uuid", "created_at", "created_by"]
 
-    def get_contacts(self, obj):
-        contact_products = CallGroupContact.objects.filter(call_group=obj).values_list('contact__contact', flat=True)
-        contacts = Contact.objects.filter(pk__in=contact_products).distinct()
-        return ContactSerializer(contacts, many=True).data
+    @staticmethod
+    def summary_context(call_group_ids):
+        return {'contact_counts': call_group_contact_counts(call_group_ids)}
+
+    def get_contact_counts(self, obj):
+        counts = self.context.get('contact_counts')
+        if counts is None or obj.pk not in counts:
+            counts = call_group_contact_counts([obj.pk])
+        return counts[obj.pk]
 
     def to_representation(self, instance):
         rep = super().to_representation(instance)
@@ -52,11 +100,24 @@ class CallGroupAgentSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         rep = super().to_representation(instance)
-        rep["call_group"] = CallGroupSerializer(instance.call_group).data
+        rep["call_group"] = CallGroupSerializer(instance.call_group, context=self.context).data
         rep["agent"] = AgentSerializer(instance.agent).data
         return rep
     
 
+def contact_call_group_uuids(contact):
+    """UUIDs of the call groups a contact belongs to, read from prefetched memberships when loaded."""
+    if 'contact_products' in getattr(contact, '_prefetched_objects_cache', {}):
+        return [
+            membership.call_group_id
+            for contact_product in contact.contact_products.all()
+            for membership in contact_product.call_groups.all()
+        ]
+    return list(
+        CallGroupContact.objects.filter(contact__contact=contact).values_list("call_group__uuid", flat=True)
+    )
+
+
 class ContactSerializer(serializers.ModelSerializer):
     product = serializers.UUIDField(write_only=True, required=False, allow_null=True)
     institution = serializers.PrimaryKeyRelatedField(queryset=Institution.objects.all(), required=True)
@@ -91,8 +152,29 @@ class ContactSerializer(serializers.ModelSerializer):
         # Ensure either product or institution is provided
         if not data.get('product') and not data.get('institution'):
             raise serializers.ValidationError("Either 'product' or 'institution' must be provided.")
+        self._check_phone_e164(data)
         return data
 
+    def _check_phone_e164(self, data):
+        # The unique phone_number check misses the same number written
+        # another way, which would then fail on the E.164 index.
+        phone_number = data.get('phone_number', getattr(self.instance, 'phone_number', None))
+        country_code = data.get('country_code', getattr(self.instance, 'country_code', None))
+        if self.instance is not None and (phone_number, country_code) == (
+            self.instance.phone_number, self.instance.country_code
+        ):
+            # The number stays as stored, and so does its phone_e164, which
+            # is empty on legacy duplicates left by backfill_phone_e164.
+            return
+        phone_e164 = normalize_e164(phone_number, country_code)
+        if phone_e164 is None:
+            return
+        others = Contact.objects.filter(phone_e164=phone_e164)
+        if self.instance is not None:
+            others = others.exclude(pk=self.instance.pk)
+        if others.exists():
+            raise serializers.ValidationError({'phone_number': ['Contact with this phone number already exists.']})
+
     def create(self, validated_data):
         # Extract product and institution from validated_data
         product = validated_data.pop('product', None)
@@ -118,16 +200,37 @@ class ContactSerializer(serializers.ModelSerializer):
             )
         return contact
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Load everything ``to_representation`` reads for a list of contacts.
+
+        The call count is annotated onto each row and the institution and
+        call group memberships are fetched in one query each, so a page
+        costs the same number of queries however many contacts it holds.
+        """
+        memberships = CallGroupContact.objects.only('uuid', 'contact_id', 'call_group_id')
+        contact_products = ContactProduct.objects.only('id', 'contact_id').prefetch_related(
+            Prefetch('call_groups', queryset=memberships)
+        )
+        return (
+            queryset
+            .select_related('institution')
+            .annotate(calls_total=Count('contact_products__calls'))
+            .prefetch_related('institution__documents', Prefetch('contact_products', queryset=contact_products))
+        )
+
     def to_representation(self, instance):
         rep = super().to_representation(instance)
-        rep["institution"] = InstitutionSerializer(instance.institution).data
-        rep["call_groups"] = list(
-            CallGroupContact.objects.filter(contact__contact=instance).values_list(
-                "call_group__uuid", flat=True
-            )
-        )
+        # A page of contacts shares one institution; build its nested
+        # serializer once per response rather than once per contact.
+        institutions = self.context.setdefault('serialized_institutions', {})
+        if instance.institution_id not in institutions:
+            institutions[instance.institution_id] = InstitutionSerializer(instance.institution).data
+        rep["institution"] = institutions[instance.institution_id]
+        rep["call_groups"] = contact_call_group_uuids(instance)
         return rep
-    
+
 class BulkContactSerializer(serializers.ModelSerializer):
     product = serializers.UUIDField(write_only=True, required=True)
 
@@ -171,11 +274,7 @@ class BulkContactSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         rep = super().to_representation(instance)
         rep["institution"] = InstitutionSerializer(instance.institution).data
-        rep["call_groups"] = list(
-            CallGroupContact.objects.filter(contact__contact=instance).values_list(
-                "call_group__uuid", flat=True
-            )
-        )
+        rep["call_groups"] = contact_call_group_uuids(instance)
         return rep    
 
 
@@ -186,22 +285,107 @@ class CallGroupContactSerializer(serializers.ModelSerializer):
     class Meta:
         model = CallGroupContact
         fields = "__all__"
-        read_only_fields = ["uuid"]
+        read_only_fields = ["uuid", "claimed_by", "claimed_at", "lease_expires_at"]
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load the nested call group and contact product of every membership, see ``ContactProductSerializer.setup_eager_loading``."""
+        queryset = queryset.select_related("call_group__institution", "contact").prefetch_related(
+            "call_group__institution__documents"
+        )
+        return ContactProductSerializer.setup_eager_loading(queryset, prefix="contact__")
+
+    def update(self, instance, validated_data):
+        if "status" in validated_data and validated_data["status"] not in CLAIMABLE_CONTACT_STATUSES:
+            # The dialer no longer hands the row out, so an open claim on it is moot
+            validated_data.update(claimed_by=None, lease_expires_at=None)
+        return super().update(instance, validated_data)
 
     def to_representation(self, instance):
         rep = super().to_representation(instance)
-        rep["call_group"] = CallGroupSerializer(instance.call_group).data
-        rep["contact"] = ContactProductSerializer(instance.contact).data
+        rep["call_group"] = CallGroupSerializer(instance.call_group, context=self.context).data
+        rep["contact"] = ContactProductSerializer(instance.contact, context=self.context).data
         return rep
 
 
+class CallGroupAssignmentSerializer(serializers.Serializer):
+    call_groups = serializers.ListField(child=serializers.UUIDField(), allow_empty=False)
+    weights = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        help_text="Relative share of the contacts for each call group; an even split when omitted",
+    )
+    product = serializers.UUIDField(required=False)
+    status = serializers.ListField(
+        child=serializers.ChoiceField(choices=Contact._meta.get_field('status').choices),
+        required=False,
+        allow_empty=False,
+    )
+    contact_products = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False
+    )
+
+    def validate(self, attrs):
+        if not any(attrs.get(key) for key in ("product", "status", "contact_products")):
+            raise serializers.ValidationError(
+                "Select contacts by product, status or contact_products."
+            )
+        if len(set(attrs["call_groups"])) != len(attrs["call_groups"]):
+            raise serializers.ValidationError({"call_groups": "Each call group may appear only once."})
+        weights = attrs.get("weights")
+        if weights is not None and len(weights) != len(attrs["call_groups"]):
+            raise serializers.ValidationError({"weights": "Give one weight per call group."})
+        return attrs
+
+
+class StatusTransitionSerializer(serializers.Serializer):
+    """Request body of a bulk status change; subclasses name the model whose statuses apply."""
+    model = None
+
+    to_status = serializers.ChoiceField(choices=[])
+    from_status = serializers.ListField(child=serializers.ChoiceField(choices=[]), required=False, allow_empty=False)
+    ids = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False)
+    product = serializers.UUIDField(required=False)
+    call_group = serializers.UUIDField(required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        choices = self.model._meta.get_field('status').choices
+        self.fields['to_status'].choices = choices
+        self.fields['from_status'].child.choices = choices
+
+    def validate(self, attrs):
+        if not any(attrs.get(key) for key in ("from_status", "ids", "product", "call_group")):
+            raise serializers.ValidationError(
+                "Select rows by from_status, ids, product or call_group."
+            )
+        permitted = allowed_sources(self.model, attrs["to_status"])
+        if not permitted:
+            raise serializers.ValidationError({"to_status": f"Nothing may be moved to '{attrs['to_status']}'."})
+        refused = [status for status in attrs.get("from_status", []) if status not in permitted]
+        if refused:
+            raise serializers.ValidationError({
+                "from_status": f"Cannot move {', '.join(refused)} to '{attrs['to_status']}'. "
+                               f"Allowed sources: {', '.join(permitted)}."
+            })
+        return attrs
+
+
+class ContactTransitionSerializer(StatusTransitionSerializer):
+    model = Contact
+
+
+class CallGroupContactTransitionSerializer(StatusTransitionSerializer):
+    model = CallGroupContact
+
+
 class CallSerializer(serializers.ModelSerializer):
     contact = serializers.PrimaryKeyRelatedField(queryset=ContactProduct.objects.all())
 
     class Meta:
         model = Call
         fields = "__all__"
-        read_only_fields = ["uuid", "made_on", "made_by"]
+        read_only_fields = ["uuid", "made_on", "made_by", "idempotency_key"]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -214,6 +398,11 @@ class CallSerializer(serializers.ModelSerializer):
                             write_only=True, required=False
                         )
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load the nested contact product of every call, see ``ContactProductSerializer.setup_eager_loading``."""
+        return ContactProductSerializer.setup_eager_loading(queryset.select_related("contact"), prefix="contact__")
+
     def to_representation(self, instance):
         rep = super().to_representation(instance)
         try:
@@ -227,143 +416,21 @@ class CallSerializer(serializers.ModelSerializer):
                     rep.pop(field_name, None)
         return rep
 
-    def validate(self, data):
-        file_fields = self._get_file_fields_from_data(data)
-        if file_fields:
-            for field_name, file in file_fields.items():
-                self._validate_file_field(data, field_name, file)
-        return self._validate_feedback(data)
-
-    def _get_file_fields_from_data(self, data):
-        file_fields = {}
+    def _contact(self, data):
         contact = data.get("contact")
         if not contact and self.instance:
             contact = self.instance.contact
-        if contact:
-            product = contact.product
-            feedback_fields = product.feedback_fields
-            for field_config in feedback_fields:
-                field_name = field_config.get("name")
-                if field_config.get("type") == "file" and field_name in data:
-                    file_fields[field_name] = data[field_name]
-        return file_fields
+        return contact
 
-    def _validate_file_field(self, data, field_name, file):
-        if not file:
-            return
-        contact = data.get("contact")
-        if not contact and self.instance:
-            contact = self.instance.contact
-        if not contact:
-            raise serializers.ValidationError("Contact is required for file upload")
-        product = contact.product
-        feedback_fields = product.feedback_fields
-        field_config = next(
-            (f for f in feedback_fields if f.get("name") == field_name), None
-        )
-        if not field_config:
-            raise serializers.ValidationError(f"Unknown field '{field_name}'")
-        if field_config.get("type") != "file":
-            raise serializers.ValidationError(
-                f"Field '{field_name}' is not a file field"
-            )
-        allowed_extensions = field_config.get("allowed_extensions", [])
-        if allowed_extensions:
-            file_extension = os.path.splitext(file.name)[1].lower().lstrip(".")
-            if file_extension not in [ext.lower() for ext in allowed_extensions]:
-                raise serializers.ValidationError(
-                    f"File extension '{file_extension}' not allowed for '{field_name}'. Allowed: {allowed_extensions}"
-                )
-        max_file_size = field_config.get("max_file_size")
-        if max_file_size:
-            size_map = {"KB": 1024, "MB": 1024 * 1024, "GB": 1024 * 1024 * 1024}
-            if max_file_size.endswith(tuple(size_map.keys())):
-                unit = max_file_size[-2:]
-                size = int(max_file_size[:-2])
-                max_bytes = size * size_map[unit]
-                if file.size > max_bytes:
-                    raise serializers.ValidationError(
-                        f"File size exceeds maximum allowed size of {max_file_size} for '{field_name}'"
-                    )
-
-    def _validate_feedback(self, data):
-        contact = data.get("contact")
-        feedback_data = data.get("feedback", {})
+    def validate(self, data):
+        contact = self._contact(data)
         if not contact:
-            if self.instance:
-                contact = self.instance.contact
-            else:
-                raise serializers.ValidationError("Contact is required")
-        product = contact.product
-        feedback_fields = product.feedback_fields
-        for field_config in feedback_fields:
-            field_name = field_config.get("name")
-            is_required = field_config.get("is_required", False)
-            field_type = field_config.get("type")
-            if field_type == "file":
-                continue
-            if is_required and field_name not in feedback_data:
-                raise serializers.ValidationError(
-                    f"Required field '{field_name}' is missing"
-                )
-        for field_name, field_value in feedback_data.items():
-            field_config = next(
-                (f for f in feedback_fields if f.get("name") == field_name), None
-            )
-            if not field_config:
-                raise serializers.ValidationError(f"Unknown field '{field_name}'")
-            field_type = field_config.get("type")
-            if (
-                field_type == "file"
-                and isinstance(field_value, dict)
-                and "file_url" in field_value
-            ):
-                continue
-            if field_type == "number":
-                try:
-                    num_value = float(field_value)
-                    min_val = field_config.get("min_value")
-                    max_val = field_config.get("max_value")
-                    if min_val is not None and num_value < min_val:
-                        raise serializers.ValidationError(
-                            f"Field '{field_name}' must be at least {min_val}"
-                        )
-                    if max_val is not None and num_value > max_val:
-                        raise serializers.ValidationError(
-                            f"Field '{field_name}' must be at most {max_val}"
-                        )
-                except (ValueError, TypeError):
-                    raise serializers.ValidationError(
-                        f"Field '{field_name}' must be a valid number"
-                    )
-            elif field_type == "email":
-                try:
-                    validate_email(field_value)
-                except:
-                    raise serializers.ValidationError(
-                        f"Field '{field_name}' must be a valid email"
-                    )
-            elif field_type in ["select", "radio"]:
-                options = field_config.get("options", [])
-                if field_value not in options:
-                    raise serializers.ValidationError(
-                        f"Field '{field_name}' must be one of: {options}"
-                    )
-            elif field_type == "checkbox":
-                if not isinstance(field_value, list):
-                    raise serializers.ValidationError(
-                        f"Field '{field_name}' must be a list"
-                    )
-                options = field_config.get("options", [])
-                for value in field_value:
-                    if value not in options:
-                        raise serializers.ValidationError(
-                            f"Field '{field_name}' contains invalid option: {value}"
-                        )
-        print(
-            "\n\n Feedback data after validation in _validate_feedback method : ",
-            feedback_data,
-        )
+            raise serializers.ValidationError("Contact is required")
+        schema = product_feedback_schema(contact.product)
+        for field_name, file in schema.file_values(data).items():
+            if file:
+                schema.validate_file(field_name, file)
+        schema.validate(data.get("feedback", {}))
         return data
 
     def create(self, validated_data):
@@ -385,17 +452,12 @@ class CallSerializer(serializers.ModelSerializer):
         return call
 
     def _extract_file_fields(self, validated_data):
-        file_fields = {}
-        contact = validated_data.get("contact")
-        if not contact and self.instance:
-            contact = self.instance.contact
-        if contact:
-            product = contact.product
-            feedback_fields = product.feedback_fields
-            for field_config in feedback_fields:
-                field_name = field_config.get("name")
-                if field_config.get("type") == "file" and field_name in validated_data:
-                    file_fields[field_name] = validated_data.pop(field_name)
+        contact = self._contact(validated_data)
+        if not contact:
+            return {}
+        file_fields = product_feedback_schema(contact.product).file_values(validated_data)
+        for field_name in file_fields:
+            validated_data.pop(field_name)
         return file_fields
 
     def _handle_file_uploads(self, call, file_fields):
@@ -412,18 +474,17 @@ class CallSerializer(serializers.ModelSerializer):
         call.save(update_fields=["feedback"])
 
     def _handle_single_file_upload(self, call, field_name, file):
-        file_extension = os.path.splitext(file.name)[1]
-        unique_filename = f"{uuid_lib.uuid4()}{file_extension}"
-        file_path = f"uploads/calls/{call.uuid}/{field_name}/{unique_filename}"
         try:
-            saved_path = default_storage.save(file_path, ContentFile(file.read()))
+            stored = store_upload(file)
             if hasattr(default_storage, "url"):
-                file_url = default_storage.url(saved_path)
+                file_url = default_storage.url(stored.path)
             else:
-                file_url = f"{settings.MEDIA_URL}{saved_path}"
+                file_url = f"{settings.MEDIA_URL}{stored.path}"
             call.feedback[field_name] = {
                 "file_name": file.name,
                 "file_url": file_url,
+                "sha256": stored.sha256,
+                "size": stored.size,
                 "uploaded_at": timezone.now().isoformat(),
             }
         except Exception as e:
@@ -432,6 +493,20 @@ class CallSerializer(serializers.ModelSerializer):
             )
 
 
+class CallLogItemSerializer(serializers.Serializer):
+    """One call of an offline batch; feedback is checked later against the product's schema."""
+    idempotency_key = serializers.UUIDField()
+    contact = serializers.UUIDField(help_text="ContactProduct UUID")
+    status = serializers.ChoiceField(choices=Call._meta.get_field("status").choices, default="completed")
+    feedback = serializers.DictField(required=False, default=dict)
+    made_on = serializers.DateTimeField(required=False)
+
+    def validate_made_on(self, value):
+        if value > timezone.now() + CALL_LOG_CLOCK_SKEW:
+            raise serializers.ValidationError("Calls cannot be logged in the future")
+        return value
+
+
 class ContactProductSerializer(serializers.ModelSerializer):
     contact = serializers.PrimaryKeyRelatedField(queryset=Contact.objects.all())
     product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
@@ -444,9 +519,25 @@ class ContactProductSerializer(serializers.ModelSerializer):
         fields = "__all__"
         read_only_fields = ["id", "uuid", "created_at"]
 
+    @staticmethod
+    def setup_eager_loading(queryset, prefix=""):
+        """
+        Load everything ``to_representation`` reads for the contact products at ``prefix``.
+
+        Contacts go through ``ContactSerializer.setup_eager_loading`` and the
+        products' institutions and the creators' roles and branches are
+        fetched once for the whole page, so a page costs the same number of
+        queries however many rows it holds.
+        """
+        queryset = queryset.select_related(f"{prefix}product__institution", f"{prefix}created_by__user").prefetch_related(
+            Prefetch(f"{prefix}contact", queryset=ContactSerializer.setup_eager_loading(Contact.objects.all())),
+            f"{prefix}product__institution__documents",
+        )
+        return CustomUserSerializer.setup_eager_loading(queryset, prefix=f"{prefix}created_by__user__")
+
     def to_representation(self, instance):
         rep = super().to_representation(instance)
-        rep["contact"] = ContactSerializer(instance.contact).data
+        rep["contact"] = ContactSerializer(instance.contact, context=self.context).data
         rep["product"] = ProductSerializer(instance.product).data
         rep["created_by"] = (
             ProfileSerializer(instance.created_by).data if instance.created_by else None
@@ -479,3 +570,27 @@ class AgentSerializer(serializers.ModelSerializer):
                     "Agent's Profile must belong to the specified institution."
                 )
         return attrs
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    product = serializers.PrimaryKeyRelatedField(read_only=True)
+    rows_per_second = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            "uuid",
+            "product",
+            "file_name",
+            "status",
+            "rows_processed",
+            "rows_created",
+            "rows_failed",
+            "rows_per_second",
+            "error_message",
+            "errors",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from institution.models import Product
+
+from .import_templates import invalidate_contact_template
+from .models import Call
+from .rollups import record_call_deleted, record_call_saved
+
+
+@receiver(post_save, sender=Call)
+def update_call_rollups(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        record_call_saved(instance, created)
+
+
+@receiver(post_delete, sender=Call)
+def remove_call_from_rollups(sender, instance, **kwargs):
+    record_call_deleted(instance)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def drop_contact_template(sender, instance, **kwargs):
+    invalidate_contact_template(instance.uuid)
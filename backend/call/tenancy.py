@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def fill_call_tenants(call_model, contact_product_model, batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Copy ``institution`` and ``product`` onto calls saved before ``Call`` carried them.
+
+    Calls are walked in primary key order and each batch is filled by one
+    ``UPDATE`` that reads both columns from the call's ``ContactProduct``,
+    in its own transaction. Migration 0019 runs a frozen copy of it.
+    Yields the number of calls filled per batch.
+    """
+    pending = call_model.objects.filter(institution__isnull=True).order_by('pk')
+    contact = contact_product_model.objects.filter(pk=OuterRef('contact_id'))
+    last_pk = None
+    while True:
+        page = pending if last_pk is None else pending.filter(pk__gt=last_pk)
+        pks = list(page.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            break
+        last_pk = pks[-1]
+        with transaction.atomic():
+            yield call_model.objects.filter(pk__in=pks).update(
+                product_id=Subquery(contact.values('product_id')[:1]),
+                institution_id=Subquery(contact.values('product__institution_id')[:1]),
+            )
+
+
+def backfill_call_tenants(batch_size=BACKFILL_BATCH_SIZE):
+    from .models import Call, ContactProduct
+
+    return fill_call_tenants(Call, ContactProduct, batch_size)
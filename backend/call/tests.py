@@ -1,3 +1,1436 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import os
+import tempfile
+import tracemalloc
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import openpyxl
+import pandas as pd
+from django.core.management import call_command
+from django.db import connection
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from institution.models import Branch, Institution, Product, UserBranch
+from users.models import CustomUser, Permission, PermissionCategory, Profile, Role, RolePermission, UserRole
+from utilities.instrumentation import endpoint_metrics
+from utilities.testing import QueryBudgetMixin
+
+from .assignment import assign_contacts, select_contact_products
+from .dialer import claim_next_contact, release_contact
+from .exporters import ContactExport
+from .feedback import get_feedback_schema, product_feedback_schema
+from .phones import normalize_e164
+from .import_templates import build_contact_template
+from .importers import CONTACT_COLUMNS, KnownPhoneNumbers, import_contacts, iter_contact_chunks
+from .jobs import IMPORT_STALE_AFTER, _claim, run_import_job
+from . import importers, views
+from .models import Agent, Call, CallGroup, CallGroupAgent, CallGroupContact, Contact, ContactProduct, DailyCallRollup, ImportJob
+from .rollups import rebuild_rollups
+from .transitions import transition_statuses
+from .uploads import content_path, store_upload
+
+
+def write_contacts_workbook(path, rows):
+    """Write a Contacts sheet of ``rows`` generated leads using openpyxl's streaming writer."""
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Contacts')
+    sheet.append(CONTACT_COLUMNS)
+    for i in range(rows):
+        # Names repeat so the shared strings table, which openpyxl always
+        # loads whole, stays the same size for both workbooks.
+        sheet.append([f'Lead {i % 50}', 254700000000 + i, 'Kenya', '+254', 'new', ''])
+    workbook.save(path)
+
+
+def peak_memory_while_streaming(path, chunk_size):
+    tracemalloc.start()
+    try:
+        with open(path, 'rb') as file:
+            rows = sum(len(chunk) for _, chunk in iter_contact_chunks(file, 'contacts.xlsx', chunk_size))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return rows, peak
+
+
+class StreamingExcelReaderTests(SimpleTestCase):
+    small_rows = 4_000
+    large_rows = 20_000
+    chunk_size = 1000
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.paths = {}
+        for rows in (cls.small_rows, cls.large_rows):
+            handle, cls.paths[rows] = tempfile.mkstemp(suffix='.xlsx')
+            os.close(handle)
+            write_contacts_workbook(cls.paths[rows], rows)
+
+    @classmethod
+    def tearDownClass(cls):
+        for path in cls.paths.values():
+            os.remove(path)
+        super().tearDownClass()
+
+    def test_chunks_resume_with_absolute_rows_as_text(self):
+        start_row = self.small_rows - 1500
+        with open(self.paths[self.small_rows], 'rb') as file:
+            chunks = list(iter_contact_chunks(file, 'contacts.xlsx', self.chunk_size, start_row=start_row))
+
+        self.assertEqual([next_row for next_row, _ in chunks], [start_row + 1000, self.small_rows])
+        first = chunks[0][1]
+        self.assertEqual(first.index[0], start_row)
+        self.assertEqual(first.iloc[0]['phone_number'], str(254700000000 + start_row))
+
+    def test_peak_memory_does_not_scale_with_rows(self):
+        small_total, small_peak = peak_memory_while_streaming(self.paths[self.small_rows], self.chunk_size)
+        large_total, large_peak = peak_memory_while_streaming(self.paths[self.large_rows], self.chunk_size)
+
+        self.assertEqual(small_total, self.small_rows)
+        self.assertEqual(large_total, self.large_rows)
+        # pandas.read_excel costs roughly 600 bytes per row on this sheet.
+        # What still grows here is the ~100 bytes of cleared XML openpyxl's
+        # parser keeps per row it has read.
+        growth_per_row = (large_peak - small_peak) / (self.large_rows - self.small_rows)
+        self.assertLess(growth_per_row, 256)
+        self.assertLess(large_peak, 8 * 1024 * 1024)
+
+
+class ContactBulkImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.institution = Institution.objects.create(
+            institution_owner=cls.owner, institution_name='Baifam', created_by=cls.owner
+        )
+        cls.product = Product.objects.create(institution=cls.institution, name='Loans')
+        Contact.objects.create(institution=cls.institution, name='Stored', phone_number='0799000000')
+
+    def leads(self, count, start=0):
+        return pd.DataFrame({
+            'name': [f'Lead {i}' for i in range(start, start + count)],
+            'phone_number': [f'07110{i:05d}' for i in range(start, start + count)],
+        })
+
+    def test_upload_reports_each_rejected_row(self):
+        rows = [
+            'Valid,0712000001,Kenya,+254,new,',
+            'No Phone,,Kenya,+254,new,',
+            'Bad Status,0712000002,Kenya,+254,maybe,',
+            ',0712000003,Kenya,+254,new,',
+            'Repeat,+254712000001,Kenya,+254,new,',
+            'Stored Again,254799000000,Kenya,+254,new,',
+            'Too Long,0712000004,' + 'x' * 101 + ',+254,new,',
+            'Flagged,0712000005,,,flagged,call back',
+        ]
+        upload = SimpleUploadedFile('leads.csv', '\n'.join([','.join(CONTACT_COLUMNS)] + rows).encode())
+        client = APIClient()
+        client.force_authenticate(self.owner)
+
+        response = client.post(reverse('contact-bulk-upload', args=[self.product.uuid]), {'file': upload})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([contact['name'] for contact in response.data['created_contacts']], ['Valid', 'Flagged'])
+        # The row without a name is skipped silently, like the per-row upload did
+        self.assertEqual(
+            [error.split(':')[0] for error in response.data['errors']], ['Row 3', 'Row 4', 'Row 6', 'Row 7', 'Row 8']
+        )
+        self.assertIn('Phone number is required', response.data['errors'][0])
+        self.assertIn('already exists', response.data['errors'][2])
+        flagged = Contact.objects.get(name='Flagged')
+        self.assertEqual((flagged.status, flagged.remarks, flagged.phone_e164), ('flagged', 'call back', '+254712000005'))
+        self.assertEqual(
+            set(ContactProduct.objects.filter(product=self.product).values_list('contact__name', flat=True)),
+            {'Valid', 'Flagged'},
+        )
+
+    def test_query_count_does_not_grow_with_rows(self):
+        with CaptureQueriesContext(connection) as small:
+            import_contacts(self.leads(5), self.product)
+        with CaptureQueriesContext(connection) as large:
+            result = import_contacts(self.leads(60, start=5), self.product)
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(result.created_count, 60)
+        self.assertEqual(ContactProduct.objects.filter(product=self.product).count(), 65)
+
+    def test_batch_claimed_concurrently_is_rechecked(self):
+        frame = self.leads(3)
+        # Another upload stores one of the numbers after the lookup
+        Contact.objects.create(institution=self.institution, name='Racer', phone_number='0711000001')
+        real_find_taken_rows = importers.find_taken_rows
+        lookups = iter([lambda rows, *args: pd.Series(False, index=rows.index)])
+
+        def find_taken_rows(rows, *args, **kwargs):
+            return next(lookups, real_find_taken_rows)(rows, *args, **kwargs)
+
+        with mock.patch('call.importers.find_taken_rows', find_taken_rows):
+            result = import_contacts(frame, self.product)
+
+        self.assertEqual([contact['name'] for contact in result.created_contacts], ['Lead 0', 'Lead 2'])
+        self.assertEqual(len(result.errors), 1)
+        self.assertTrue(result.errors[0].startswith('Row 3:'))
+        self.assertIn('phone number already exists', result.errors[0])
+        self.assertEqual(ContactProduct.objects.filter(product=self.product).count(), 2)
+
+
+class ImportJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.institution = Institution.objects.create(
+            institution_owner=cls.owner, institution_name='Baifam', created_by=cls.owner
+        )
+        cls.product = Product.objects.create(institution=cls.institution, name='Loans')
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def job_for(self, rows):
+        lines = [','.join(CONTACT_COLUMNS)] + [f'{name},{phone},Kenya,+254,new,' for name, phone in rows]
+        job = ImportJob(product=self.product, file_name='leads.csv')
+        job.file.save('leads.csv', ContentFile('\n'.join(lines).encode()))
+        return job
+
+    def test_upload_queues_a_job_and_reports_its_progress(self):
+        lines = [','.join(CONTACT_COLUMNS), 'Lead 0,0712000000,Kenya,+254,new,', 'No Phone,,Kenya,+254,new,']
+        client = APIClient()
+        client.force_authenticate(self.owner)
+
+        with mock.patch('call.views.start_import_job') as start:
+            response = client.post(
+                reverse('contact-import-job-create', args=[self.product.uuid]),
+                {'file': SimpleUploadedFile('leads.csv', '\n'.join(lines).encode())},
+            )
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'pending')
+        start.assert_called_once()
+        run_import_job(response.data['uuid'])
+        progress = client.get(reverse('contact-import-job-detail', args=[response.data['uuid']])).data
+        self.assertEqual(
+            (progress['status'], progress['rows_processed'], progress['rows_created'], progress['rows_failed']),
+            ('completed', 2, 1, 1),
+        )
+        self.assertEqual(progress['errors'], ['Row 3: Phone number is required'])
+
+    def test_interrupted_job_resumes_from_its_checkpoint(self):
+        job = self.job_for([('Lead 0', '0712000000'), ('Lead 1', '0712000001'), ('Lead 2', '0712000002'),
+                            ('No Phone', ''), ('Lead 4', '0712000004')])
+        chunks = iter([import_contacts])
+
+        def crash_after_first_chunk(*args, **kwargs):
+            # The worker is killed while writing the second chunk
+            return next(chunks, mock.Mock(side_effect=KeyboardInterrupt))(*args, **kwargs)
+
+        with mock.patch('call.jobs.import_contacts', crash_after_first_chunk), self.assertRaises(KeyboardInterrupt):
+            run_import_job(job.pk, chunk_size=2)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_processed, job.rows_created), ('running', 2, 2))
+        self.assertEqual(Contact.objects.count(), 2)
+
+        # Not picked up again while its checkpoint is recent
+        out = io.StringIO()
+        call_command('process_import_jobs', stdout=out)
+        self.assertNotIn('leads.csv', out.getvalue())
+
+        ImportJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(seconds=IMPORT_STALE_AFTER + 1))
+        call_command('process_import_jobs', stdout=out)
+
+        job.refresh_from_db()
+        self.assertIn('leads.csv: completed, 5 rows processed, 4 created, 1 failed', out.getvalue())
+        self.assertEqual(job.resumed_from_row, 2)
+        self.assertEqual(job.errors, ['Row 5: Phone number is required'])
+        self.assertEqual(sorted(Contact.objects.values_list('name', flat=True)), ['Lead 0', 'Lead 1', 'Lead 2', 'Lead 4'])
+
+    def test_only_the_first_errors_are_stored(self):
+        rows = [('Lead 0', '0712000000'), *((f'Bad {i}', '') for i in range(5)), ('Lead 1', '0712000001')]
+        job = self.job_for(rows)
+
+        with mock.patch('call.jobs.MAX_STORED_ERRORS', 3):
+            run_import_job(job.pk, chunk_size=2)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_created, job.rows_failed), ('completed', 2, 5))
+        self.assertEqual(job.errors, [f'Row {row}: Phone number is required' for row in (3, 4, 5)])
+
+    def test_a_job_is_claimed_by_one_worker_at_a_time(self):
+        job = ImportJob.objects.create(product=self.product, file='uploads/imports/leads.csv', file_name='leads.csv')
+
+        self.assertEqual(_claim(job.pk).status, 'running')
+        self.assertIsNone(_claim(job.pk))
+        # A worker checkpointing within the stale window still owns it
+        self.assertIsNone(_claim(job.pk, stale_before=timezone.now() - timedelta(seconds=IMPORT_STALE_AFTER)))
+
+        ImportJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(seconds=IMPORT_STALE_AFTER + 1))
+        self.assertIsNotNone(_claim(job.pk, stale_before=timezone.now() - timedelta(seconds=IMPORT_STALE_AFTER)))
+
+        ImportJob.objects.filter(pk=job.pk).update(status='completed', updated_at=timezone.now() - timedelta(days=1))
+        self.assertIsNone(_claim(job.pk, stale_before=timezone.now()))
+
+
+class ContactExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.institution = Institution.objects.create(
+            institution_owner=cls.owner, institution_name='Baifam', created_by=cls.owner
+        )
+        cls.product = Product.objects.create(
+            institution=cls.institution,
+            name='Loans',
+            feedback_fields=[{'name': 'outcome', 'type': 'select', 'options': ['sold', 'declined']}],
+        )
+        cls.group = CallGroup.objects.create(institution=cls.institution, name='Group')
+        cls.contact_products = {}
+        for index, (name, contact_status) in enumerate([('Called', 'ready_to_export'), ('Silent', 'ready_to_export'),
+                                                         ('Pending', 'new')]):
+            contact = Contact.objects.create(
+                institution=cls.institution, name=name, phone_number=f'25470000000{index}', status=contact_status
+            )
+            cls.contact_products[name] = ContactProduct.objects.create(contact=contact, product=cls.product)
+        for day, outcome in [(1, 'declined'), (2, 'sold')]:
+            Call.objects.create(
+                contact=cls.contact_products['Called'], feedback={'outcome': outcome},
+                made_on=datetime(2025, 6, day, 9, tzinfo=dt_timezone.utc),
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def export(self, **params):
+        return self.client.get(reverse('contact-export', args=[self.product.uuid]), params)
+
+    def statuses(self):
+        return dict(Contact.objects.values_list('name', 'status'))
+
+    def test_csv_streams_a_row_per_call_then_marks_contacts_exported(self):
+        response = self.export()
+
+        self.assertTrue(response.streaming)
+        # Nothing is marked before the last row has been sent
+        self.assertEqual(self.statuses()['Called'], 'ready_to_export')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+        self.assertEqual(rows[0][-1], 'outcome')
+        self.assertEqual([(row[1], row[-1]) for row in rows[1:]], [('Called', 'declined'), ('Called', 'sold'), ('Silent', '')])
+        self.assertEqual(self.statuses(), {'Called': 'exported', 'Silent': 'exported', 'Pending': 'new'})
+        self.assertEqual(len(list(csv.reader(io.StringIO(b''.join(self.export().streaming_content).decode())))), 1)
+
+    def test_xlsx_has_the_same_rows(self):
+        response = self.export(file_type='xlsx')
+
+        sheet = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)['Contacts']
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(rows[0][-1], 'outcome')
+        self.assertEqual([(row[1], row[-1]) for row in rows[1:]], [('Called', 'declined'), ('Called', 'sold'), ('Silent', None)])
+        self.assertEqual(self.statuses(), {'Called': 'exported', 'Silent': 'exported', 'Pending': 'new'})
+        self.assertEqual(self.export(file_type='xlsx').status_code, 200)
+        self.assertEqual(self.export(file_type='pdf').status_code, 400)
+
+    def test_call_group_export_marks_only_its_memberships(self):
+        ready = CallGroupContact.objects.create(
+            call_group=self.group, contact=self.contact_products['Pending'], status='ready_to_export'
+        )
+        CallGroupContact.objects.create(call_group=self.group, contact=self.contact_products['Called'])
+        export = ContactExport(self.product, call_group=self.group, chunk_size=1)
+
+        self.assertEqual([row[1] for row in export.rows()], ['Pending'])
+        self.assertEqual(export.mark_exported(), 1)
+        ready.refresh_from_db()
+        self.assertEqual(ready.status, 'exported')
+        self.assertEqual(self.statuses()['Pending'], 'new')
+        self.assertEqual(CallGroupContact.objects.filter(status='exported').count(), 1)
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.institution = Institution.objects.create(
+            institution_owner=cls.owner, institution_name='Baifam', created_by=cls.owner
+        )
+        product = Product.objects.create(institution=cls.institution, name='Loans')
+        cls.group = CallGroup.objects.create(institution=cls.institution, name='Group')
+        # Half the contacts share a name and half the calls a timestamp, so
+        # pages have to break ties on the unique last key
+        names = ['Amina', 'Same', 'Brian', 'Same', 'Zawadi', 'Same', 'Same', 'Chebet', 'Same']
+        for index, name in enumerate(names):
+            contact = Contact.objects.create(institution=cls.institution, name=name, phone_number=f'2547{index:08}')
+            contact_product = ContactProduct.objects.create(contact=contact, product=product)
+            CallGroupContact.objects.create(call_group=cls.group, contact=contact_product)
+            Call.objects.create(
+                contact=contact_product, made_on=datetime(2025, 6, 1 + index % 2 * index, 9, tzinfo=dt_timezone.utc)
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def walk(self, url, key='uuid'):
+        """Follow ``next`` to the end, then ``previous`` back, returning the keys of both walks."""
+        forward, pages = [], []
+        response = self.client.get(url, {'page_size': 2})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append([item[key] for item in response.data['results']])
+            forward.extend(pages[-1])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        backward = [pages[-1]]
+        while response.data['previous']:
+            response = self.client.get(response.data['previous'])
+            backward.append([item[key] for item in response.data['results']])
+        self.assertEqual(backward, pages[::-1])
+        return forward
+
+    def test_contact_list_breaks_name_ties_on_uuid(self):
+        forward = self.walk(reverse('contact-list-create', args=[self.institution.id]))
+
+        expected = [str(pk) for pk in Contact.objects.order_by('name', 'uuid').values_list('uuid', flat=True)]
+        self.assertEqual(forward, expected)
+
+    def test_call_list_breaks_timestamp_ties_on_uuid(self):
+        forward = self.walk(reverse('call-list-create', args=[self.institution.id]))
+
+        expected = [str(pk) for pk in Call.objects.order_by('-made_on', '-uuid').values_list('uuid', flat=True)]
+        self.assertEqual(len(set(forward)), 9)
+        self.assertEqual(forward, expected)
+
+    def test_membership_lists_page_through_every_row(self):
+        expected = [str(pk) for pk in CallGroupContact.objects.order_by('uuid').values_list('uuid', flat=True)]
+
+        self.assertEqual(self.walk(reverse('callgroupcontact-list-create', args=[self.institution.id])), expected)
+        self.assertEqual(self.walk(reverse('call-group-contacts', args=[self.group.uuid])), expected)
+        self.assertEqual(
+            self.client.get(reverse('call-group-contacts', args=[self.group.uuid]), {'cursor': 'garbage'}).status_code,
+            404,
+        )
+
+
+class ContactListQueryCountTests(TestCase):
+    # Institution lookup, the page itself, institution documents, contact
+    # products and their call group memberships.
+    expected_queries = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.institution = Institution.objects.create(
+            institution_owner=cls.owner, institution_name='Baifam', created_by=cls.owner
+        )
+        cls.product = Product.objects.create(institution=cls.institution, name='Loans')
+        cls.groups = [
+            CallGroup.objects.create(institution=cls.institution, name=f'Group {i}') for i in range(2)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.url = reverse('contact-list-create', args=[self.institution.id])
+
+    def add_contacts(self, count):
+        for _ in range(count):
+            index = Contact.objects.count()
+            contact = Contact.objects.create(
+                institution=self.institution, name=f'Lead {index:03}', phone_number=f'2547{index:08}'
+            )
+            contact_product = ContactProduct.objects.create(contact=contact, product=self.product)
+            for group in self.groups[:index % 3]:
+                CallGroupContact.objects.create(call_group=group, contact=contact_product)
+            for _ in range(index % 4):
+                Call.objects.create(contact=contact_product)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self.add_contacts(3)
+        with self.assertNumQueries(self.expected_queries):
+            small = self.client.get(self.url, {'page_size': 50})
+
+        self.add_contacts(27)
+        with self.assertNumQueries(self.expected_queries):
+            large = self.client.get(self.url, {'page_size': 50})
+
+        self.assertEqual(len(small.data['results']), 3)
+        self.assertEqual(len(large.data['results']), 30)
+
+    def test_counts_and_call_groups_match_stored_rows(self):
+        self.add_contacts(12)
+        response = self.client.get(self.url, {'page_size': 50})
+
+        for row in response.data['results']:
+            contact = Contact.objects.get(uuid=row['uuid'])
+            self.assertEqual(row['call_count'], Call.objects.filter(contact__contact=contact).count())
+            self.assertCountEqual(
+                row['call_groups'],
+                CallGroupContact.objects.filter(contact__contact=contact).values_list('call_group_id', flat=True),
+            )
+            self.assertEqual(row['institution']['id'], self.institution.id)
+
+
+class CallGroupContactListQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.institution = Institution.objects.create(
+            institution_owner=cls.owner, institution_name='Baifam', created_by=cls.owner
+        )
+        cls.product = Product.objects.create(institution=cls.institution, name='Loans')
+        cls.group = CallGroup.objects.create(institution=cls.institution, name='Group')
+        cls.creator = Profile.objects.get(user=cls.owner)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def add_memberships(self, count):
+        for _ in range(count):
+            index = Contact.objects.count()
+            contact = Contact.objects.create(
+                institution=self.institution, name=f'Lead {index:03}', phone_number=f'2547{index:08}'
+            )
+            contact_product = ContactProduct.objects.create(contact=contact, product=self.product, created_by=self.creator)
+            CallGroupContact.objects.create(call_group=self.group, contact=contact_product)
+            for _ in range(index % 3):
+                Call.objects.create(contact=contact_product)
+
+    def assert_query_count_does_not_grow(self, url):
+        self.add_memberships(2)
+        with CaptureQueriesContext(connection) as small_queries:
+            small = self.client.get(url, {'page_size': 50})
+
+        self.add_memberships(20)
+        with CaptureQueriesContext(connection) as large_queries:
+            large = self.client.get(url, {'page_size': 50})
+
+        self.assertEqual(len(small.data['results']), 2)
+        self.assertEqual(len(large.data['results']), 22)
+        self.assertEqual(len(large_queries), len(small_queries))
+        for row in large.data['results']:
+            contact = Contact.objects.get(uuid=row['contact']['contact']['uuid'])
+            self.assertEqual(row['contact']['contact']['call_count'], Call.objects.filter(contact__contact=contact).count())
+            self.assertEqual(row['contact']['contact']['call_groups'], [self.group.uuid])
+            self.assertEqual(row['call_group']['contact_counts']['total'], 22)
+
+    def test_institution_memberships(self):
+        self.assert_query_count_does_not_grow(reverse('callgroupcontact-list-create', args=[self.institution.id]))
+
+    def test_call_group_memberships(self):
+        self.assert_query_count_does_not_grow(reverse('call-group-contacts', args=[self.group.uuid]))
+
+
+class CallEndpointQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.institution = Institution.objects.create(
+            institution_owner=cls.owner, institution_name='Baifam', created_by=cls.owner
+        )
+        cls.product = Product.objects.create(institution=cls.institution, name='Loans')
+        # Roles and branches make every nested prefetch of the creator run
+        category = PermissionCategory.objects.create(permission_category_name='Calls', permission_category_description='Calls')
+        role = Role.objects.create(name='Supervisor', description='Supervisor', institution=cls.institution)
+        RolePermission.objects.create(
+            role=role,
+            permission=Permission.objects.create(permission_code='view_calls', permission_name='View calls', category=category),
+        )
+        UserRole.objects.create(user=cls.owner, role=role)
+        branch = Branch.objects.create(institution=cls.institution, branch_name='Main', branch_location='Nairobi')
+        UserBranch.objects.create(user=cls.owner, branch=branch)
+        cls.group = CallGroup.objects.create(institution=cls.institution, name='Group')
+        for index in range(8):
+            contact = Contact.objects.create(institution=cls.institution, name=f'Lead {index}', phone_number=f'2547100000{index:02}')
+            contact_product = ContactProduct.objects.create(contact=contact, product=cls.product, created_by=Profile.objects.get(user=cls.owner))
+            Call.objects.create(contact=contact_product)
+            CallGroupContact.objects.create(call_group=cls.group, contact=contact_product)
+            user = CustomUser.objects.create_user(email=f'agent{index}@example.com', fullname=f'Agent {index}')
+            profile, _ = Profile.objects.update_or_create(user=user, defaults={'institution': cls.institution})
+            Agent.objects.create(user=profile, device_id=f'device-{index}', extension=f'10{index}')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_call_list(self):
+        with self.assertQueryBudget(views.CallListCreateAPIView):
+            response = self.client.get(reverse('call-list-create', args=[self.institution.id]))
+        self.assertEqual(len(response.data['results']), 8)
+
+    def test_contact_product_list(self):
+        with self.assertQueryBudget(views.ContactProductListCreateView):
+            response = self.client.get(reverse('contact-product-list-create', args=[self.institution.id]))
+        self.assertEqual(len(response.data['results']), 8)
+
+    def test_institution_call_group_contact_list(self):
+        with self.assertQueryBudget(views.CallGroupContactListCreateView):
+            response = self.client.get(reverse('callgroupcontact-list-create', args=[self.institution.id]))
+        self.assertEqual(len(response.data['results']), 8)
+
+    def test_call_group_contact_list(self):
+        with self.assertQueryBudget(views.ContactsByCallGroupContactListCreateView):
+            response = self.client.get(reverse('call-group-contacts', args=[self.group.uuid]))
+        self.assertEqual(len(response.data['results']), 8)
+
+    def test_agent_list(self):
+        with self.assertQueryBudget(views.AgentListCreateView):
+            response = self.client.get(reverse('agent-list-create', args=[self.institution.id]))
+        self.assertEqual(len(response.data), 8)
+
+    @override_settings(REQUEST_METRICS_HEADERS=True)
+    def test_responses_report_their_queries(self):
+        endpoint_metrics.reset()
+        self.addCleanup(endpoint_metrics.reset)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('call-list-create', args=[self.institution.id]))
+
+        self.assertEqual(response['X-Query-Count'], str(len(queries)))
+        self.assertEqual(response['X-Query-Budget'], str(views.CallListCreateAPIView.query_budget['GET']))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+        [totals] = endpoint_metrics.snapshot()
+        self.assertEqual(totals['url_name'], 'GET call-list-create')
+        self.assertEqual(totals['requests'], 1)
+        self.assertEqual(totals['queries'], len(queries))
+        self.assertEqual(totals['over_budget'], 0)
+
+
+class CallGroupSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.institution = Institution.objects.create(
+            institution_owner=cls.owner, institution_name='Baifam', created_by=cls.owner
+        )
+        cls.product = Product.objects.create(institution=cls.institution, name='Loans')
+        cls.groups = [
+            CallGroup.objects.create(institution=cls.institution, name=f'Group {i}') for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def add_members(self, group, count, status='new'):
+        for _ in range(count):
+            index = Contact.objects.count()
+            contact = Contact.objects.create(
+                institution=self.institution, name=f'Lead {index:03}', phone_number=f'2547{index:08}'
+            )
+            contact_product = ContactProduct.objects.create(contact=contact, product=self.product)
+            CallGroupContact.objects.create(call_group=group, contact=contact_product, status=status)
+
+    def list_groups(self):
+        return self.client.get(reverse('callgroup-list-create', args=[self.institution.id]))
+
+    def test_listing_cost_does_not_depend_on_group_size(self):
+        self.add_members(self.groups[0], 2)
+        with CaptureQueriesContext(connection) as small:
+            self.list_groups()
+
+        self.add_members(self.groups[0], 20)
+        self.add_members(self.groups[1], 20, status='follow_up')
+        with CaptureQueriesContext(connection) as large:
+            response = self.list_groups()
+
+        self.assertEqual(len(small), len(large))
+        self.assertNotIn('contacts', response.data[0])
+
+    def test_contact_counts_per_status(self):
+        self.add_members(self.groups[0], 3)
+        self.add_members(self.groups[0], 2, status='follow_up')
+
+        counts = {row['uuid']: row['contact_counts'] for row in self.list_groups().data}
+
+        self.assertEqual(counts[str(self.groups[0].uuid)]['total'], 5)
+        self.assertEqual(counts[str(self.groups[0].uuid)]['new'], 3)
+        self.assertEqual(counts[str(self.groups[0].uuid)]['follow_up'], 2)
+        self.assertEqual(counts[str(self.groups[2].uuid)]['total'], 0)
+
+    def test_detail_expands_contacts_one_page_at_a_time(self):
+        self.add_members(self.groups[0], 5)
+        url = reverse('callgroup-detail', args=[self.groups[0].uuid])
+
+        collapsed = self.client.get(url)
+        expanded = self.client.get(url, {'expand': 'contacts', 'page_size': 3})
+        following = self.client.get(expanded.data['contacts']['next'])
+
+        self.assertNotIn('contacts', collapsed.data)
+        self.assertEqual(len(expanded.data['contacts']['results']), 3)
+        self.assertEqual(len(following.data['contacts']['results']), 2)
+
+
+class FeedbackSchemaTests(SimpleTestCase):
+    feedback_fields = [
+        {"name": "outcome", "type": "select", "options": ["sold", "declined"], "is_required": True},
+        {"name": "interests", "type": "checkbox", "options": ["loans", "savings"]},
+        {"name": "amount", "type": "number", "min_value": 100, "max_value": 5000},
+        {"name": "email", "type": "email"},
+        {"name": "follow_up_on", "type": "date"},
+        {"name": "recording", "type": "file", "max_file_size": "1KB", "allowed_extensions": ["mp3"]},
+    ]
+
+    def assertRejects(self, feedback, message):
+        with self.assertRaisesMessage(ValidationError, message):
+            get_feedback_schema(self.feedback_fields).validate(feedback)
+
+    def test_accepts_valid_feedback(self):
+        feedback = {
+            "outcome": "sold",
+            "interests": ["loans"],
+            "amount": "250",
+            "email": "client@example.com",
+            "follow_up_on": "2025-06-01",
+            "recording": {"file_url": "/media/a.mp3"},
+        }
+        self.assertEqual(get_feedback_schema(self.feedback_fields).validate(feedback), feedback)
+
+    def test_rejects_invalid_values(self):
+        self.assertRejects({}, "Required field 'outcome' is missing")
+        self.assertRejects({"outcome": "maybe"}, "Field 'outcome' must be one of")
+        self.assertRejects({"outcome": "sold", "interests": "loans"}, "Field 'interests' must be a list")
+        self.assertRejects({"outcome": "sold", "interests": ["cars"]}, "contains invalid option: cars")
+        self.assertRejects({"outcome": "sold", "amount": "lots"}, "Field 'amount' must be a valid number")
+        self.assertRejects({"outcome": "sold", "amount": 50}, "Field 'amount' must be at least 100")
+        self.assertRejects({"outcome": "sold", "amount": 9000}, "Field 'amount' must be at most 5000")
+        self.assertRejects({"outcome": "sold", "email": "nope"}, "Field 'email' must be a valid email")
+        self.assertRejects({"outcome": "sold", "follow_up_on": "soon"}, "Field 'follow_up_on' must be a date")
+        self.assertRejects({"outcome": "sold", "colour": "red"}, "Unknown field 'colour'")
+
+    def test_file_limits(self):
+        schema = get_feedback_schema(self.feedback_fields)
+        schema.validate_file("recording", SimpleUploadedFile("call.mp3", b"x" * 1024))
+        with self.assertRaisesMessage(ValidationError, "exceeds maximum allowed size of 1KB"):
+            schema.validate_file("recording", SimpleUploadedFile("call.mp3", b"x" * 1025))
+        with self.assertRaisesMessage(ValidationError, "File extension 'wav' not allowed"):
+            schema.validate_file("recording", SimpleUploadedFile("call.wav", b"x"))
+        with self.assertRaisesMessage(ValidationError, "Field 'amount' is not a file field"):
+            schema.validate_file("amount", SimpleUploadedFile("call.mp3", b"x"))
+
+    def test_schemas_are_shared_by_content_and_follow_edits(self):
+        reordered = [dict(reversed(list(field.items()))) for field in self.feedback_fields]
+        self.assertIs(get_feedback_schema(self.feedback_fields), get_feedback_schema(reordered))
+
+        product = SimpleNamespace(pk="feedback-schema-test", feedback_fields=list(self.feedback_fields))
+        before = product_feedback_schema(product)
+        self.assertIs(product_feedback_schema(product), before)
+        product.feedback_fields.append({"name": "notes", "type": "text"})
+        self.assertIn("notes", product_feedback_schema(product).fields)
+
+
+class ContentAddressedUploadTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.storage = FileSystemStorage(location=self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_identical_content_is_stored_once(self):
+        first = store_upload(SimpleUploadedFile('a.MP3', b'recording'), storage=self.storage)
+        second = store_upload(SimpleUploadedFile('b.mp3', b'recording'), storage=self.storage)
+        other = store_upload(SimpleUploadedFile('c.mp3', b'another recording'), storage=self.storage)
+
+        digest = hashlib.sha256(b'recording').hexdigest()
+        self.assertEqual(first.path, content_path(digest, 'a.mp3'))
+        self.assertEqual((first.sha256, first.size, first.created), (digest, 9, True))
+        self.assertEqual((second.path, second.created), (first.path, False))
+        self.assertNotEqual(other.path, first.path)
+        self.assertEqual(sum(len(files) for _, _, files in os.walk(self.directory.name)), 2)
+
+    def test_large_upload_is_copied_from_disk(self):
+        upload = TemporaryUploadedFile('scan.pdf', 'application/pdf', 0, None)
+        block = os.urandom(1024 * 1024)
+        for _ in range(8):
+            upload.write(block)
+        upload.seek(0)
+
+        tracemalloc.start()
+        try:
+            stored = store_upload(upload, storage=self.storage)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            upload.close()
+
+        self.assertEqual(stored.size, 8 * 1024 * 1024)
+        self.assertEqual(self.storage.size(stored.path), stored.size)
+        self.assertLess(peak, 1024 * 1024)
+
+
+class DailyCallRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.institution = Institution.objects.create(
+            institution_owner=cls.owner, institution_name='Baifam', created_by=cls.owner
+        )
+        cls.loans = Product.objects.create(institution=cls.institution, name='Loans')
+        cls.savings = Product.objects.create(institution=cls.institution, name='Savings')
+        group = CallGroup.objects.create(institution=cls.institution, name='Group')
+        agent = Agent.objects.create(user=Profile.objects.get(user=cls.owner), device_id='d', extension='100')
+        cls.agent = CallGroupAgent.objects.create(call_group=group, agent=agent)
+        cls.contacts = {}
+        for index, product in enumerate([cls.loans, cls.savings]):
+            contact = Contact.objects.create(institution=cls.institution, name='Lead', phone_number=f'25470000000{index}')
+            cls.contacts[product] = ContactProduct.objects.create(contact=contact, product=product)
+
+    def call(self, product, made_on, status='completed', made_by=None):
+        return Call.objects.create(contact=self.contacts[product], made_on=made_on, status=status, made_by=made_by)
+
+    def counts(self):
+        return {
+            (row.date, row.product_id, row.agent_id, row.status): row.count
+            for row in DailyCallRollup.objects.filter(count__gt=0)
+        }
+
+    def test_buckets_follow_creates_updates_and_deletes(self):
+        # 22:30 UTC is already the next day in Nairobi (UTC+3)
+        late = datetime(2025, 3, 1, 22, 30, tzinfo=dt_timezone.utc)
+        first = self.call(self.loans, late, made_by=self.agent)
+        self.call(self.loans, late, made_by=self.agent)
+        busy = self.call(self.savings, datetime(2025, 3, 1, 8, tzinfo=dt_timezone.utc), status='busy')
+        self.assertEqual(self.counts(), {
+            (date(2025, 3, 2), self.loans.pk, self.agent.pk, 'completed'): 2,
+            (date(2025, 3, 1), self.savings.pk, None, 'busy'): 1,
+        })
+
+        first = Call.objects.get(pk=first.pk)
+        first.status = 'failed'
+        first.save()
+        busy.delete()
+        self.assertEqual(self.counts(), {
+            (date(2025, 3, 2), self.loans.pk, self.agent.pk, 'completed'): 1,
+            (date(2025, 3, 2), self.loans.pk, self.agent.pk, 'failed'): 1,
+        })
+
+    def test_backfill_matches_incremental_counts(self):
+        for day in range(1, 20):
+            self.call(self.loans, datetime(2025, 1, day, 21, tzinfo=dt_timezone.utc), made_by=self.agent)
+            self.call(self.savings, datetime(2025, 1, day, 9, tzinfo=dt_timezone.utc), status='failed')
+        incremental = self.counts()
+
+        DailyCallRollup.objects.all().delete()
+        windows = list(rebuild_rollups(days_per_batch=7))
+
+        self.assertEqual(len(windows), 3)
+        self.assertEqual(self.counts(), incremental)
+
+    def test_calls_carry_institution_and_product(self):
+        for product in (self.loans, self.savings):
+            self.call(product, datetime(2025, 4, 1, 9, tzinfo=dt_timezone.utc))
+        self.assertEqual(
+            set(Call.objects.values_list('institution_id', 'product_id')),
+            {(self.institution.pk, self.loans.pk), (self.institution.pk, self.savings.pk)},
+        )
+        Call.objects.update(institution=None, product=None)
+        out = io.StringIO()
+        call_command('backfill_call_tenants', batch_size=1, stdout=out)
+
+        self.assertIn('Filled 2 calls', out.getvalue())
+        self.assertFalse(Call.objects.filter(institution=None).exists())
+        self.assertEqual(set(Call.objects.values_list('product_id', flat=True)), {self.loans.pk, self.savings.pk})
+        self.assertNotIn('call_contactproduct', str(Call.objects.filter(institution=self.institution).query))
+
+    def test_report_endpoints_read_rollups(self):
+        for day in (1, 1, 2):
+            self.call(self.loans, datetime(2025, 5, day, 9, tzinfo=dt_timezone.utc), made_by=self.agent)
+        self.call(self.savings, datetime(2025, 5, 2, 9, tzinfo=dt_timezone.utc), status='busy')
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        params = {'start': '2025-05-01', 'end': '2025-05-03'}
+
+        with self.assertNumQueries(2):
+            grouped = client.get(reverse('call-report', args=[self.institution.id]), {**params, 'group_by': 'product,status'})
+        daily = client.get(reverse('call-report-daily', args=[self.institution.id]), params)
+
+        self.assertEqual(grouped.data['total'], 4)
+        self.assertCountEqual(
+            [(row['product__name'], row['status'], row['calls']) for row in grouped.data['results']],
+            [('Loans', 'completed', 3), ('Savings', 'busy', 1)],
+        )
+        self.assertEqual([day['total'] for day in daily.data['results']], [2, 2, 0])
+        self.assertEqual(daily.data['results'][1]['statuses'], {'busy': 1, 'completed': 1})
+
+    def test_report_filters_must_be_uuids(self):
+        self.call(self.loans, datetime(2025, 5, 1, 9, tzinfo=dt_timezone.utc), made_by=self.agent)
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        params = {'start': '2025-05-01', 'end': '2025-05-01'}
+
+        for name in ('report', 'report-daily'):
+            url = reverse(f'call-{name}', args=[self.institution.id])
+            self.assertEqual(client.get(url, {**params, 'product': 'abc'}).status_code, 400)
+            self.assertEqual(client.get(url, {**params, 'agent': 'x'}).status_code, 400)
+
+        filtered = client.get(
+            reverse('call-report', args=[self.institution.id]),
+            {**params, 'product': str(self.loans.pk), 'agent': str(self.agent.pk)},
+        )
+        self.assertEqual(filtered.data['total'], 1)
+
+
+class ContactClaimTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.institution = Institution.objects.create(
+            institution_owner=cls.owner, institution_name='Baifam', created_by=cls.owner
+        )
+        product = Product.objects.create(institution=cls.institution, name='Loans')
+        cls.group = CallGroup.objects.create(institution=cls.institution, name='Group')
+        cls.agents = []
+        for index in range(2):
+            user = CustomUser.objects.create_user(email=f'agent{index}@example.com', fullname=f'Agent {index}')
+            profile = Profile.objects.create(user=user, institution=cls.institution)
+            agent = Agent.objects.create(user=profile, device_id=f'd{index}', extension=f'10{index}')
+            cls.agents.append(CallGroupAgent.objects.create(call_group=cls.group, agent=agent))
+        for index in range(3):
+            contact = Contact.objects.create(institution=cls.institution, name=f'Lead {index}', phone_number=f'2547000000{index}')
+            contact_product = ContactProduct.objects.create(contact=contact, product=product)
+            CallGroupContact.objects.create(call_group=cls.group, contact=contact_product)
+
+    def test_agents_claim_different_contacts_and_keep_their_own(self):
+        first = claim_next_contact(self.agents[0])
+        second = claim_next_contact(self.agents[1])
+
+        self.assertNotEqual(first.pk, second.pk)
+        self.assertEqual(claim_next_contact(self.agents[0]).pk, first.pk)
+
+    def test_expired_lease_is_claimed_again(self):
+        abandoned = claim_next_contact(self.agents[0])
+        CallGroupContact.objects.filter(pk=abandoned.pk).update(lease_expires_at=timezone.now())
+        CallGroupContact.objects.exclude(pk=abandoned.pk).update(status='attended_to')
+
+        self.assertEqual(claim_next_contact(self.agents[1]).pk, abandoned.pk)
+        self.assertFalse(release_contact(abandoned, self.agents[0]))
+
+    def test_finished_contact_is_not_handed_back(self):
+        held = claim_next_contact(self.agents[0])
+        CallGroupContact.objects.filter(pk=held.pk).update(status='archived')
+
+        next_contact = claim_next_contact(self.agents[0])
+        self.assertNotEqual(next_contact.pk, held.pk)
+        self.assertEqual(next_contact.claimed_by, self.agents[0])
+
+    def test_patching_out_of_the_queue_drops_the_claim(self):
+        held = claim_next_contact(self.agents[0])
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        response = client.patch(reverse('callgroupcontact-detail', args=[held.uuid]), {'status': 'attended_to'})
+        self.assertEqual(response.status_code, 200)
+
+        held.refresh_from_db()
+        self.assertIsNone(held.claimed_by)
+        self.assertIsNone(held.lease_expires_at)
+        self.assertNotEqual(claim_next_contact(self.agents[0]).pk, held.pk)
+
+    def test_released_contacts_leave_the_queue(self):
+        client = APIClient()
+        client.force_authenticate(self.agents[0].agent.user.user)
+        claimed = []
+        while True:
+            response = client.post(reverse('call-group-claim-next', args=[self.group.uuid]))
+            if response.status_code == 204:
+                break
+            claimed.append(response.data['uuid'])
+            released = client.post(
+                reverse('callgroupcontact-release', args=[response.data['uuid']]), {'status': 'attended_to'}
+            )
+            self.assertEqual(released.status_code, 200)
+
+        self.assertEqual(len(set(claimed)), 3)
+        self.assertFalse(CallGroupContact.objects.filter(claimed_by__isnull=False).exists())
+
+
+class BulkAssignmentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.institution = Institution.objects.create(
+            institution_owner=cls.owner, institution_name='Baifam', created_by=cls.owner
+        )
+        cls.loans = Product.objects.create(institution=cls.institution, name='Loans')
+        cls.savings = Product.objects.create(institution=cls.institution, name='Savings')
+        cls.groups = [CallGroup.objects.create(institution=cls.institution, name=f'Group {i}') for i in range(3)]
+        contacts = Contact.objects.bulk_create(
+            Contact(institution=cls.institution, name=f'Lead {i}', phone_number=f'2547{i:08}',
+                    status='flagged' if i % 4 == 0 else 'new')
+            for i in range(60)
+        )
+        ContactProduct.objects.bulk_create(ContactProduct(contact=contact, product=cls.loans) for contact in contacts)
+        ContactProduct.objects.bulk_create(ContactProduct(contact=contact, product=cls.savings) for contact in contacts[:5])
+
+    def assign(self, **data):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        return client.post(
+            reverse('callgroupcontact-bulk-assign', args=[self.institution.id]), data, format='json'
+        )
+
+    def test_even_split_in_chunks(self):
+        contact_products = select_contact_products(self.institution, product=self.loans)
+
+        # Per page: its ids, a savepoint, the member probe, the insert, the
+        # inserted rows and the release; then the empty page that ends it
+        with self.assertNumQueries(3 * 6 + 1):
+            created = assign_contacts(contact_products, self.groups, chunk_size=25)
+
+        self.assertEqual(list(created.values()), [20, 20, 20])
+
+    def test_counts_only_the_rows_it_inserted(self):
+        contact_products = select_contact_products(self.institution, product=self.loans)
+        first = contact_products.order_by('pk').first()
+        bulk_create = CallGroupContact.objects.bulk_create
+
+        def concurrent_bulk_create(memberships, **kwargs):
+            # Another request adds one of the page's contacts and an unrelated one first
+            CallGroupContact.objects.create(call_group=self.groups[0], contact=first)
+            CallGroupContact.objects.create(
+                call_group=self.groups[0], contact=ContactProduct.objects.filter(product=self.savings).first()
+            )
+            return bulk_create(memberships, **kwargs)
+
+        with mock.patch.object(CallGroupContact.objects, 'bulk_create', concurrent_bulk_create):
+            created = assign_contacts(contact_products, self.groups[:1])
+
+        self.assertEqual(created, {self.groups[0].pk: 59})
+        self.assertEqual(CallGroupContact.objects.filter(call_group=self.groups[0]).count(), 61)
+
+    def test_weighted_split_by_status_skips_existing_members(self):
+        first = ContactProduct.objects.filter(product=self.loans, contact__status='new').order_by('pk').first()
+        CallGroupContact.objects.create(call_group=self.groups[1], contact=first)
+
+        response = self.assign(
+            call_groups=[str(self.groups[0].uuid), str(self.groups[1].uuid)],
+            weights=[3, 1],
+            product=str(self.loans.uuid),
+            status=['new'],
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['assigned'], 44)
+        self.assertEqual(response.data['call_groups'], {str(self.groups[0].uuid): 33, str(self.groups[1].uuid): 11})
+        self.assertEqual(CallGroupContact.objects.filter(contact=first).count(), 1)
+        self.assertEqual(self.assign(call_groups=[str(self.groups[0].uuid)], status=['new']).data['assigned'], 15)
+
+    def test_explicit_ids_and_validation(self):
+        ids = list(ContactProduct.objects.filter(product=self.savings).values_list('pk', flat=True))
+        other = Institution.objects.create(institution_owner=self.owner, institution_name='Other', created_by=self.owner)
+        foreign = CallGroup.objects.create(institution=other, name='Foreign')
+
+        response = self.assign(call_groups=[str(self.groups[2].uuid)], contact_products=ids)
+
+        self.assertEqual(response.data['assigned'], 5)
+        self.assertEqual(self.assign(call_groups=[str(self.groups[2].uuid)]).status_code, 400)
+        self.assertEqual(self.assign(call_groups=[str(foreign.uuid)], contact_products=ids).status_code, 400)
+        self.assertEqual(
+            self.assign(call_groups=[str(self.groups[0].uuid)], weights=[1, 2], contact_products=ids).status_code, 400
+        )
+
+
+class BulkStatusTransitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.institution = Institution.objects.create(
+            institution_owner=cls.owner, institution_name='Baifam', created_by=cls.owner
+        )
+        product = Product.objects.create(institution=cls.institution, name='Loans')
+        cls.group = CallGroup.objects.create(institution=cls.institution, name='Group')
+        statuses = ['new', 'flagged', 'exported']
+        contacts = Contact.objects.bulk_create(
+            Contact(institution=cls.institution, name=f'Lead {i}', phone_number=f'2547{i:08}', status=statuses[i % 3])
+            for i in range(30)
+        )
+        contact_products = ContactProduct.objects.bulk_create(
+            ContactProduct(contact=contact, product=product) for contact in contacts
+        )
+        CallGroupContact.objects.bulk_create(
+            CallGroupContact(call_group=cls.group, contact=contact_product, status='follow_up' if i % 2 else 'attended_to')
+            for i, contact_product in enumerate(contact_products)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_only_allowed_sources_move_one_update_per_chunk(self):
+        contacts = Contact.objects.filter(institution=self.institution)
+
+        # A count, then per page: its ids, a savepoint, the locked read, the UPDATE, the release
+        with self.assertNumQueries(1 + 4 * 5 + 1):
+            result = transition_statuses(contacts, 'assigned', chunk_size=6)
+
+        self.assertEqual(result, {'updated': 20, 'skipped': 10, 'by_status': {'new': 10, 'flagged': 10}})
+        self.assertEqual(contacts.filter(status='assigned').count(), 20)
+        self.assertEqual(transition_statuses(contacts, 'new', sources=['archived'])['updated'], 0)
+
+    def test_contact_endpoint_validates_transitions(self):
+        url = reverse('contact-bulk-transition', args=[self.institution.id])
+        ids = list(Contact.objects.filter(status='flagged').values_list('pk', flat=True)[:4])
+
+        moved = self.client.post(url, {'to_status': 'new', 'ids': [str(pk) for pk in ids]}, format='json')
+        refused = self.client.post(url, {'to_status': 'new', 'from_status': ['exported']}, format='json')
+        unselected = self.client.post(url, {'to_status': 'new'}, format='json')
+
+        self.assertEqual(moved.data, {'updated': 4, 'skipped': 0, 'by_status': {'flagged': 4}})
+        self.assertEqual(refused.status_code, 400)
+        self.assertIn('from_status', refused.data)
+        self.assertEqual(unselected.status_code, 400)
+
+    def test_leaving_the_dialer_queue_drops_claims(self):
+        agent = Agent.objects.create(user=Profile.objects.get(user=self.owner), device_id='d', extension='100')
+        call_group_agent = CallGroupAgent.objects.create(call_group=self.group, agent=agent)
+        claimed = claim_next_contact(call_group_agent)
+        url = reverse('callgroupcontact-bulk-transition', args=[self.institution.id])
+
+        response = self.client.post(
+            url, {'to_status': 'attended_to', 'from_status': ['follow_up'], 'call_group': str(self.group.uuid)}, format='json'
+        )
+
+        self.assertEqual(response.data['by_status'], {'follow_up': 15})
+        self.assertEqual(response.data['skipped'], 0)
+        claimed.refresh_from_db()
+        self.assertEqual(claimed.status, 'attended_to')
+        self.assertIsNone(claimed.claimed_by)
+        self.assertEqual(CallGroupContact.objects.filter(status='attended_to').count(), 30)
+
+
+class CallBatchLogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.institution = Institution.objects.create(
+            institution_owner=cls.owner, institution_name='Baifam', created_by=cls.owner
+        )
+        cls.product = Product.objects.create(
+            institution=cls.institution,
+            name='Loans',
+            feedback_fields=[
+                {'name': 'outcome', 'type': 'select', 'options': ['sold', 'declined'], 'is_required': True},
+            ],
+        )
+        group = CallGroup.objects.create(institution=cls.institution, name='Group')
+        agent = Agent.objects.create(user=Profile.objects.get(user=cls.owner), device_id='d', extension='100')
+        cls.agent = CallGroupAgent.objects.create(call_group=group, agent=agent)
+        cls.contact_products = []
+        for index in range(30):
+            contact = Contact.objects.create(institution=cls.institution, name=f'Lead {index}', phone_number=f'2547{index:08}')
+            contact_product = ContactProduct.objects.create(contact=contact, product=cls.product)
+            CallGroupContact.objects.create(call_group=group, contact=contact_product)
+            cls.contact_products.append(contact_product)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def calls(self, count, outcome='sold'):
+        return [
+            {
+                'idempotency_key': str(uuid.uuid4()),
+                'contact': str(contact_product.uuid),
+                'feedback': {'outcome': outcome},
+                'made_on': '2025-06-01T09:00:00Z',
+            }
+            for contact_product in self.contact_products[:count]
+        ]
+
+    def log(self, calls):
+        return self.client.post(
+            reverse('call-batch-log', args=[self.institution.id]), {'calls': calls}, format='json'
+        )
+
+    def test_batch_cost_does_not_depend_on_its_size(self):
+        with CaptureQueriesContext(connection) as small:
+            self.log(self.calls(3))
+        with CaptureQueriesContext(connection) as large:
+            response = self.log(self.calls(30))
+
+        # The first batch also creates the day's rollup row
+        self.assertEqual(len(small), len(large) + 3)
+        self.assertEqual(response.data['created'], 30)
+        self.assertEqual(Call.objects.filter(made_by=self.agent).count(), 33)
+        self.assertEqual(DailyCallRollup.objects.get(date=date(2025, 6, 1)).count, 33)
+
+    def test_replays_are_reported_as_duplicates(self):
+        calls = self.calls(5)
+        first = self.log(calls)
+
+        replay = self.log(calls + [calls[0]])
+
+        self.assertEqual(first.data['created'], 5)
+        self.assertEqual(replay.data['duplicate'], 6)
+        self.assertEqual(replay.data['results'][5]['uuid'], first.data['results'][0]['uuid'])
+        self.assertEqual(Call.objects.count(), 5)
+
+    def test_invalid_items_do_not_block_the_rest(self):
+        calls = self.calls(3)
+        calls[1]['feedback'] = {'outcome': 'maybe'}
+        calls[2]['contact'] = str(uuid.uuid4())
+        calls.append({'contact': str(self.contact_products[0].uuid)})
+
+        response = self.log(calls)
+
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'invalid', 'invalid', 'invalid'])
+        self.assertIn('feedback', response.data['results'][1]['errors'])
+        self.assertIn('contact', response.data['results'][2]['errors'])
+        self.assertIn('idempotency_key', response.data['results'][3]['errors'])
+        self.assertEqual(Call.objects.count(), 1)
+
+    def test_feedback_that_is_not_an_object_only_rejects_its_item(self):
+        calls = self.calls(3)
+        calls[1]['feedback'] = 'abc'
+        calls[2]['feedback'] = [1]
+
+        response = self.log(calls)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'invalid', 'invalid'])
+        self.assertIn('feedback', response.data['results'][1]['errors'])
+        self.assertIn('feedback', response.data['results'][2]['errors'])
+        self.assertEqual(Call.objects.count(), 1)
+
+
+class ContactTemplateCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.institution = Institution.objects.create(
+            institution_owner=cls.owner, institution_name='Baifam', created_by=cls.owner
+        )
+        cls.product = Product.objects.create(institution=cls.institution, name='Loans')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.url = reverse('contact-template-download', args=[self.product.uuid])
+
+    def product_info(self, response):
+        workbook = openpyxl.load_workbook(io.BytesIO(response.content), read_only=True)
+        return [row for row in workbook['Product_Info'].iter_rows(values_only=True)][2]
+
+    def test_repeat_downloads_are_served_from_cache(self):
+        first = self.client.get(self.url)
+        with mock.patch('call.import_templates.build_contact_template', wraps=build_contact_template) as build:
+            second = self.client.get(self.url)
+            revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        build.assert_not_called()
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], first['ETag'])
+        self.assertEqual(self.product_info(first), ('Product Name', 'Loans'))
+
+    def test_saving_the_product_rebuilds_the_template(self):
+        first = self.client.get(self.url)
+        self.product.name = 'Home Mortgages'
+        self.product.save()
+
+        with mock.patch('call.import_templates.build_contact_template', wraps=build_contact_template) as build:
+            stale = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        build.assert_called_once()
+        self.assertEqual(stale.status_code, 200)
+        self.assertNotEqual(stale['ETag'], first['ETag'])
+        self.assertEqual(self.product_info(stale), ('Product Name', 'Home Mortgages'))
+        self.assertEqual(stale['Content-Disposition'], 'attachment; filename="contacts_template_Home_Mortgages.xlsx"')
+
+
+@override_settings(PHONE_DEFAULT_COUNTRY_CODE='254')
+class ContactSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.institution = Institution.objects.create(
+            institution_owner=cls.owner, institution_name='Baifam', created_by=cls.owner
+        )
+        other = Institution.objects.create(institution_owner=cls.owner, institution_name='Other', created_by=cls.owner)
+        for name, phone, remarks in [
+            ('Grace Wanjiru', '+254712345678', 'Met at the Nakuru expo'),
+            ('Grace Otieno', '0712999000', None),
+            ('Peter Kamau', '254733000111', 'Wants a follow up about Grace'),
+            ('Li Wei', '+254700000001', None),
+        ]:
+            Contact.objects.create(institution=cls.institution, name=name, phone_number=phone, remarks=remarks)
+        Contact.objects.create(institution=other, name='Grace Hidden', phone_number='+254712000000')
+
+    def search(self, query):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        response = client.get(reverse('contact-search', args=[self.institution.id]), {'q': query})
+        return [contact['name'] for contact in response.data['results']]
+
+    def test_words_match_names_and_remarks(self):
+        self.assertEqual(self.search('grace'), ['Grace Otieno', 'Grace Wanjiru', 'Peter Kamau'])
+        self.assertEqual(self.search('wanj grace'), ['Grace Wanjiru'])
+        self.assertEqual(self.search('nakuru'), ['Grace Wanjiru'])
+        self.assertEqual(self.search('li'), ['Li Wei'])
+
+    def test_phone_prefixes_ignore_formatting(self):
+        # Prefixes match the E.164 form, however the number was stored
+        self.assertEqual(self.search('+254 712'), ['Grace Wanjiru', 'Grace Otieno'])
+        self.assertEqual(self.search('0712-999'), ['Grace Otieno'])
+        self.assertEqual(self.search('712 999'), ['Grace Otieno'])
+        self.assertEqual(self.search('2547'), ['Li Wei', 'Grace Wanjiru', 'Grace Otieno', 'Peter Kamau'])
+
+    def test_index_follows_edits(self):
+        contact = Contact.objects.get(name='Li Wei')
+        contact.name = 'Wei Zhang'
+        contact.save()
+        Contact.objects.get(name='Peter Kamau').delete()
+
+        self.assertEqual(self.search('zhang'), ['Wei Zhang'])
+        self.assertEqual(self.search('grace'), ['Grace Otieno', 'Grace Wanjiru'])
+
+    @skipUnless(connection.vendor == 'postgresql', "Similar-word matching needs pg_trgm")
+    def test_typos_fall_back_to_similar_words(self):
+        self.assertEqual(self.search('grace wanjir'), ['Grace Wanjiru'])
+        self.assertEqual(self.search('grace wanjirx'), ['Grace Wanjiru'])
+
+
+@override_settings(PHONE_DEFAULT_COUNTRY_CODE='254')
+class PhoneNormalizationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.institution = Institution.objects.create(
+            institution_owner=cls.owner, institution_name='Baifam', created_by=cls.owner
+        )
+        cls.product = Product.objects.create(institution=cls.institution, name='Loans')
+        cls.contact = Contact.objects.create(
+            institution=cls.institution, name='Grace Wanjiru', phone_number='+254 712 345678'
+        )
+
+    def test_written_forms_share_one_number(self):
+        for written, country_code in [
+            ('+254 712 345678', None), ('0712345678', None), ('254712345678', None), ('712-345-678', '+254'),
+            ('00254712345678', None), ('(0712) 345 678', '254'),
+        ]:
+            self.assertEqual(normalize_e164(written, country_code), '+254712345678', written)
+        self.assertEqual(normalize_e164('0701234567', '+256'), '+256701234567')
+        self.assertEqual(normalize_e164('256701234567'), '+256701234567')
+        for invalid in ['', 'n/a', '1234', '+1234567890123456']:
+            self.assertIsNone(normalize_e164(invalid), invalid)
+        self.assertEqual(self.contact.phone_e164, '+254712345678')
+
+    def test_import_rejects_numbers_written_another_way(self):
+        frame = pd.DataFrame({
+            'name': ['Same As Stored', 'New', 'New Again', 'Unparsed', 'Unparsed Again'],
+            'phone_number': ['0712 345 678', '254733000111', '+254 733 000 111', 'ext 12', 'ext 12'],
+        })
+        with CaptureQueriesContext(connection) as queries:
+            result = import_contacts(frame, self.product)
+
+        self.assertEqual([contact['name'] for contact in result.created_contacts], ['New', 'Unparsed'])
+        self.assertEqual([error.split(':')[0] for error in result.errors], ['Row 2', 'Row 4', 'Row 6'])
+        self.assertEqual(Contact.objects.get(name='New').phone_e164, '+254733000111')
+        self.assertIsNone(Contact.objects.get(name='Unparsed').phone_e164)
+        # One probe of the E.164 index, one of the raw text for the
+        # number that does not normalize, then the batch insert
+        lookups = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertEqual(len(lookups), 2)
+
+    def test_known_numbers_replace_the_lookups(self):
+        known_numbers = KnownPhoneNumbers.for_institution(self.institution.id)
+        self.assertEqual((len(known_numbers), known_numbers.nbytes), (1, 8))
+        # Stored after the snapshot, in another institution: only the unique index knows
+        other = Institution.objects.create(institution_owner=self.owner, institution_name='Other', created_by=self.owner)
+        Contact.objects.create(institution=other, name='Elsewhere', phone_number='0744000222')
+
+        first = pd.DataFrame({'name': ['Same As Stored', 'New'], 'phone_number': ['0712 345 678', '0733000111']})
+        second = pd.DataFrame({'name': ['Repeat', 'Elsewhere'], 'phone_number': ['254733000111', '+254744000222']})
+        second.index += len(first)
+        with CaptureQueriesContext(connection) as queries:
+            result = import_contacts(first, self.product, known_numbers=known_numbers)
+            result = import_contacts(second, self.product, result=result, known_numbers=known_numbers)
+
+        self.assertEqual([contact['name'] for contact in result.created_contacts], ['New'])
+        self.assertEqual([error.split(':')[0] for error in result.errors], ['Row 2', 'Row 4', 'Row 5'])
+        # Only the batch that hit the unique index went back to the database
+        lookups = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertEqual(len(lookups), 2)
+
+    def test_caller_lookup_finds_any_written_form(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        url = reverse('contact-caller-lookup', args=[self.institution.id])
+
+        response = client.get(url, {'phone': '0712-345-678'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['uuid'], str(self.contact.uuid))
+        self.assertEqual(client.get(url, {'phone': '+254700000000'}).status_code, 404)
+        self.assertEqual(client.get(url, {'phone': 'unknown'}).status_code, 400)
+
+        other = Institution.objects.create(institution_owner=self.owner, institution_name='Other', created_by=self.owner)
+        response = client.get(reverse('contact-caller-lookup', args=[other.id]), {'phone': '0712345678'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_create_rejects_a_number_stored_in_another_form(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        response = client.post(reverse('contact-list-create', args=[self.institution.id]), {
+            'name': 'Duplicate', 'phone_number': '0712345678', 'institution': self.institution.id,
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('phone_number', response.data)
+
+    def test_backfill_fills_legacy_rows_and_skips_duplicates(self):
+        Contact.objects.filter(pk=self.contact.pk).update(phone_e164=None)
+        Contact.objects.bulk_create([
+            Contact(institution=self.institution, name='Copy', phone_number='0712345678'),
+            Contact(institution=self.institution, name='Other', phone_number='0733000111'),
+            Contact(institution=self.institution, name='Unparsed', phone_number='ext 12'),
+        ])
+        out = io.StringIO()
+        call_command('backfill_contact_phones', batch_size=2, stdout=out)
+
+        numbers = dict(Contact.objects.values_list('name', 'phone_e164'))
+        self.assertEqual(numbers['Other'], '+254733000111')
+        self.assertIsNone(numbers['Unparsed'])
+        # Only one of the two forms of the same number can hold it
+        self.assertEqual([numbers['Grace Wanjiru'], numbers['Copy']].count('+254712345678'), 1)
+        self.assertEqual([numbers['Grace Wanjiru'], numbers['Copy']].count(None), 1)
+        self.assertIn('1 contacts share a number', out.getvalue())
+
+    def test_legacy_duplicate_without_e164_stays_editable(self):
+        duplicate = Contact.objects.create(institution=self.institution, name='Copy', phone_number='0733000111')
+        Contact.objects.filter(pk=duplicate.pk).update(phone_number='0712345678', phone_e164=None)
+        client = APIClient()
+        client.force_authenticate(self.owner)
+
+        response = client.patch(reverse('contact-detail', args=[duplicate.uuid]), {
+            'remarks': 'Merge with Grace', 'institution': self.institution.id,
+        })
+        self.assertEqual(response.status_code, 200, response.data)
+        duplicate = Contact.objects.get(pk=duplicate.pk)
+        duplicate.name = 'Copy of Grace'
+        duplicate.save()
+
+        duplicate.refresh_from_db()
+        self.assertEqual(
+            (duplicate.name, duplicate.remarks, duplicate.phone_e164), ('Copy of Grace', 'Merge with Grace', None)
+        )
+        response = client.patch(reverse('contact-detail', args=[duplicate.uuid]), {
+            'phone_number': '+254 712 345 678', 'institution': self.institution.id,
+        })
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,88 @@
+import logging
+from collections import Counter
+
+from django.db import transaction
+
+from .models import CLAIMABLE_CONTACT_STATUSES, CallGroupContact, Contact
+
+logger = logging.getLogger(__name__)
+
+TRANSITION_CHUNK_SIZE = 2000
+
+# Source status -> statuses a supervisor may move it to in bulk
+CONTACT_STATUS_TRANSITIONS = {
+    'new': {'assigned', 'flagged', 'archived'},
+    'assigned': {'new', 'attended_to', 'flagged', 'archived'},
+    'attended_to': {'assigned', 'ready_to_export', 'flagged', 'archived'},
+    'flagged': {'new', 'assigned', 'archived'},
+    'ready_to_export': {'attended_to', 'exported', 'flagged', 'archived'},
+    'exported': {'archived'},
+    'archived': {'new'},
+}
+
+CALL_GROUP_CONTACT_STATUS_TRANSITIONS = {
+    'new': {'asigned', 'attended_to', 'not_attended', 'follow_up'},
+    'asigned': {'new', 'attended_to', 'not_attended', 'follow_up'},
+    'not_attended': {'new', 'asigned', 'attended_to', 'follow_up'},
+    'follow_up': {'new', 'asigned', 'attended_to', 'not_attended'},
+    'attended_to': {'follow_up', 'ready_to_export'},
+    'ready_to_export': {'attended_to', 'exported'},
+    'exported': set(),
+}
+
+STATUS_TRANSITIONS = {
+    Contact: CONTACT_STATUS_TRANSITIONS,
+    CallGroupContact: CALL_GROUP_CONTACT_STATUS_TRANSITIONS,
+}
+
+
+def allowed_sources(model, target):
+    """Statuses of ``model`` that may move to ``target``, in a stable order."""
+    return sorted(source for source, targets in STATUS_TRANSITIONS[model].items() if target in targets)
+
+
+def _extra_updates(model, target):
+    if model is CallGroupContact and target not in CLAIMABLE_CONTACT_STATUSES:
+        # The dialer no longer hands the row out, so an open claim on it is moot
+        return {'claimed_by': None, 'lease_expires_at': None}
+    return {}
+
+
+def transition_statuses(queryset, target, sources=None, chunk_size=TRANSITION_CHUNK_SIZE):
+    """
+    Move every row of ``queryset`` whose status is an allowed source to ``target``.
+
+    ``sources`` narrows the allowed source statuses further. Rows are
+    walked in primary key order one keyset page at a time; each page is
+    locked, counted by its current status and changed with a single
+    ``UPDATE`` in its own transaction, so the per-status counts returned
+    match exactly what was written even while agents keep working.
+
+    Returns ``{'updated': n, 'skipped': n, 'by_status': {source: n}}``,
+    where ``skipped`` counts matching rows left alone because their
+    status may not move to ``target``.
+    """
+    model = queryset.model
+    permitted = allowed_sources(model, target)
+    if sources is not None:
+        permitted = [source for source in permitted if source in set(sources)]
+    extra = _extra_updates(model, target)
+
+    skipped = queryset.exclude(status__in=permitted + [target]).count()
+    candidates = queryset.filter(status__in=permitted).order_by('pk').values_list('pk', flat=True)
+    by_status = Counter()
+    last_pk = None
+    while permitted:
+        page = candidates if last_pk is None else candidates.filter(pk__gt=last_pk)
+        ids = list(page[:chunk_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            rows = model.objects.select_for_update().filter(pk__in=ids, status__in=permitted)
+            by_status.update(status for status in rows.values_list('status', flat=True))
+            rows.update(status=target, **extra)
+        last_pk = ids[-1]
+
+    updated = sum(by_status.values())
+    logger.info("Moved %s %s rows to %s (%s skipped)", updated, model.__name__, target, skipped)
+    return {'updated': updated, 'skipped': skipped, 'by_status': dict(by_status)}
@@ -0,0 +1,57 @@
+import hashlib
+import logging
+import os
+from dataclasses import dataclass
+
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+CALL_UPLOADS_ROOT = "uploads/calls"
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class StoredFile:
+    path: str
+    sha256: str
+    size: int
+    created: bool
+
+
+def file_digest(file, chunk_size=UPLOAD_CHUNK_SIZE):
+    """SHA-256 hex digest and byte size of an uploaded file, read in chunks."""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in file.chunks(chunk_size):
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return digest.hexdigest(), size
+
+
+def content_path(sha256, file_name, root=CALL_UPLOADS_ROOT):
+    """Storage path for a digest, fanned out over two directory levels to keep folders small."""
+    extension = os.path.splitext(file_name)[1].lower()
+    return f"{root}/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+
+def store_upload(file, root=CALL_UPLOADS_ROOT, storage=default_storage):
+    """
+    Save an uploaded file under a path derived from its SHA-256 digest.
+
+    The digest is computed over ``file.chunks()`` and the storage backend
+    copies the file chunk by chunk as well, so the upload is never read
+    into memory whole. Content that is already stored is not written
+    again; callers get the existing path back with ``created=False``.
+    """
+    sha256, size = file_digest(file)
+    path = content_path(sha256, file.name, root)
+    if storage.exists(path):
+        return StoredFile(path=path, sha256=sha256, size=size, created=False)
+    saved_path = storage.save(path, file)
+    if saved_path != path:
+        # Another request stored the same content between the exists()
+        # check and the save; both copies hold identical bytes.
+        logger.info("Concurrent upload of %s stored as %s", path, saved_path)
+    return StoredFile(path=saved_path, sha256=sha256, size=size, created=True)
@@ -2,19 +2,32 @@ from django.urls import path
 from .views import (
     AgentDetailView,
     AgentListCreateView,
+    CallBatchLogView,
     CallDetailAPIView,
+    CallGroupClaimNextContactView,
+    CallGroupContactBulkAssignView,
+    CallGroupContactBulkTransitionView,
     CallGroupContactDetailView,
+    CallGroupContactReleaseView,
     CallGroupContactListCreateView,
     CallGroupListCreateView,
     CallGroupDetailView,
     CallGroupAgentDetailView,
     CallGroupAgentListCreateView,
+    CallDailyReportView,
     CallListCreateAPIView,
+    CallReportView,
+    ContactBulkTransitionView,
     ContactBulkUploadView,
+    ContactCallerLookupView,
     ContactDetailView,
+    ContactExportView,
+    ContactImportJobCreateView,
+    ContactImportJobDetailView,
     ContactListCreateView,
     ContactProductDetailView,
     ContactProductListCreateView,
+    ContactSearchView,
     ContactTemplateDownloadView,
     ContactsByCallGroupContactListCreateView,
     UserCallGroupsListView,
@@ -37,6 +50,7 @@ urlpatterns = [
         name="callgroup-detail",
     ),
     path("groups/contacts/<uuid:call_group_uuid>/", ContactsByCallGroupContactListCreateView.as_view(), name="call-group-contacts"),
+    path("groups/<uuid:call_group_uuid>/claim-next/", CallGroupClaimNextContactView.as_view(), name="call-group-claim-next"),
     path(
         "group-users/<int:institution_id>/",
         CallGroupAgentListCreateView.as_view(),
@@ -52,6 +66,21 @@ urlpatterns = [
         ContactListCreateView.as_view(),
         name="contact-list-create",
     ),
+    path(
+        "contacts/institution/<int:institution_id>/caller/",
+        ContactCallerLookupView.as_view(),
+        name="contact-caller-lookup",
+    ),
+    path(
+        "contacts/institution/<int:institution_id>/search/",
+        ContactSearchView.as_view(),
+        name="contact-search",
+    ),
+    path(
+        "contacts/institution/<int:institution_id>/transition/",
+        ContactBulkTransitionView.as_view(),
+        name="contact-bulk-transition",
+    ),
     path(
         "contacts/<uuid:product_uuid>/template/",
         ContactTemplateDownloadView.as_view(),
@@ -67,22 +96,55 @@ urlpatterns = [
         ContactBulkUploadView.as_view(),
         name="contact-bulk-upload",
     ),
+    path(
+        "contacts/<uuid:product_uuid>/export/",
+        ContactExportView.as_view(),
+        name="contact-export",
+    ),
+    path(
+        "contacts/<uuid:product_uuid>/import-jobs/",
+        ContactImportJobCreateView.as_view(),
+        name="contact-import-job-create",
+    ),
+    path(
+        "contacts/import-jobs/<uuid:uuid>/",
+        ContactImportJobDetailView.as_view(),
+        name="contact-import-job-detail",
+    ),
     path(
         "group-contacts/<int:institution_id>/",
         CallGroupContactListCreateView.as_view(),
         name="callgroupcontact-list-create",
     ),
+    path(
+        "group-contacts/<int:institution_id>/bulk-assign/",
+        CallGroupContactBulkAssignView.as_view(),
+        name="callgroupcontact-bulk-assign",
+    ),
+    path(
+        "group-contacts/<int:institution_id>/transition/",
+        CallGroupContactBulkTransitionView.as_view(),
+        name="callgroupcontact-bulk-transition",
+    ),
     path(
         "group-contacts/detail/<uuid:uuid>/",
         CallGroupContactDetailView.as_view(),
         name="callgroupcontact-detail",
     ),
+    path(
+        "group-contacts/detail/<uuid:uuid>/release/",
+        CallGroupContactReleaseView.as_view(),
+        name="callgroupcontact-release",
+    ),
     path(
         "institution/<int:institution_id>/",
         CallListCreateAPIView.as_view(),
         name="call-list-create",
     ),
+    path("institution/<int:institution_id>/batch/", CallBatchLogView.as_view(), name="call-batch-log"),
     path("detail/<uuid:uuid>/", CallDetailAPIView.as_view(), name="call-detail"),
+    path("reports/<int:institution_id>/", CallReportView.as_view(), name="call-report"),
+    path("reports/<int:institution_id>/daily/", CallDailyReportView.as_view(), name="call-report-daily"),
     path("contact-calls/<uuid:contact_uuid>/", ContactCallsListView.as_view(), name="contact-calls"),
     path('institutions/<int:institution_id>/contact-products/', ContactProductListCreateView.as_view(), name='contact-product-list-create'),
     path('contact-products/<uuid:uuid>/', ContactProductDetailView.as_view(), name='contact-product-detail'),
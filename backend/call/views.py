@@ -4,22 +4,36 @@ from rest_framework.response import Response
 from rest_framework import status, permissions
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse, OpenApiTypes
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 
 from users.models import Profile
-from .models import Agent, CallGroup, CallGroupContact, CallGroupAgent, Contact, Call, ContactProduct
+from users.serializers import CustomUserSerializer
+from .models import Agent, CallGroup, CallGroupContact, CallGroupAgent, Contact, Call, ContactProduct, ImportJob
 from institution.models import Institution, Product
-from .serializers import AgentSerializer, BulkContactSerializer, CallGroupContactSerializer, CallGroupSerializer, CallGroupAgentSerializer, CallSerializer, ContactProductSerializer, ContactSerializer
+from .call_log import MAX_CALL_BATCH_SIZE, log_call_batch
+from .assignment import assign_contacts, select_contact_products
+from .dialer import DEFAULT_LEASE_SECONDS, MAX_LEASE_SECONDS, claim_next_contact, release_contact
+from .exporters import ContactExport, streaming_content
+from .import_templates import CONTENT_TYPE as TEMPLATE_CONTENT_TYPE, contact_template, template_digest
+from .importers import CONTACT_FILE_EXTENSIONS, ContactFileError, import_contact_file
+from .jobs import start_import_job
+from .phones import normalize_e164
+from .search import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, search_contacts
+from .transitions import transition_statuses
+from .rollups import REPORT_DIMENSIONS, local_date as rollup_local_date, rollup_report
+from .serializers import AgentSerializer, CallGroupAssignmentSerializer, CallLogItemSerializer, CallGroupContactSerializer, CallGroupContactTransitionSerializer, ContactTransitionSerializer, CallGroupSerializer, CallGroupAgentSerializer, CallSerializer, ContactProductSerializer, ContactSerializer, ImportJobSerializer
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-import pandas as pd
-from django.http import HttpResponse
-import io
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
 import uuid as uuid_module
+from datetime import date, timedelta
 import logging
-from openpyxl.styles import Font, PatternFill, Alignment
+from utilities.pagination import KeysetPagination
 
 logger = logging.getLogger(__name__)
 @extend_schema(tags=["CallGroup"])
 class CallGroupListCreateView(APIView):
+    query_budget = {'GET': 5}
 
     @extend_schema(
         summary="List all call groups for a specific institution",
@@ -30,8 +44,13 @@ class CallGroupListCreateView(APIView):
     )
     def get(self, request, institution_id):
         institution = get_object_or_404(Institution, id=institution_id)
-        groups = CallGroup.objects.filter(institution=institution)
-        serializer = CallGroupSerializer(groups, many=True)
+        groups = list(
+            CallGroup.objects.filter(institution=institution)
+            .select_related('institution')
+            .prefetch_related('institution__documents')
+        )
+        context = CallGroupSerializer.summary_context(group.pk for group in groups)
+        serializer = CallGroupSerializer(groups, many=True, context=context)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @extend_schema(
@@ -58,12 +77,24 @@ class CallGroupDetailView(APIView):
 
     @extend_schema(
         summary="Retrieve a call group by UUID",
+        description="Pass `expand=contacts` to include a cursor-paginated page of the group's contacts.",
+        parameters=[
+            OpenApiParameter(name="expand", required=False, type=str, location=OpenApiParameter.QUERY, enum=["contacts"]),
+            OpenApiParameter(name="cursor", required=False, type=str, location=OpenApiParameter.QUERY),
+            OpenApiParameter(name="page_size", required=False, type=int, location=OpenApiParameter.QUERY),
+        ],
         responses={200: CallGroupSerializer}
     )
     def get(self, request, uuid):
         group = self.get_object(uuid)
-        serializer = CallGroupSerializer(group)
-        return Response(serializer.data)
+        data = CallGroupSerializer(group).data
+        if 'contacts' in request.query_params.get('expand', '').split(','):
+            members = CallGroupContact.objects.filter(call_group=group).values('contact__contact')
+            contacts = ContactSerializer.setup_eager_loading(Contact.objects.filter(pk__in=members))
+            paginator = KeysetPagination(ordering=('name', 'uuid'))
+            page = paginator.paginate_queryset(contacts, request)
+            data['contacts'] = paginator.get_paginated_response(ContactSerializer(page, many=True).data).data
+        return Response(data)
 
     @extend_schema(
         summary="Partially update a call group by UUID",
@@ -99,8 +130,13 @@ class CallGroupAgentListCreateView(APIView):
     )
     def get(self, request, institution_id):
         institution = get_object_or_404(Institution, id=institution_id)
-        users = CallGroupAgent.objects.filter(call_group__institution=institution)
-        serializer = CallGroupAgentSerializer(users, many=True)
+        users = list(
+            CallGroupAgent.objects.filter(call_group__institution=institution)
+            .select_related('call_group__institution', 'agent__user')
+            .prefetch_related('call_group__institution__documents')
+        )
+        context = CallGroupSerializer.summary_context(user.call_group_id for user in users)
+        serializer = CallGroupAgentSerializer(users, many=True, context=context)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @extend_schema(
@@ -167,27 +203,38 @@ class UserCallGroupsListView(APIView):
     )
     def get(self, request, institution_id):
         user = request.user
-        groups = CallGroup.objects.filter(users__user=user, institution__id=institution_id, users__status="active").distinct()
-        serializer = CallGroupSerializer(groups, many=True)
+        groups = list(
+            CallGroup.objects.filter(users__user=user, institution__id=institution_id, users__status="active")
+            .distinct()
+            .select_related('institution')
+            .prefetch_related('institution__documents')
+        )
+        context = CallGroupSerializer.summary_context(group.pk for group in groups)
+        serializer = CallGroupSerializer(groups, many=True, context=context)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 
 @extend_schema(tags=["Contact"])
 class ContactListCreateView(APIView):
+    query_budget = {'GET': 6}
 
     @extend_schema(
         summary="List Contacts for a specific institution",
         parameters=[
             OpenApiParameter(name="institution_id", required=True, type=int, location=OpenApiParameter.PATH),
+            OpenApiParameter(name="cursor", required=False, type=str, location=OpenApiParameter.QUERY),
+            OpenApiParameter(name="page_size", required=False, type=int, location=OpenApiParameter.QUERY),
         ],
         responses={200: ContactSerializer(many=True)}
     )
     def get(self, request, institution_id):
         institution = get_object_or_404(Institution, id=institution_id)
-        contacts = Contact.objects.filter(institution=institution).prefetch_related('contact_products__product__institution')
-        serializer = ContactSerializer(contacts, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        contacts = ContactSerializer.setup_eager_loading(Contact.objects.filter(institution=institution))
+        paginator = KeysetPagination(ordering=('name', 'uuid'))
+        page = paginator.paginate_queryset(contacts, request)
+        serializer = ContactSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     @extend_schema(
         summary="Create a Contact (within specified institution)",
@@ -206,6 +253,66 @@ class ContactListCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@extend_schema(tags=["Contact"])
+class ContactSearchView(APIView):
+    query_budget = {'GET': 7}
+
+    @extend_schema(
+        summary="Search the contacts of an institution",
+        description=(
+            "A query of digits (spaces, dashes, brackets and a leading + are ignored) matches phone number "
+            "prefixes. Other queries match contacts whose name or remarks contain every word; on PostgreSQL "
+            "names similar to the query also match, best matches first."
+        ),
+        parameters=[
+            OpenApiParameter(name="institution_id", required=True, type=int, location=OpenApiParameter.PATH),
+            OpenApiParameter(name="q", required=True, type=str, location=OpenApiParameter.QUERY),
+            OpenApiParameter(name="limit", required=False, type=int, location=OpenApiParameter.QUERY),
+        ],
+        responses={200: ContactSerializer(many=True)}
+    )
+    def get(self, request, institution_id):
+        institution = get_object_or_404(Institution, id=institution_id)
+        query = request.query_params.get('q', '')
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_SEARCH_LIMIT))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+
+        # Rank on the bare contact rows first and load the serializer's
+        # related data for the winners only.
+        ids = search_contacts(institution, query, limit)
+        contacts = ContactSerializer.setup_eager_loading(Contact.objects.filter(pk__in=ids)).in_bulk()
+        serializer = ContactSerializer([contacts[pk] for pk in ids], many=True)
+        return Response({'results': serializer.data})
+
+
+@extend_schema(tags=["Contact"])
+class ContactCallerLookupView(APIView):
+
+    @extend_schema(
+        summary="Find the contact behind an inbound caller ID",
+        description=(
+            "The number is normalized to E.164, so any written form of it matches, and looked up on the "
+            "unique phone_e164 index."
+        ),
+        parameters=[
+            OpenApiParameter(name="institution_id", required=True, type=int, location=OpenApiParameter.PATH),
+            OpenApiParameter(name="phone", required=True, type=str, location=OpenApiParameter.QUERY),
+        ],
+        responses={200: ContactSerializer, 404: OpenApiResponse(description="No contact of the institution has this number")}
+    )
+    def get(self, request, institution_id):
+        institution = get_object_or_404(Institution, id=institution_id)
+        phone_e164 = normalize_e164(request.query_params.get('phone', ''))
+        if phone_e164 is None:
+            return Response({'error': 'phone must be a valid phone number'}, status=status.HTTP_400_BAD_REQUEST)
+        contacts = ContactSerializer.setup_eager_loading(Contact.objects.filter(institution=institution))
+        contact = get_object_or_404(contacts, phone_e164=phone_e164)
+        return Response(ContactSerializer(contact).data)
+
+
 @extend_schema(tags=["Contact"])
 class ContactTemplateDownloadView(APIView):
     @extend_schema(
@@ -216,138 +323,31 @@ class ContactTemplateDownloadView(APIView):
         responses={200: OpenApiResponse(description="Excel template file")}
     )
     def get(self, request, product_uuid):
-        product = get_object_or_404(Product, uuid=product_uuid)
-        
-        try:
-            # Create template with empty rows
-            template_data = {
-                'name': [''] * 10,
-                'phone_number': [''] * 10,
-                'country': [''] * 10,
-                'country_code': [''] * 10,
-                'status': [''] * 10,
-                'remarks': [''] * 10,
-            }
-            
-            # Create Excel file in memory
-            output = io.BytesIO()
-            
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                # Main template sheet
-                df = pd.DataFrame(template_data)
-                df.to_excel(writer, sheet_name='Contacts', index=False)
-                
-                # Get workbook and worksheet
-                workbook = writer.book
-                worksheet = writer.sheets['Contacts']
-                
-                # Set column widths
-                column_widths = {
-                    'A': 25,  # name
-                    'B': 20,  # phone_number
-                    'C': 15,  # country
-                    'D': 15,  # country_code
-                    'E': 15,  # status
-                    'F': 30,  # remarks
-                }
-                
-                for col, width in column_widths.items():
-                    worksheet.column_dimensions[col].width = width
-                
-                # Header styling
-                header_font = Font(bold=True, color="FFFFFF")
-                header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-                center_alignment = Alignment(horizontal="center", vertical="center")
-                
-                for col in range(1, len(df.columns) + 1):
-                    cell = worksheet.cell(row=1, column=col)
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.alignment = center_alignment
-                
-                # Instructions sheet
-                instructions_df = pd.DataFrame({
-                    'Field': ['name', 'phone_number', 'country', 'country_code', 'status', 'remarks'],
-                    'Description': [
-                        'Full name of the contact',
-                        'Phone number with country code',
-                        'Country name (optional)',
-                        'Country calling code (optional)',
-                        'Contact status (optional, default: new)',
-                        'Additional remarks (optional)'
-                    ],
-                    'Required': ['Yes', 'Yes', 'No', 'No', 'No', 'No'],
-                    'Examples': [
-                        'John Doe',
-                        '+256701234567',
-                        'Uganda',
-                        '+256',
-                        'new, assigned, attended_to, archived, flagged, ready_to_export, exported',
-                        'Met at conference'
-                    ]
-                })
-                instructions_df.to_excel(writer, sheet_name='Instructions', index=False)
-                
-                instructions_sheet = writer.sheets['Instructions']
-                for col in ['A', 'B', 'C', 'D']:
-                    instructions_sheet.column_dimensions[col].width = 30
-                
-                for col in range(1, len(instructions_df.columns) + 1):
-                    cell = instructions_sheet.cell(row=1, column=col)
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.alignment = center_alignment
-                
-                # Product Info sheet
-                product_info_df = pd.DataFrame({
-                    'Product Information': [
-                        'Selected Product',
-                        'Product Name',
-                        'Institution',
-                        'Upload Instructions',
-                        '',
-                        '1. Fill in the Contacts sheet',
-                        '2. Save the file',
-                        '3. Upload using the bulk upload feature',
-                        '4. Contacts will be linked to the selected product'
-                    ],
-                    'Details': [
-                        '',
-                        product.name,
-                        product.institution.institution_name,
-                        '',
-                        '',
-                        '',
-                        '',
-                        '',
-                        ''
-                    ]
-                })
-                product_info_df.to_excel(writer, sheet_name='Product_Info', index=False)
-                
-                product_info_sheet = writer.sheets['Product_Info']
-                product_info_sheet.column_dimensions['A'].width = 30
-                product_info_sheet.column_dimensions['B'].width = 30
-                
-                for col in range(1, len(product_info_df.columns) + 1):
-                    cell = product_info_sheet.cell(row=1, column=col)
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.alignment = center_alignment
-            
-            output.seek(0)
-            
-            # Create response
-            response = HttpResponse(
-                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                content=output.read()
-            )
-            response['Content-Disposition'] = f'attachment; filename="contacts_template_{product.name.replace(' ', '_')}.xlsx"'
+        product = get_object_or_404(Product.objects.select_related('institution'), uuid=product_uuid)
+        digest = template_digest(product)
+        etag = f'"{digest}"'
+
+        # The ETag is the digest of everything written into the file, so a
+        # matching If-None-Match is answered without loading the workbook.
+        client_etags = [tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))]
+        if etag in client_etags or '*' in client_etags:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
             return response
-            
+
+        try:
+            content = contact_template(product, digest)
         except Exception as e:
+            logger.exception("Failed to generate contact template for product %s", product.uuid)
             return Response({'error': f'Failed to generate template: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        filename = f"contacts_template_{product.name.replace(' ', '_')}.xlsx"
+        response = HttpResponse(content_type=TEMPLATE_CONTENT_TYPE, content=content)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
 
 @extend_schema(tags=["Contact"])
 class ContactBulkUploadView(APIView):
@@ -387,71 +387,20 @@ class ContactBulkUploadView(APIView):
         file = request.FILES['file']
         
         # Validate file type
-        if not file.name.endswith(('.xlsx', '.xls', '.csv')):
+        if not file.name.endswith(CONTACT_FILE_EXTENSIONS):
             return Response(
                 {'error': 'Invalid file type. Please upload a CSV or Excel file (.csv, .xlsx, .xls)'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
         try:
-            # Read file
-            if file.name.endswith('.csv'):
-                df = pd.read_csv(file)
-                df = df[~df.iloc[:, 0].astype(str).str.startswith('#')]
-            else:
-                df = pd.read_excel(file, sheet_name='Contacts')
-            
-            # Remove empty rows
-            df = df.dropna(how='all')
-            
-            # Validate required columns
-            required_columns = ['name', 'phone_number']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                return Response(
-                    {'error': f'Missing required columns: {", ".join(missing_columns)}'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            created_contacts = []
-            errors = []
-            
-            for index, row in df.iterrows():
-                try:
-                    # Skip empty rows
-                    if pd.isna(row['name']) or str(row['name']).strip() == '':
-                        continue
-                    
-                    if pd.isna(row['phone_number']) or str(row['phone_number']).strip() == '':
-                        errors.append(f'Row {index + 2}: Phone number is required')
-                        continue
-                    
-                    # Prepare contact data
-                    contact_data = {
-                        'name': str(row['name']).strip(),
-                        'phone_number': str(row['phone_number']).strip(),
-                        'country': str(row.get('country', '')).strip() if pd.notna(row.get('country')) else '',
-                        'country_code': str(row.get('country_code', '')).strip() if pd.notna(row.get('country_code')) else '',
-                        'status': str(row.get('status', 'new')).strip() if pd.notna(row.get('status')) else 'new',
-                        'remarks': str(row.get('remarks', '')).strip() if pd.notna(row.get('remarks')) else '',
-                        'product': str(product.uuid)
-                    }
-                    
-                    # Create contact using BulkContactSerializer
-                    serializer = BulkContactSerializer(data=contact_data, context={'request': request})
-                    if serializer.is_valid():
-                        contact = serializer.save()
-                        created_contacts.append({
-                            'uuid': str(contact.uuid),
-                            'name': contact.name,
-                            'phone_number': contact.phone_number,
-                            'product_name': product.name
-                        })
-                    else:
-                        errors.append(f'Row {index + 2}: {serializer.errors}')
-                        
-                except Exception as e:
-                    errors.append(f'Row {index + 2}: {str(e)}')
+            created_by = getattr(request.user, 'profile', None) if request.user.is_authenticated else None
+            try:
+                result = import_contact_file(file, file.name, product, created_by=created_by)
+            except ContactFileError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            created_contacts = result.created_contacts
+            errors = result.errors
             
             response_data = {
                 'created_count': len(created_contacts),
@@ -474,6 +423,124 @@ class ContactBulkUploadView(APIView):
             )
 
 
+@extend_schema(tags=["Contact"])
+class ContactImportJobCreateView(APIView):
+    parser_classes = [MultiPartParser]
+
+    @extend_schema(
+        summary="Queue a background bulk upload of contacts for a specific product",
+        parameters=[
+            OpenApiParameter(name="product_uuid", required=True, type=str, location=OpenApiParameter.PATH),
+        ],
+        request={
+            'multipart/form-data': {
+                'type': 'object',
+                'properties': {
+                    'file': {
+                        'type': 'string',
+                        'format': 'binary',
+                        'description': 'Excel or CSV file with contact data'
+                    }
+                }
+            }
+        },
+        responses={
+            202: ImportJobSerializer,
+            400: OpenApiResponse(description="Validation errors")
+        }
+    )
+    def post(self, request, product_uuid):
+        product = get_object_or_404(Product, uuid=product_uuid)
+
+        if 'file' not in request.FILES:
+            return Response(
+                {'error': 'No file provided'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        file = request.FILES['file']
+
+        if not file.name.endswith(CONTACT_FILE_EXTENSIONS):
+            return Response(
+                {'error': 'Invalid file type. Please upload a CSV or Excel file (.csv, .xlsx, .xls)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        job = ImportJob.objects.create(
+            product=product,
+            created_by=getattr(request.user, 'profile', None) if request.user.is_authenticated else None,
+            file=file,
+            file_name=file.name,
+        )
+        start_import_job(job)
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+@extend_schema(tags=["Contact"])
+class ContactImportJobDetailView(APIView):
+
+    @extend_schema(
+        summary="Progress of a background contact upload",
+        parameters=[
+            OpenApiParameter(name="uuid", required=True, type=OpenApiTypes.UUID, location=OpenApiParameter.PATH),
+        ],
+        responses={200: ImportJobSerializer}
+    )
+    def get(self, request, uuid):
+        job = get_object_or_404(ImportJob, uuid=uuid)
+        return Response(ImportJobSerializer(job).data)
+
+
+@extend_schema(tags=["Contact"])
+class ContactExportView(APIView):
+
+    @extend_schema(
+        summary="Export ready_to_export contacts of a product with their calls and feedback",
+        description=(
+            "Streams every contact of the product marked ready_to_export (or, with call_group, "
+            "every membership of that group marked ready_to_export) with one row per call and "
+            "the product's feedback fields as columns. Exported rows are then set to exported."
+        ),
+        parameters=[
+            OpenApiParameter(name="product_uuid", required=True, type=str, location=OpenApiParameter.PATH),
+            OpenApiParameter(name="file_type", required=False, type=str, enum=["csv", "xlsx"], location=OpenApiParameter.QUERY),
+            OpenApiParameter(name="call_group", required=False, type=OpenApiTypes.UUID, location=OpenApiParameter.QUERY),
+        ],
+        responses={200: OpenApiResponse(description="CSV or Excel file")}
+    )
+    def get(self, request, product_uuid):
+        product = get_object_or_404(Product, uuid=product_uuid)
+        file_type = request.query_params.get('file_type', 'csv')
+        if file_type not in ('csv', 'xlsx'):
+            return Response(
+                {'error': 'Invalid file type. Use csv or xlsx'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        call_group = None
+        call_group_uuid = request.query_params.get('call_group')
+        if call_group_uuid:
+            call_group = get_object_or_404(CallGroup, uuid=call_group_uuid, institution=product.institution)
+
+        export = ContactExport(product, call_group=call_group)
+        filename = f"contacts_export_{product.name.replace(' ', '_')}_{timezone.localdate().isoformat()}"
+
+        if file_type == 'xlsx':
+            return FileResponse(
+                export.write_xlsx(),
+                as_attachment=True,
+                filename=f"{filename}.xlsx",
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            )
+
+        response = StreamingHttpResponse(
+            streaming_content(export.iter_csv(), request),
+            content_type='text/csv',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+        return response
+
+
 @extend_schema(tags=["Contact"])
 class ContactDetailView(APIView):
 
@@ -515,20 +582,70 @@ class ContactDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+TRANSITION_RESPONSE = OpenApiResponse(
+    description="Rows moved (updated, by_status per source status) and rows left alone because "
+                "their status may not move to to_status (skipped)"
+)
+
+
+@extend_schema(tags=["Contact"])
+class ContactBulkTransitionView(APIView):
+
+    @extend_schema(
+        summary="Move many contacts of an institution to another status",
+        description=(
+            "Selects contacts by ids, current status (from_status), product and/or call group and moves "
+            "those whose status may transition to to_status."
+        ),
+        parameters=[
+            OpenApiParameter(name="institution_id", required=True, type=int, location=OpenApiParameter.PATH),
+        ],
+        request=ContactTransitionSerializer,
+        responses={200: TRANSITION_RESPONSE}
+    )
+    def post(self, request, institution_id):
+        institution = get_object_or_404(Institution, id=institution_id)
+        serializer = ContactTransitionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        contacts = Contact.objects.filter(institution=institution)
+        if data.get('ids'):
+            contacts = contacts.filter(pk__in=data['ids'])
+        if data.get('product'):
+            contacts = contacts.filter(contact_products__product__uuid=data['product'])
+        if data.get('call_group'):
+            contacts = contacts.filter(pk__in=ContactProduct.objects.filter(
+                call_groups__call_group_id=data['call_group']
+            ).values('contact_id'))
+        result = transition_statuses(contacts, data['to_status'], sources=data.get('from_status'))
+        return Response(result)
+
+
 @extend_schema(tags=["CallGroupContact"])    
 class ContactsByCallGroupContactListCreateView(APIView):
+    query_budget = {'GET': 12}
+
     @extend_schema(
         summary="List contacts assigned to a specific call group",
         parameters=[
-            OpenApiParameter(name="call_group_uuid", required=True, type=int, location=OpenApiParameter.PATH),
+            OpenApiParameter(name="call_group_uuid", required=True, type=str, location=OpenApiParameter.PATH),
+            OpenApiParameter(name="status", required=False, type=str, location=OpenApiParameter.QUERY),
+            OpenApiParameter(name="cursor", required=False, type=str, location=OpenApiParameter.QUERY),
+            OpenApiParameter(name="page_size", required=False, type=int, location=OpenApiParameter.QUERY),
         ],
         responses={200: CallGroupContactSerializer(many=True)}
     )
     def get(self, request, call_group_uuid):
         group = get_object_or_404(CallGroup, uuid=call_group_uuid)
-        contacts = CallGroupContact.objects.filter(call_group=group)
-        serializer = CallGroupContactSerializer(contacts, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        contacts = CallGroupContactSerializer.setup_eager_loading(CallGroupContact.objects.filter(call_group=group))
+        if request.query_params.get('status'):
+            contacts = contacts.filter(status=request.query_params['status'])
+        paginator = KeysetPagination(ordering=('uuid',))
+        page = paginator.paginate_queryset(contacts, request)
+        serializer = CallGroupContactSerializer(page, many=True, context=CallGroupSerializer.summary_context([group.pk]))
+        return paginator.get_paginated_response(serializer.data)
     
 
 class ContactCallsListView(APIView):
@@ -547,19 +664,27 @@ class ContactCallsListView(APIView):
 
 @extend_schema(tags=["CallGroupContact"])
 class CallGroupContactListCreateView(APIView):
+    query_budget = {'GET': 12}
 
     @extend_schema(
         summary="List contacts assigned to call groups of a specific institution",
         parameters=[
             OpenApiParameter(name="institution_id", required=True, type=int, location=OpenApiParameter.PATH),
+            OpenApiParameter(name="cursor", required=False, type=str, location=OpenApiParameter.QUERY),
+            OpenApiParameter(name="page_size", required=False, type=int, location=OpenApiParameter.QUERY),
         ],
         responses={200: CallGroupContactSerializer(many=True)}
     )
     def get(self, request, institution_id):
         institution = get_object_or_404(Institution, id=institution_id)
-        contacts = CallGroupContact.objects.filter(call_group__institution=institution)
-        serializer = CallGroupContactSerializer(contacts, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        contacts = CallGroupContactSerializer.setup_eager_loading(
+            CallGroupContact.objects.filter(call_group__institution=institution)
+        )
+        paginator = KeysetPagination(ordering=('uuid',))
+        page = paginator.paginate_queryset(contacts, request)
+        context = CallGroupSerializer.summary_context(item.call_group_id for item in page)
+        serializer = CallGroupContactSerializer(page, many=True, context=context)
+        return paginator.get_paginated_response(serializer.data)
 
     @extend_schema(
         summary="Assign a contact to a call group (within specified institution)",
@@ -581,6 +706,87 @@ class CallGroupContactListCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@extend_schema(tags=["CallGroupContact"])
+class CallGroupContactBulkAssignView(APIView):
+
+    @extend_schema(
+        summary="Assign many contacts to one or more call groups",
+        description=(
+            "Selects the institution's contacts by product, contact status and/or explicit ContactProduct ids "
+            "and splits them across the given call groups, evenly or in proportion to weights. Contacts already "
+            "in one of the groups are skipped."
+        ),
+        parameters=[
+            OpenApiParameter(name="institution_id", required=True, type=int, location=OpenApiParameter.PATH),
+        ],
+        request=CallGroupAssignmentSerializer,
+        responses={200: OpenApiResponse(description="Memberships created per call group")}
+    )
+    def post(self, request, institution_id):
+        institution = get_object_or_404(Institution, id=institution_id)
+        serializer = CallGroupAssignmentSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        groups = CallGroup.objects.in_bulk(data['call_groups'])
+        call_groups = [groups.get(uuid) for uuid in data['call_groups']]
+        if any(group is None or group.institution_id != institution.id for group in call_groups):
+            return Response(
+                {'call_groups': 'Every call group must belong to this institution.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        product = None
+        if data.get('product'):
+            product = get_object_or_404(Product, uuid=data['product'], institution=institution)
+
+        contact_products = select_contact_products(
+            institution,
+            product=product,
+            statuses=data.get('status'),
+            contact_product_ids=data.get('contact_products'),
+        )
+        created = assign_contacts(contact_products, call_groups, weights=data.get('weights'))
+        return Response({
+            'assigned': sum(created.values()),
+            'call_groups': {str(group.uuid): created[group.pk] for group in call_groups},
+        })
+
+
+@extend_schema(tags=["CallGroupContact"])
+class CallGroupContactBulkTransitionView(APIView):
+
+    @extend_schema(
+        summary="Move many call group memberships of an institution to another status",
+        description=(
+            "Selects memberships by ids, current status (from_status), product and/or call group and moves "
+            "those whose status may transition to to_status. Open dialer claims are released when the "
+            "new status is no longer dialable."
+        ),
+        parameters=[
+            OpenApiParameter(name="institution_id", required=True, type=int, location=OpenApiParameter.PATH),
+        ],
+        request=CallGroupContactTransitionSerializer,
+        responses={200: TRANSITION_RESPONSE}
+    )
+    def post(self, request, institution_id):
+        institution = get_object_or_404(Institution, id=institution_id)
+        serializer = CallGroupContactTransitionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        memberships = CallGroupContact.objects.filter(call_group__institution=institution)
+        if data.get('ids'):
+            memberships = memberships.filter(pk__in=data['ids'])
+        if data.get('product'):
+            memberships = memberships.filter(contact__product__uuid=data['product'])
+        if data.get('call_group'):
+            memberships = memberships.filter(call_group_id=data['call_group'])
+        result = transition_statuses(memberships, data['to_status'], sources=data.get('from_status'))
+        return Response(result)
+
+
 @extend_schema(tags=["CallGroupContact"])
 class CallGroupContactDetailView(APIView):
 
@@ -617,22 +823,96 @@ class CallGroupContactDetailView(APIView):
         item = self.get_object(uuid)
         item.delete()
         return Response(status=status.HTTP_204_NO_CONTENT) 
+
+
+def _active_call_group_agent(user, call_group):
+    return CallGroupAgent.objects.filter(
+        call_group=call_group, agent__user__user=user, status='active'
+    ).select_related('call_group').first()
+
+
+@extend_schema(tags=["CallGroupContact"])
+class CallGroupClaimNextContactView(APIView):
+
+    @extend_schema(
+        summary="Claim the next contact to dial in a call group",
+        description=(
+            "Atomically assigns the next dialable contact of the group to the requesting agent for "
+            "lease_seconds (default 300). Agents claiming at the same time never receive the same contact. "
+            "Calling again while holding a live claim returns the same contact with the lease extended. "
+            "Responds 204 when nothing is left to dial."
+        ),
+        parameters=[
+            OpenApiParameter(name="call_group_uuid", required=True, type=str, location=OpenApiParameter.PATH),
+        ],
+        request={"application/json": {"type": "object", "properties": {"lease_seconds": {"type": "integer"}}}},
+        responses={200: CallGroupContactSerializer, 204: OpenApiResponse(description="No contact left to dial")}
+    )
+    def post(self, request, call_group_uuid):
+        group = get_object_or_404(CallGroup, uuid=call_group_uuid)
+        call_group_agent = _active_call_group_agent(request.user, group)
+        if call_group_agent is None:
+            return Response(
+                {'detail': 'You are not an active agent of this call group.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        try:
+            lease_seconds = int(request.data.get('lease_seconds', DEFAULT_LEASE_SECONDS))
+        except (TypeError, ValueError):
+            return Response({'error': 'lease_seconds must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        lease_seconds = max(1, min(lease_seconds, MAX_LEASE_SECONDS))
+
+        membership = claim_next_contact(call_group_agent, lease_seconds=lease_seconds)
+        if membership is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        context = CallGroupSerializer.summary_context([group.pk])
+        return Response(CallGroupContactSerializer(membership, context=context).data)
+
+
+@extend_schema(tags=["CallGroupContact"])
+class CallGroupContactReleaseView(APIView):
+
+    @extend_schema(
+        summary="Release a claimed contact, optionally setting its status",
+        request={"application/json": {"type": "object", "properties": {"status": {"type": "string"}}}},
+        responses={200: CallGroupContactSerializer, 409: OpenApiResponse(description="Claim not held")}
+    )
+    def post(self, request, uuid):
+        membership = get_object_or_404(CallGroupContact, uuid=uuid)
+        call_group_agent = _active_call_group_agent(request.user, membership.call_group_id)
+        new_status = request.data.get('status')
+        valid_statuses = {choice for choice, _ in CallGroupContact._meta.get_field('status').choices}
+        if new_status and new_status not in valid_statuses:
+            return Response({'error': f'Invalid status: {new_status}'}, status=status.HTTP_400_BAD_REQUEST)
+        if call_group_agent is None or not release_contact(membership, call_group_agent, status=new_status):
+            return Response(
+                {'detail': 'This contact is not claimed by you.'},
+                status=status.HTTP_409_CONFLICT
+            )
+        membership.refresh_from_db()
+        return Response(CallGroupContactSerializer(membership).data)
+
     
 @extend_schema(tags=['Calls'])
 class CallListCreateAPIView(APIView):
+    query_budget = {'GET': 9}
     parser_classes = [MultiPartParser, FormParser, JSONParser]
 
     @extend_schema(
         summary='List all calls for a specific institution',
         parameters=[
-            OpenApiParameter(name='institution_id', type=int, location=OpenApiParameter.PATH)
+            OpenApiParameter(name='institution_id', type=int, location=OpenApiParameter.PATH),
+            OpenApiParameter(name='cursor', required=False, type=str, location=OpenApiParameter.QUERY),
+            OpenApiParameter(name='page_size', required=False, type=int, location=OpenApiParameter.QUERY),
         ],
         responses={200: CallSerializer(many=True)}
     )
     def get(self, request, institution_id):
-        calls = Call.objects.filter(contact__product__institution__id=institution_id)
-        serializer = CallSerializer(calls, many=True, context={'request': request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        calls = CallSerializer.setup_eager_loading(Call.objects.filter(institution_id=institution_id))
+        paginator = KeysetPagination(ordering=('-made_on', '-uuid'))
+        page = paginator.paginate_queryset(calls, request)
+        serializer = CallSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
 
     @extend_schema(
         summary='Create a new call under an institution',
@@ -693,6 +973,59 @@ class CallListCreateAPIView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     
+@extend_schema(tags=['Calls'])
+class CallBatchLogView(APIView):
+
+    @extend_schema(
+        summary='Log a batch of calls recorded offline',
+        description=(
+            'Accepts up to 500 calls, each with a client generated idempotency_key (UUID) and the '
+            'ContactProduct UUID as contact. Every item gets its own result: created, duplicate (the key '
+            'was logged before; uuid is the stored call) or invalid with errors. Replaying a batch is safe.'
+        ),
+        parameters=[
+            OpenApiParameter(name='institution_id', type=int, location=OpenApiParameter.PATH),
+        ],
+        request={'application/json': {
+            'type': 'object',
+            'properties': {'calls': {'type': 'array', 'items': {'type': 'object'}}},
+        }},
+        responses={200: OpenApiResponse(description='Per item results, in request order')}
+    )
+    def post(self, request, institution_id):
+        items = request.data.get('calls') if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response({'calls': 'Provide a non-empty list of calls.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > MAX_CALL_BATCH_SIZE:
+            return Response(
+                {'calls': f'At most {MAX_CALL_BATCH_SIZE} calls per batch.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        call_group_agents = list(CallGroupAgent.objects.filter(
+            agent__user__user=request.user, call_group__institution_id=institution_id, status='active'
+        ))
+        if not call_group_agents:
+            return Response(
+                {'detail': 'You are not an active agent of this institution.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        validated = []
+        for item in items:
+            serializer = CallLogItemSerializer(data=item)
+            if serializer.is_valid():
+                validated.append(serializer.validated_data)
+            else:
+                key = item.get('idempotency_key') if isinstance(item, dict) else None
+                validated.append({'idempotency_key': key, 'errors': serializer.errors})
+
+        results = log_call_batch(validated, institution_id, call_group_agents)
+        totals = {outcome: 0 for outcome in ('created', 'duplicate', 'invalid')}
+        for result in results:
+            totals[result['status']] += 1
+        return Response({'results': results, **totals})
+
+
 @extend_schema(tags=['Calls'])
 class CallDetailAPIView(APIView):
 
@@ -730,21 +1063,130 @@ class CallDetailAPIView(APIView):
         call.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+REPORT_PARAMETERS = [
+    OpenApiParameter(name="institution_id", required=True, type=int, location=OpenApiParameter.PATH),
+    OpenApiParameter(name="start", required=False, type=OpenApiTypes.DATE, location=OpenApiParameter.QUERY,
+                     description="First local date (Africa/Nairobi), defaults to 29 days before end"),
+    OpenApiParameter(name="end", required=False, type=OpenApiTypes.DATE, location=OpenApiParameter.QUERY,
+                     description="Last local date, defaults to today"),
+    OpenApiParameter(name="product", required=False, type=OpenApiTypes.UUID, location=OpenApiParameter.QUERY),
+    OpenApiParameter(name="agent", required=False, type=OpenApiTypes.UUID, location=OpenApiParameter.QUERY,
+                     description="CallGroupAgent UUID"),
+    OpenApiParameter(name="status", required=False, type=str, location=OpenApiParameter.QUERY),
+]
+
+
+def _report_range(request):
+    """Read ``start``/``end`` query dates, returning ``(start, end, error_response)``."""
+    try:
+        end = date.fromisoformat(request.query_params['end']) if request.query_params.get('end') else rollup_local_date(timezone.now())
+        start = date.fromisoformat(request.query_params['start']) if request.query_params.get('start') else end - timedelta(days=29)
+    except ValueError:
+        return None, None, Response({'error': 'Dates must be in YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+    if start > end:
+        return None, None, Response({'error': 'start must not be after end'}, status=status.HTTP_400_BAD_REQUEST)
+    return start, end, None
+
+
+def _report_filters(request):
+    """Read the ``product``/``agent``/``status`` filters, returning ``(filters, error_response)``."""
+    filters = {name: request.query_params.get(name) or None for name in ('product', 'agent', 'status')}
+    for name in ('product', 'agent'):
+        if filters[name]:
+            try:
+                filters[name] = uuid_module.UUID(filters[name])
+            except ValueError:
+                return None, Response({'error': f'{name} must be a valid UUID'}, status=status.HTTP_400_BAD_REQUEST)
+    return filters, None
+
+
+@extend_schema(tags=['Reports'])
+class CallReportView(APIView):
+    query_budget = {'GET': 3}
+
+    @extend_schema(
+        summary='Call counts for an institution grouped by date, product, agent and/or status',
+        description='Reads the daily call rollups, so the cost depends on the number of groups and not on call volume.',
+        parameters=REPORT_PARAMETERS + [
+            OpenApiParameter(name="group_by", required=False, type=str, location=OpenApiParameter.QUERY,
+                             description="Comma separated subset of date, product, agent, status (default status)"),
+        ],
+        responses={200: OpenApiResponse(description="Totals and grouped call counts")}
+    )
+    def get(self, request, institution_id):
+        institution = get_object_or_404(Institution, id=institution_id)
+        start, end, error = _report_range(request)
+        if error:
+            return error
+        group_by = [name for name in request.query_params.get('group_by', 'status').split(',') if name]
+        unknown = [name for name in group_by if name not in REPORT_DIMENSIONS]
+        if unknown:
+            return Response(
+                {'error': f"Unknown group_by: {', '.join(unknown)}. Use {', '.join(REPORT_DIMENSIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        filters, error = _report_filters(request)
+        if error:
+            return error
+        rows = list(rollup_report(institution, start, end, group_by, **filters))
+        return Response({
+            'start': start,
+            'end': end,
+            'group_by': group_by,
+            'total': sum(row['calls'] for row in rows),
+            'results': rows,
+        })
+
+
+@extend_schema(tags=['Reports'])
+class CallDailyReportView(APIView):
+    query_budget = {'GET': 3}
+
+    @extend_schema(
+        summary='Daily call counts for an institution with a per-status breakdown',
+        parameters=REPORT_PARAMETERS,
+        responses={200: OpenApiResponse(description="One entry per local date in the range")}
+    )
+    def get(self, request, institution_id):
+        institution = get_object_or_404(Institution, id=institution_id)
+        start, end, error = _report_range(request)
+        if error:
+            return error
+        filters, error = _report_filters(request)
+        if error:
+            return error
+        days = {}
+        for row in rollup_report(institution, start, end, ['date', 'status'], **filters):
+            day = days.setdefault(row['date'], {'date': row['date'], 'total': 0, 'statuses': {}})
+            day['statuses'][row['status']] = row['calls']
+            day['total'] += row['calls']
+        results = [
+            days.get(start + timedelta(days=offset), {'date': start + timedelta(days=offset), 'total': 0, 'statuses': {}})
+            for offset in range((end - start).days + 1)
+        ]
+        return Response({'start': start, 'end': end, 'results': results})
+
+
 @extend_schema(tags=["ContactProduct"])
 class ContactProductListCreateView(APIView):
+    query_budget = {'GET': 10}
 
     @extend_schema(
         summary="List ContactProduct associations for a specific institution",
         parameters=[
             OpenApiParameter(name="institution_id", required=True, type=int, location=OpenApiParameter.PATH),
+            OpenApiParameter(name="cursor", required=False, type=str, location=OpenApiParameter.QUERY),
+            OpenApiParameter(name="page_size", required=False, type=int, location=OpenApiParameter.QUERY),
         ],
         responses={200: ContactProductSerializer(many=True)}
     )
     def get(self, request, institution_id):
         institution = get_object_or_404(Institution, id=institution_id)
-        contact_products = ContactProduct.objects.filter(product__institution=institution).select_related('contact', 'product__institution', 'created_by')
-        serializer = ContactProductSerializer(contact_products, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        contact_products = ContactProductSerializer.setup_eager_loading(ContactProduct.objects.filter(product__institution=institution))
+        paginator = KeysetPagination(ordering=('-created_at', '-id'))
+        page = paginator.paginate_queryset(contact_products, request)
+        serializer = ContactProductSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     @extend_schema(
         summary="Create a ContactProduct association (within specified institution)",
@@ -809,6 +1251,7 @@ class ContactProductDetailView(APIView):
 
 @extend_schema(tags=["Agent"])
 class AgentListCreateView(APIView):
+    query_budget = {'GET': 6}
 
     @extend_schema(
         summary="List Agents for a specific institution",
@@ -819,7 +1262,10 @@ class AgentListCreateView(APIView):
     )
     def get(self, request, institution_id):
         institution = get_object_or_404(Institution, id=institution_id)
-        agents = Agent.objects.filter(user__institution=institution).select_related('user__user', 'user__institution')
+        agents = CustomUserSerializer.setup_eager_loading(
+            Agent.objects.filter(user__institution=institution).select_related('user__user', 'user__institution'),
+            prefix='user__user__',
+        )
         serializer = AgentSerializer(agents, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
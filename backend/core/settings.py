@@ -14,6 +14,8 @@ if not SECRET_KEY:
     raise ValueError("SECRET_KEY is missing in the .env file")
 
 DEBUG = os.getenv("DEBUG", "True").lower() == "true"
+# Query count and Server-Timing headers on responses, see utilities.instrumentation
+REQUEST_METRICS_HEADERS = os.getenv("REQUEST_METRICS_HEADERS", str(DEBUG)).lower() == "true"
 
 
 ALLOWED_HOSTS = ["*"]
@@ -31,6 +33,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     'django.contrib.gis',
+    'django.contrib.postgres',
     "rest_framework",
     "rest_framework_simplejwt.token_blacklist",
     "drf_spectacular",
@@ -41,6 +44,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so queries made by the other middleware are counted too
+    "utilities.instrumentation.RequestMetricsMiddleware",
+    # Inside the metrics, so sending the request's notifications is timed with it
+    "workflows.middleware.NotificationBatchMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -100,6 +107,9 @@ LANGUAGE_CODE = "en-us"
 
 TIME_ZONE = "Africa/Nairobi"
 
+# Calling code for national numbers ("0712 345678") stored without one
+PHONE_DEFAULT_COUNTRY_CODE = os.getenv("PHONE_DEFAULT_COUNTRY_CODE", "254")
+
 USE_I18N = True
 
 USE_TZ = True
@@ -164,12 +174,25 @@ GOOGLE_OAUTH2_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_OAUTH2_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 GOOGLE_AUTH_REDIRECT_URL=os.getenv("GOOGLE_AUTH_REDIRECT_URL")
 
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+
 # Channel layers configuration
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
         'CONFIG': {
-            "hosts": [os.environ.get('REDIS_URL', 'redis://localhost:6379/0')],
+            "hosts": [REDIS_URL],
         },
     },
 }
+
+# Cache shared by every worker and management command, so an entry one
+# process invalidates (cached step approvers, say) is gone for all of them
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    },
+}
+# Seconds between keepalive messages on the notification socket
+NOTIFICATION_HEARTBEAT_SECONDS = int(os.getenv("NOTIFICATION_HEARTBEAT_SECONDS", "30"))
@@ -4,6 +4,8 @@ from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from django.conf import settings
 from django.conf.urls.static import static
 
+from utilities.instrumentation import EndpointMetricsView
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
@@ -14,8 +16,9 @@ urlpatterns = [
     ),
     path("api/user/", include("users.urls")),
     path("api/institution/", include("institution.urls")),
-    # path("api/workflow/", include("workflows.urls")),
+    path("api/workflow/", include("workflows.urls")),
     path("api/call/", include("call.urls")),
+    path("api/metrics/endpoints/", EndpointMetricsView.as_view(), name="endpoint-metrics"),
 ]
 
 if settings.DEBUG:
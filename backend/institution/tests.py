@@ -1,3 +1,57 @@
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from users.models import CustomUser
+from utilities.testing import QueryBudgetMixin
+
+from . import views
+from .models import Branch, Institution, InstitutionDocument, Product, UserBranch
+
+
+class InstitutionEndpointQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.staff = CustomUser.objects.create_user(email='staff@example.com', fullname='Staff', is_staff=True)
+        cls.member = CustomUser.objects.create_user(email='member@example.com', fullname='Member')
+        cls.institutions = [
+            Institution.objects.create(institution_owner=cls.owner, institution_name=f'Baifam {index}', created_by=cls.owner)
+            for index in range(4)
+        ]
+        cls.institution = cls.institutions[0]
+        # bulk_create skips the size lookup save() does on the stored file
+        InstitutionDocument.objects.bulk_create([
+            InstitutionDocument(institution=institution, document_title='Licence', document_file='licence.pdf', document_size=1)
+            for institution in cls.institutions
+        ])
+        for index in range(6):
+            Product.objects.create(institution=cls.institution, name=f'Product {index}')
+            branch = Branch.objects.create(institution=cls.institution, branch_name=f'Branch {index}', branch_location='Nairobi')
+            UserBranch.objects.create(user=cls.member, branch=branch)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_institution_list(self):
+        with self.assertQueryBudget(views.InstitutionListAPIView):
+            response = self.client.get(reverse('institution-management'))
+        self.assertEqual(len(response.data), 4)
+
+    def test_product_list(self):
+        with self.assertQueryBudget(views.ProductListCreateView):
+            response = self.client.get(reverse('product-list-create', args=[self.institution.id]))
+        self.assertEqual(len(response.data), 6)
+
+    def test_branch_list(self):
+        self.client.force_authenticate(self.staff)
+        with self.assertQueryBudget(views.BranchListAPIView):
+            response = self.client.get(reverse('branch-management'))
+        self.assertEqual(len(response.data), Branch.objects.count())
+
+    def test_institution_branch_list(self):
+        self.client.force_authenticate(self.member)
+        with self.assertQueryBudget(views.InstitutionBranchAPIView):
+            response = self.client.get(reverse('institution-branch-list', args=[self.institution.id]))
+        self.assertEqual(len(response.data), 6)
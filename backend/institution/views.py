@@ -32,6 +32,7 @@ from django.db.models import Q
 
 
 class InstitutionListAPIView(APIView):
+    query_budget = {'GET': 3}
     parser_classes = [MultiPartParser, FormParser]
 
     @extend_schema(
@@ -74,7 +75,7 @@ class InstitutionListAPIView(APIView):
             institutions = Institution.objects.all()
         else:
             institutions = Institution.objects.filter(institution_owner=request.user)
-        serializer = InstitutionSerializer(institutions, many=True)
+        serializer = InstitutionSerializer(institutions.prefetch_related("documents"), many=True)
         return Response(serializer.data)
 
 
@@ -138,6 +139,7 @@ class InstitutionDetailAPIView(APIView):
 
 
 class BranchListAPIView(APIView):
+    query_budget = {'GET': 2}
     @extend_schema(
         request=BranchSerializer,
         responses={201: BranchSerializer},
@@ -168,6 +170,7 @@ class BranchListAPIView(APIView):
             branches = Branch.objects.all()
         else:
             branches = Branch.objects.filter(institution__institution_owner=request.user)
+        branches = branches.select_related("institution")
 
         serializer = BranchSerializer(branches, many=True)
         return Response(serializer.data)
@@ -233,6 +236,7 @@ class BranchDetailAPIView(APIView):
 
 
 class InstitutionBranchAPIView(APIView):
+    query_budget = {'GET': 4}
     @extend_schema(
         responses={200: BranchSerializer(many=True)},
         description="Retrieve all branches associated to a institution whose ID is given",
@@ -257,7 +261,7 @@ class InstitutionBranchAPIView(APIView):
                 ),
             )
 
-        serializer = BranchSerializer(branches, many=True)
+        serializer = BranchSerializer(branches.select_related("institution"), many=True)
         return Response(serializer.data)
 
 
@@ -533,6 +537,7 @@ class ClientCompanyDetailView(APIView):
 
 @extend_schema(tags=["Product"])
 class ProductListCreateView(APIView):
+    query_budget = {'GET': 4}
 
     @extend_schema(
         summary="List all products for a specific institution",
@@ -543,7 +548,7 @@ class ProductListCreateView(APIView):
     )
     def get(self, request, institution_id):
         institution = get_object_or_404(Institution, id=institution_id)
-        products = Product.objects.filter(institution=institution)
+        products = Product.objects.filter(institution=institution).select_related('institution').prefetch_related('institution__documents')
         serializer = ProductSerializer(products, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -1,3 +1,4 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 
 from .models import (
@@ -53,9 +54,19 @@ class RoleSerializer(serializers.ModelSerializer):
         extra_kwargs = {"institution": {"required": False}}
 
     def get_permissions_details(self, obj):
-        permissions = Permission.objects.filter(roles__role=obj)
+        if "permissions" in getattr(obj, "_prefetched_objects_cache", {}):
+            permissions = [role_permission.permission for role_permission in obj.permissions.all()]
+        else:
+            permissions = Permission.objects.filter(roles__role=obj).select_related("category")
         return PermissionSerializer(permissions, many=True).data
 
+    @staticmethod
+    def setup_eager_loading(queryset, prefix=""):
+        """Prefetch the permissions and their categories of the roles at ``prefix``."""
+        return queryset.prefetch_related(
+            Prefetch(f"{prefix}permissions", queryset=RolePermission.objects.select_related("permission__category"))
+        )
+
     def create(self, validated_data):
         permissions = validated_data.pop("permissions", [])
         role = Role.objects.create(**validated_data)
@@ -116,6 +127,29 @@ class CustomUserSerializer(serializers.ModelSerializer):
         roles = [ur.role for ur in obj.user_roles.all()]
         return RoleSerializer(roles, many=True).data
 
+    @staticmethod
+    def setup_eager_loading(queryset, prefix=""):
+        """
+        Load the roles and branches ``to_representation`` reads for the users at ``prefix``.
+
+        ``prefix`` reaches users through relations, e.g. ``"user__"`` for a
+        ``Profile`` queryset, so nested serializers of other models can
+        reuse it.
+        """
+        from institution.models import UserBranch
+
+        return RoleSerializer.setup_eager_loading(
+            queryset.prefetch_related(
+                Prefetch(f"{prefix}user_roles", queryset=UserRole.objects.select_related("role")),
+                Prefetch(
+                    f"{prefix}attached_branches",
+                    queryset=UserBranch.objects.select_related("branch__institution"),
+                    to_attr="prefetched_user_branches",
+                ),
+            ),
+            prefix=f"{prefix}user_roles__role__",
+        )
+
     def get_branches(self, obj):
         from institution.serializers import BranchSerializer
 
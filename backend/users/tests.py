@@ -1,3 +1,65 @@
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from institution.models import Branch, Institution, UserBranch
+from utilities.testing import QueryBudgetMixin
+
+from . import views
+from .models import CustomUser, Permission, PermissionCategory, Role, RolePermission, UserRole
+
+
+class UserEndpointQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = CustomUser.objects.create_user(email='staff@example.com', fullname='Staff', is_staff=True)
+        cls.institution = Institution.objects.create(
+            institution_owner=cls.staff, institution_name='Baifam', created_by=cls.staff
+        )
+        categories = [
+            PermissionCategory.objects.create(permission_category_name=f'Category {index}', permission_category_description='-')
+            for index in range(3)
+        ]
+        cls.roles = [
+            Role.objects.create(name=f'Role {index}', description='-', institution=cls.institution) for index in range(5)
+        ]
+        for index, role in enumerate(cls.roles):
+            for number, category in enumerate(categories):
+                permission = Permission.objects.create(
+                    permission_code=f'code-{index}-{number}', permission_name=f'Permission {index}-{number}', category=category
+                )
+                RolePermission.objects.create(role=role, permission=permission)
+        for index in range(5):
+            user = CustomUser.objects.create_user(email=f'user{index}@example.com', fullname=f'User {index}')
+            for role in cls.roles[:index]:
+                UserRole.objects.create(user=user, role=role)
+            branch = Branch.objects.create(institution=cls.institution, branch_name=f'Branch {index}', branch_location='Nairobi')
+            UserBranch.objects.create(user=user, branch=branch)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def test_user_list(self):
+        with self.assertQueryBudget(views.UserListAPIView):
+            response = self.client.get(reverse('user-management'))
+        self.assertEqual(len(response.data), 6)
+        roles = {row['email']: row['roles'] for row in response.data}
+        self.assertEqual(len(roles['user4@example.com']), 4)
+        self.assertEqual(len(roles['user4@example.com'][0]['permissions_details']), 3)
+
+    def test_role_list(self):
+        with self.assertQueryBudget(views.RoleListAPIView):
+            response = self.client.get(reverse('role-list'), {'Institution_id': self.institution.id})
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertEqual(len(response.data['results'][0]['permissions_details']), 3)
+
+    def test_permission_list(self):
+        with self.assertQueryBudget(views.PermissionListAPIView):
+            response = self.client.get(reverse('permission-list'))
+        self.assertEqual(len(response.data), 15)
+
+    def test_permission_category_list(self):
+        with self.assertQueryBudget(views.PermissionCategoryListAPIView):
+            response = self.client.get(reverse('permission-category'))
+        self.assertEqual(len(response.data), 3)
@@ -5,8 +5,6 @@ from rest_framework.response import Response
 from rest_framework import status, permissions
 from rest_framework_simplejwt.exceptions import TokenError
 from drf_spectacular.utils import extend_schema
-from django.db.models import Prefetch
-from institution.models import UserBranch
 from utilities.helpers import (
     build_password_link,
     create_and_institution_otp,
@@ -57,6 +55,7 @@ logger = logging.getLogger(__name__)
 
 class UserListAPIView(APIView):
     permission_classes = [permissions.AllowAny]
+    query_budget = {'GET': 5}
 
     @extend_schema(
         request=CustomUserSerializer,
@@ -96,16 +95,7 @@ class UserListAPIView(APIView):
         if not request.user.is_staff:
             queryset = queryset.filter(id=request.user.id)
 
-        queryset = queryset.prefetch_related(
-            "user_roles__role__permissions__permission",
-            Prefetch(
-                "attached_branches",
-                queryset=UserBranch.objects.select_related("branch__institution"),
-                to_attr="prefetched_user_branches",
-            ),
-        )
-
-        serializer = CustomUserSerializer(queryset, many=True)
+        serializer = CustomUserSerializer(CustomUserSerializer.setup_eager_loading(queryset), many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -554,6 +544,7 @@ class CustomTokenRefreshView(TokenRefreshView):
 
 
 class RoleListAPIView(APIView):
+    query_budget = {'GET': 4}
     @extend_schema(
         request=RoleSerializer,
         responses={201: RoleSerializer},
@@ -582,7 +573,7 @@ class RoleListAPIView(APIView):
     )
     def get(self, request):
         Institution_id = request.query_params.get("Institution_id", None)
-        roles = Role.objects.filter(institution__id=Institution_id).order_by("name")
+        roles = RoleSerializer.setup_eager_loading(Role.objects.filter(institution__id=Institution_id).order_by("name"))
         paginator = CustomPageNumberPagination()
         paginator_qs = paginator.paginate_queryset(roles, request)
         serializer = RoleSerializer(
@@ -629,6 +620,7 @@ class RoleDetailAPIView(APIView):
 
 
 class PermissionCategoryListAPIView(APIView):
+    query_budget = {'GET': 2}
     @extend_schema(
         request=PermissionSerializer,
         responses={201: PermissionSerializer},
@@ -701,6 +693,7 @@ class PermissionCategoryDetailAPIView(APIView):
 
 
 class PermissionListAPIView(APIView):
+    query_budget = {'GET': 2}
     @extend_schema(
         request=PermissionSerializer,
         responses={201: PermissionSerializer},
@@ -727,7 +720,7 @@ class PermissionListAPIView(APIView):
         tags=["User Management"],
     )
     def get(self, request):
-        system_permissions = Permission.objects.all()
+        system_permissions = Permission.objects.select_related("category")
         serializer = PermissionSerializer(system_permissions, many=True)
         return Response(serializer.data)
 
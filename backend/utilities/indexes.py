@@ -0,0 +1,23 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.db.backends.ddl_references import Statement
+
+
+class PostgresGinIndex(GinIndex):
+    """
+    ``GinIndex`` that databases other than PostgreSQL skip.
+
+    Development and the test suite also run on SQLite, which has no GIN
+    indexes. There the index is only part of the migration state, and
+    the schema editor runs an empty statement in place of its DDL, also
+    when SQLite rebuilds the table.
+    """
+
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        if schema_editor.connection.vendor != "postgresql":
+            return Statement("")
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+    def remove_sql(self, model, schema_editor, **kwargs):
+        if schema_editor.connection.vendor != "postgresql":
+            return Statement("")
+        return super().remove_sql(model, schema_editor, **kwargs)
@@ -0,0 +1,204 @@
+import logging
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from drf_spectacular.utils import extend_schema
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_HEADER = "X-Query-Count"
+QUERY_BUDGET_HEADER = "X-Query-Budget"
+
+_current_metrics = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Queries, database time and serialization time spent on one request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialization_time = 0.0
+        self.serialization_queries = 0
+        self.serializing = False
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            if self.serializing:
+                self.serialization_queries += 1
+
+
+def query_budget(view, method):
+    """
+    The query budget ``view`` (a view class or function) declares for ``method``, or ``None``.
+
+    Views declare budgets next to their code as a ``query_budget`` dict
+    keyed by HTTP method, e.g. ``query_budget = {'GET': 4}``. A budget is
+    the most queries one request may run, whatever the page size, so a
+    serializer that starts querying per row breaks it. It includes the
+    query that authenticates the request.
+    """
+    view_class = getattr(view, "view_class", None) or getattr(view, "cls", None) or view
+    return (getattr(view_class, "query_budget", None) or {}).get(method.upper())
+
+
+def _timed_data(data):
+    def timed(serializer):
+        metrics = _current_metrics.get()
+        # Nested serializers and method fields building their own
+        # serializers are counted once, by the outermost ``.data``.
+        if metrics is None or metrics.serializing:
+            return data.fget(serializer)
+        metrics.serializing = True
+        started = time.perf_counter()
+        try:
+            return data.fget(serializer)
+        finally:
+            metrics.serializing = False
+            metrics.serialization_time += time.perf_counter() - started
+
+    timed.wrapped = data
+    return property(timed)
+
+
+def install_serializer_timing():
+    """Time ``serializer.data`` for the request being measured; safe to call more than once."""
+    if not hasattr(BaseSerializer.data.fget, "wrapped"):
+        BaseSerializer.data = _timed_data(BaseSerializer.data)
+
+
+class EndpointMetrics:
+    """Running totals per URL name, kept by each worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, name, metrics, elapsed, over_budget):
+        with self._lock:
+            totals = self._endpoints.setdefault(name, {
+                "requests": 0,
+                "queries": 0,
+                "max_queries": 0,
+                "db_ms": 0.0,
+                "serialization_ms": 0.0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "over_budget": 0,
+            })
+            totals["requests"] += 1
+            totals["queries"] += metrics.queries
+            totals["max_queries"] = max(totals["max_queries"], metrics.queries)
+            totals["db_ms"] += metrics.db_time * 1000
+            totals["serialization_ms"] += metrics.serialization_time * 1000
+            totals["total_ms"] += elapsed * 1000
+            totals["max_ms"] = max(totals["max_ms"], elapsed * 1000)
+            totals["over_budget"] += over_budget
+
+    def snapshot(self):
+        """Per URL name totals with averages, busiest endpoints first."""
+        with self._lock:
+            endpoints = [(name, dict(totals)) for name, totals in self._endpoints.items()]
+        results = []
+        for name, totals in sorted(endpoints, key=lambda item: -item[1]["total_ms"]):
+            requests = totals["requests"]
+            results.append({
+                "url_name": name,
+                **totals,
+                "avg_queries": round(totals["queries"] / requests, 2),
+                "avg_db_ms": round(totals["db_ms"] / requests, 2),
+                "avg_serialization_ms": round(totals["serialization_ms"] / requests, 2),
+                "avg_ms": round(totals["total_ms"] / requests, 2),
+            })
+        return results
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+endpoint_metrics = EndpointMetrics()
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure the queries, database time and serialization time of each request.
+
+    Queries are counted with a database execute wrapper, so it works with
+    ``DEBUG`` off, and serialization is the time spent in the outermost
+    ``serializer.data``. Totals are aggregated per URL name in
+    ``endpoint_metrics``. With ``REQUEST_METRICS_HEADERS`` on (it follows
+    ``DEBUG``) responses carry ``X-Query-Count`` and a ``Server-Timing``
+    header that browser dev tools show per request. A request running more
+    queries than its view's ``query_budget`` is logged as a warning.
+
+    List it first in ``MIDDLEWARE`` so queries made by other middleware are
+    counted too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_serializer_timing()
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics.record_query))
+                response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        name = (match.view_name if match else None) or "<unresolved>"
+        budget = query_budget(match.func, request.method) if match else None
+        over_budget = budget is not None and metrics.queries > budget
+        if over_budget:
+            logger.warning(
+                "%s %s ran %s queries, over its budget of %s", request.method, name, metrics.queries, budget
+            )
+        endpoint_metrics.record(f"{request.method} {name}", metrics, elapsed, over_budget)
+
+        if getattr(settings, "REQUEST_METRICS_HEADERS", settings.DEBUG):
+            response[QUERY_COUNT_HEADER] = str(metrics.queries)
+            if budget is not None:
+                response[QUERY_BUDGET_HEADER] = str(budget)
+            response["Server-Timing"] = ", ".join([
+                f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+                f'serialize;dur={metrics.serialization_time * 1000:.1f};'
+                f'desc="{metrics.serialization_queries} queries"',
+                f"total;dur={elapsed * 1000:.1f}",
+            ])
+        return response
+
+
+class EndpointMetricsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    @extend_schema(
+        summary="Request metrics per endpoint",
+        description=(
+            "Query counts, database, serialization and total time per HTTP method and URL name, "
+            "since this worker process started. Each worker keeps its own totals."
+        ),
+        tags=["Metrics"],
+    )
+    def get(self, request):
+        return Response(endpoint_metrics.snapshot())
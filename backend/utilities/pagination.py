@@ -1,7 +1,142 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = "page_size"
     max_page_size = 100
-    page_size = 20 
+    page_size = 20
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a composite, unique sort key.
+
+    Pages are fetched with ``WHERE (a, b) < (x, y)`` style predicates built
+    from the last row of the previous page, so with an index matching
+    ``ordering`` every page is an index range scan no matter how deep the
+    client pages. The last field of ``ordering`` must make the key unique.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = 20
+    max_page_size = 100
+    ordering = ("-pk",)
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def _fields(self):
+        return [(name.lstrip("-"), name.startswith("-")) for name in self.ordering]
+
+    def encode_cursor(self, values, reverse):
+        payload = json.dumps({"p": values, "r": int(reverse)}, separators=(",", ":"))
+        encoded = urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)))
+            values = payload["p"]
+            fields = self._fields()
+            if len(values) != len(fields):
+                raise ValueError
+            position = [
+                model._meta.get_field(name).to_python(value) if name != "pk" else model._meta.pk.to_python(value)
+                for (name, _), value in zip(fields, values)
+            ]
+            return position, bool(payload.get("r"))
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def _after(self, position, reverse):
+        """Rows strictly after ``position`` in the (possibly reversed) ordering."""
+        fields = self._fields()
+        clauses = []
+        for i, (name, descending) in enumerate(fields):
+            lookup = "lt" if descending != reverse else "gt"
+            equal = {field: value for (field, _), value in zip(fields[:i], position[:i])}
+            clauses.append(Q(**equal, **{f"{name}__{lookup}": position[i]}))
+        # The redundant bound on the leading column lets the planner turn the
+        # OR chain into a single index range scan.
+        leading, descending = fields[0]
+        bound = Q(**{f"{leading}__{'lte' if descending != reverse else 'gte'}": position[0]})
+        return bound & reduce(or_, clauses)
+
+    def _position(self, obj):
+        values = []
+        for name, _ in self._fields():
+            value = getattr(obj, name)
+            if hasattr(value, "isoformat"):
+                value = value.isoformat()
+            elif not isinstance(value, (int, float, str)) and value is not None:
+                value = str(value)
+            values.append(value)
+        return values
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.cursor_query_param)
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        if reverse:
+            ordering = [name[1:] if name.startswith("-") else f"-{name}" for name in self.ordering]
+        else:
+            ordering = list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(position, reverse))
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_link = None
+        self.previous_link = None
+        if rows:
+            if has_more or reverse:
+                self.next_link = self.encode_cursor(self._position(rows[-1]), reverse=False)
+            if position is not None and (has_more or not reverse):
+                self.previous_link = self.encode_cursor(self._position(rows[0]), reverse=True)
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.next_link,
+            "previous": self.previous_link,
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,29 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .instrumentation import query_budget
+
+
+class QueryBudgetMixin:
+    """``TestCase`` mixin holding requests to the ``query_budget`` their view declares."""
+
+    @contextmanager
+    def assertQueryBudget(self, view, method="GET"):
+        """
+        Fail if the block runs more queries than ``view`` allows for ``method``.
+
+        Use it around one request, with enough rows in the response that a
+        per-row query would push the count over the budget.
+        """
+        budget = query_budget(view, method)
+        if budget is None:
+            self.fail(f"{view.__name__} declares no {method.upper()} query budget")
+        with CaptureQueriesContext(connection) as queries:
+            yield queries
+        if len(queries) > budget:
+            executed = "\n".join(f"{number}. {query['sql']}" for number, query in enumerate(queries.captured_queries, 1))
+            self.fail(
+                f"{view.__name__} {method.upper()} ran {len(queries)} queries, over its budget of {budget}:\n{executed}"
+            )
@@ -0,0 +1,74 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import ApprovalTask, InstitutionApprovalStepApprovorRole, InstitutionApprovalStepApprovorUser
+
+APPROVER_CACHE_TIMEOUT = 60 * 60
+
+
+def _cache_key(step_id):
+    return f"step-approvers:{step_id}"
+
+
+def step_approvers(step_ids):
+    """
+    Map each of ``step_ids`` to the frozenset of user ids who approve it.
+
+    Approvers are the holders of the step's approver roles plus its
+    explicit approvers. Steps missing from the cache are resolved together
+    with one ``UNION`` query and cached until an approver row or a
+    ``UserRole`` of one of their roles changes. The invalidation reaches
+    other processes only through a shared cache, the Redis one in
+    ``CACHES``.
+    """
+    step_ids = set(step_ids)
+    keys = {_cache_key(step_id): step_id for step_id in step_ids}
+    approvers = {keys[key]: users for key, users in cache.get_many(keys).items()}
+    missing = step_ids - approvers.keys()
+    if missing:
+        resolved = {step_id: set() for step_id in missing}
+        role_holders = InstitutionApprovalStepApprovorRole.objects.filter(
+            step_id__in=missing, approver_role__user_roles__isnull=False
+        ).values_list("step_id", "approver_role__user_roles__user_id")
+        explicit = InstitutionApprovalStepApprovorUser.objects.filter(step_id__in=missing).values_list(
+            "step_id", "approver_user__user_id"
+        )
+        for step_id, user_id in role_holders.union(explicit):
+            resolved[step_id].add(user_id)
+        resolved = {step_id: frozenset(users) for step_id, users in resolved.items()}
+        cache.set_many({_cache_key(step_id): users for step_id, users in resolved.items()}, APPROVER_CACHE_TIMEOUT)
+        approvers.update(resolved)
+    return approvers
+
+
+def task_approvers(task):
+    """Ids of the users who approve ``task``."""
+    return step_approvers([task.step_id])[task.step_id]
+
+
+def workflow_approvers(task):
+    """Ids of the users who approve any step of the workflow ``task`` belongs to."""
+    step_ids = ApprovalTask.objects.filter(
+        content_type_id=task.content_type_id, object_id=task.object_id
+    ).values_list("step_id", flat=True)
+    return frozenset().union(*step_approvers(step_ids).values())
+
+
+def invalidate_step_approvers(step_ids):
+    """
+    Drop the cached approvers of ``step_ids``, now and again once the transaction commits.
+
+    The second drop covers a request that cached the old approvers
+    between the change and its commit.
+    """
+    keys = [_cache_key(step_id) for step_id in set(step_ids)]
+    if keys:
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_role_approvers(role_id):
+    """Drop the cached approvers of every step ``role_id`` approves."""
+    invalidate_step_approvers(
+        InstitutionApprovalStepApprovorRole.objects.filter(approver_role_id=role_id).values_list("step_id", flat=True)
+    )
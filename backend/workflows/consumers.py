@@ -1,81 +1,100 @@
+import asyncio
 import json
+
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.contrib.auth.models import AnonymousUser
-from django.db.models import Q
-from .models import ApprovalTask
-from .serializers import ApprovalTaskSerializer
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .notifications import notification_group, task_snapshot
+
+HEARTBEAT_INTERVAL = 30
+
 
 class NotificationConsumer(AsyncWebsocketConsumer):
-    pass
-    # def __init__(self, *args, **kwargs):
-    #     super().__init__(*args, **kwargs)
-    #     self.notification_group = None
-    #     self.user = None
-
-    # async def connect(self):
-    #     self.user = self.scope["user"]
-
-    #     if isinstance(self.user, AnonymousUser) or not self.user.is_authenticated:
-    #         await self.close()
-    #         return
-
-    #     self.notification_group = f"user_{self.user.id}_notifications"
-
-    #     await self.channel_layer.group_add(self.notification_group, self.channel_name)
-
-    #     await self.accept()
-
-    #     tasks = await self.get_user_tasks()
-    #     await self.send(text_data=json.dumps({"type": "initial_tasks", "tasks": tasks}))
-
-    # async def disconnect(self, close_code):
-    #     if self.notification_group:
-    #         try:
-    #             await self.channel_layer.group_discard(
-    #                 self.notification_group, self.channel_name
-    #             )
-    #         except Exception as e:
-    #             print(f"Error in disconnect(): {e}")
-
-    #     else:
-    #         print("No notification group set, Skipping....")
-
-    # async def receive(self, text_data):
-    #     data = json.loads(text_data)
-    #     message_type = data.get("type", "")
-
-    #     if message_type == "fetch_tasks":
-    #         tasks = await self.get_user_tasks()
-    #         await self.send(
-    #             text_data=json.dumps({"type": "tasks_data", "tasks": tasks})
-    #         )
-
-    # async def notification_message(self, event):
-    #     await self.send(
-    #         text_data=json.dumps(
-    #             {
-    #                 "type": "notification",
-    #                 "message": event["message"],
-    #                 "task": event.get("task", None),
-    #             }
-    #         )
-    #     )
-
-    # async def tasks_update(self, event):
-    #     await self.send(
-    #         text_data=json.dumps({"type": "tasks_update", "tasks": event["tasks"]})
-    #     )
-
-    # @database_sync_to_async
-    # def get_user_tasks(self):
-    #     user = self.user
-    #     user_roles = user.user_roles.values_list("role_id", flat=True)
-
-    #     tasks = ApprovalTask.objects.filter(
-    #         Q(step__roles__approver_role__id__in=user_roles)
-    #         | Q(step__approver__approver_user__user__id=user.id)
-    #     ).distinct()
-
-    #     serializer = ApprovalTaskSerializer(tasks, many=True)
-    #     return serializer.data
+    """
+    Task inbox and notifications of the authenticated user.
+
+    On connect the client gets a ``tasks_snapshot`` with its whole inbox
+    and the sequence number it is current as of, then ``task_delta``
+    messages as tasks change and ``notification`` messages for people.
+    Deltas numbered at or below the snapshot's sequence are already in it.
+    A ``task_delta`` whose sequence is not one past the last seen means
+    messages were missed; the client sends ``{"type": "fetch_tasks"}``
+    and gets a fresh snapshot. ``{"type": "ping"}`` is answered with a
+    ``pong``, and the server sends a ``heartbeat`` every
+    ``NOTIFICATION_HEARTBEAT_SECONDS`` so idle proxies keep the socket open
+    and the client can tell a dead connection from a quiet inbox.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.notification_group = None
+        self.user = None
+        self.heartbeat = None
+
+    async def connect(self):
+        self.user = self.scope.get("user")
+
+        if self.user is None or not self.user.is_authenticated:
+            await self.close()
+            return
+
+        self.notification_group = notification_group(self.user.id)
+
+        # Join before the snapshot, so no delta falls between the two
+        await self.channel_layer.group_add(self.notification_group, self.channel_name)
+
+        await self.accept()
+
+        await self.send_snapshot()
+        self.heartbeat = asyncio.create_task(self.send_heartbeats())
+
+    async def disconnect(self, close_code):
+        if self.heartbeat:
+            self.heartbeat.cancel()
+        if self.notification_group:
+            await self.channel_layer.group_discard(self.notification_group, self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            message_type = json.loads(text_data or "{}").get("type", "")
+        except (ValueError, AttributeError):
+            await self.send_json({"type": "error", "message": "Messages must be JSON objects"})
+            return
+
+        if message_type == "fetch_tasks":
+            await self.send_snapshot()
+        elif message_type == "ping":
+            await self.send_json({"type": "pong"})
+        else:
+            await self.send_json({"type": "error", "message": f"Unknown message type {message_type!r}"})
+
+    async def notification_message(self, event):
+        await self.send_json(
+            {
+                "type": "notification",
+                "message": event["message"],
+                "task_id": event.get("task_id"),
+            }
+        )
+
+    async def notification_batch(self, event):
+        for message in event["messages"]:
+            await self.dispatch(message)
+
+    async def task_delta(self, event):
+        await self.send_json({"type": "task_delta", "sequence": event["sequence"], "deltas": event["deltas"]})
+
+    async def send_snapshot(self):
+        snapshot = await database_sync_to_async(task_snapshot)(self.user)
+        await self.send_json({"type": "tasks_snapshot", **snapshot})
+
+    async def send_heartbeats(self):
+        interval = getattr(settings, "NOTIFICATION_HEARTBEAT_SECONDS", HEARTBEAT_INTERVAL)
+        while True:
+            await asyncio.sleep(interval)
+            await self.send_json({"type": "heartbeat"})
+
+    async def send_json(self, content):
+        await self.send(text_data=json.dumps(content, cls=DjangoJSONEncoder))
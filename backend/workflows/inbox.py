@@ -0,0 +1,136 @@
+from itertools import islice
+
+from django.db import transaction
+
+INBOX_BATCH_SIZE = 1000
+
+
+def _insert_entries(entry_model, user_ids, tasks, batch_size):
+    """Give each of ``user_ids`` an entry for each of ``tasks``, a queryset; returns how many rows were sent."""
+    if not user_ids:
+        return 0
+    entries = (
+        entry_model(user_id=user_id, task_id=task_id, status=status)
+        for task_id, status in tasks.values_list("pk", "status").iterator(chunk_size=batch_size)
+        for user_id in user_ids
+    )
+    written = 0
+    while batch := list(islice(entries, batch_size)):
+        entry_model.objects.bulk_create(batch, ignore_conflicts=True)
+        written += len(batch)
+    return written
+
+
+def fill_task_inboxes(task_model, approver_role_model, approver_user_model, entry_model, batch_size=INBOX_BATCH_SIZE):
+    """
+    Rebuild every approver inbox from the approval steps, one step per transaction.
+
+    Entries of users who no longer approve a step are deleted and missing
+    ones inserted, so it both fills an empty table and repairs a drifted
+    one. Migration 0004 runs a frozen copy of it. Yields
+    ``(step_id, entries)``, the number of inbox rows the step's tasks now
+    have.
+    """
+    step_ids = task_model.objects.order_by("step_id").values_list("step_id", flat=True).distinct()
+    for step_id in list(step_ids):
+        with transaction.atomic():
+            by_role = approver_role_model.objects.filter(
+                step_id=step_id, approver_role__user_roles__isnull=False
+            ).values_list("approver_role__user_roles__user_id", flat=True)
+            explicit = approver_user_model.objects.filter(step_id=step_id).values_list("approver_user__user_id", flat=True)
+            approvers = set(by_role.union(explicit))
+            entry_model.objects.filter(task__step_id=step_id).exclude(user_id__in=approvers).delete()
+            yield step_id, _insert_entries(entry_model, approvers, task_model.objects.filter(step_id=step_id), batch_size)
+
+
+def rebuild_task_inboxes(batch_size=INBOX_BATCH_SIZE):
+    from .models import (
+        ApprovalTask,
+        InstitutionApprovalStepApprovorRole,
+        InstitutionApprovalStepApprovorUser,
+        TaskInboxEntry,
+    )
+
+    return fill_task_inboxes(
+        ApprovalTask, InstitutionApprovalStepApprovorRole, InstitutionApprovalStepApprovorUser, TaskInboxEntry, batch_size
+    )
+
+
+def inbox_tasks(user):
+    """The tasks in ``user``'s inbox."""
+    from .models import ApprovalTask
+
+    return ApprovalTask.objects.filter(inbox_entries__user=user)
+
+
+def add_to_inboxes(tasks):
+    """Put new ``tasks`` in the inboxes of their step's approvers."""
+    from .approvers import step_approvers
+    from .models import TaskInboxEntry
+
+    approvers = step_approvers({task.step_id for task in tasks})
+    TaskInboxEntry.objects.bulk_create(
+        [
+            TaskInboxEntry(user_id=user_id, task_id=task.pk, status=task.status)
+            for task in tasks
+            for user_id in approvers[task.step_id]
+        ],
+        batch_size=INBOX_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def update_inbox_status(tasks):
+    """Copy the status of ``tasks`` onto their inbox entries, one ``UPDATE`` per status."""
+    from .models import TaskInboxEntry
+
+    by_status = {}
+    for task in tasks:
+        by_status.setdefault(task.status, []).append(task.pk)
+    for status, task_ids in by_status.items():
+        TaskInboxEntry.objects.filter(task_id__in=task_ids).exclude(status=status).update(status=status)
+
+
+def approved_steps(user_ids):
+    """Map each of ``user_ids`` to the set of step ids they approve, by role or by name."""
+    from .models import InstitutionApprovalStepApprovorRole, InstitutionApprovalStepApprovorUser
+
+    steps = {user_id: set() for user_id in user_ids}
+    by_role = InstitutionApprovalStepApprovorRole.objects.filter(
+        approver_role__user_roles__user_id__in=steps
+    ).values_list("approver_role__user_roles__user_id", "step_id")
+    explicit = InstitutionApprovalStepApprovorUser.objects.filter(approver_user__user_id__in=steps).values_list(
+        "approver_user__user_id", "step_id"
+    )
+    for user_id, step_id in by_role.union(explicit):
+        steps[user_id].add(step_id)
+    return steps
+
+
+def sync_user_inboxes(user_ids):
+    """
+    Bring the inboxes of ``user_ids`` in line with the steps they approve now.
+
+    Called when a role, a role holder or an explicit approver changes.
+    Only the steps a user gained or lost are touched: tasks of a lost step
+    leave the inbox, tasks of a gained one are added.
+    """
+    from .models import ApprovalTask, TaskInboxEntry
+
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    approved = approved_steps(user_ids)
+    present = {user_id: set() for user_id in user_ids}
+    for user_id, step_id in TaskInboxEntry.objects.filter(user_id__in=user_ids).values_list(
+        "user_id", "task__step_id"
+    ).distinct():
+        present[user_id].add(step_id)
+
+    for user_id in user_ids:
+        lost = present[user_id] - approved[user_id]
+        if lost:
+            TaskInboxEntry.objects.filter(user_id=user_id, task__step_id__in=lost).delete()
+        gained = approved[user_id] - present[user_id]
+        if gained:
+            _insert_entries(TaskInboxEntry, [user_id], ApprovalTask.objects.filter(step_id__in=gained), INBOX_BATCH_SIZE)
@@ -0,0 +1,137 @@
+import asyncio
+import statistics
+import time
+import uuid as uuid_module
+
+from channels.layers import get_channel_layer
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from institution.models import Branch, Institution
+from users.models import CustomUser, Profile, Role, UserRole
+from workflows.inbox import add_to_inboxes
+from workflows.middleware import NotificationBatchMiddleware
+from workflows.models import (
+    ApprovalTask,
+    InstitutionApprovalStep,
+    InstitutionApprovalStepApprovorRole,
+    TaskInboxSequence,
+    WorkflowAction,
+    WorkflowCategory,
+)
+from workflows.views import ApproveTaskDetailAPIView
+
+
+def create_approval_fixture(approvers, workflows):
+    """Commit a two-step approval flow whose steps ``approvers`` users approve, with ``workflows`` open workflows."""
+    suffix = uuid_module.uuid4().hex[:8]
+    owner = CustomUser.objects.create_user(email=f"approvals-{suffix}@example.com", fullname="Benchmark Owner")
+    institution = Institution.objects.create(
+        institution_owner=owner, institution_name=f"Benchmark {suffix}", created_by=owner
+    )
+    category = WorkflowCategory.objects.create(code=f"benchmark-{suffix}", label="Benchmark")
+    action = WorkflowAction.objects.create(category=category, code=f"benchmark-{suffix}", label="Benchmark")
+    role = Role.objects.create(name=f"Approver {suffix}", description="Benchmark", institution=institution)
+    steps = []
+    for level in (1, 2):
+        step = InstitutionApprovalStep.objects.create(
+            Institution=institution, step_name=f"Level {level}", action=action, level=level
+        )
+        InstitutionApprovalStepApprovorRole.objects.create(step=step, approver_role=role)
+        steps.append(step)
+
+    users = CustomUser.objects.bulk_create(
+        CustomUser(email=f"approver-{i}-{suffix}@example.com", fullname=f"Approver {i}") for i in range(approvers)
+    )
+    Profile.objects.bulk_create(Profile(user=user, institution=institution) for user in users)
+    UserRole.objects.bulk_create(UserRole(user=user, role=role) for user in users)
+    content_type = ContentType.objects.get_for_model(Institution)
+    tasks = ApprovalTask.objects.bulk_create(
+        ApprovalTask(step=step, content_type=content_type, object_id=number, status="pending" if step.level == 1 else "not_started")
+        for number in range(1, workflows + 1)
+        for step in steps
+    )
+    add_to_inboxes(tasks)
+    return institution, users, [task for task in tasks if task.step_id == steps[0].id]
+
+
+def delete_approval_fixture(institution, users):
+    steps = InstitutionApprovalStep.objects.filter(Institution=institution)
+    action_ids = list(steps.values_list("action_id", flat=True).distinct())
+    category_ids = list(WorkflowAction.objects.filter(pk__in=action_ids).values_list("category_id", flat=True))
+    ApprovalTask.objects.filter(step__in=steps).delete()
+    steps.delete()
+    WorkflowAction.objects.filter(pk__in=action_ids).delete()
+    WorkflowCategory.objects.filter(pk__in=category_ids).delete()
+    TaskInboxSequence.objects.filter(user__in=users).delete()
+    Role.objects.filter(institution=institution).delete()
+    Branch.objects.filter(institution=institution).delete()
+    owner_id = institution.institution_owner_id
+    Profile.objects.filter(institution=institution).delete()
+    institution.delete()
+    CustomUser.objects.filter(pk__in=[user.pk for user in users] + [owner_id]).delete()
+
+
+class Command(BaseCommand):
+    help = (
+        "Approve tasks through the task status endpoint in a many-approver institution and report "
+        "request latency and how many channel layer sends happened inside a transaction"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--approvers", type=int, default=40)
+        parser.add_argument("--workflows", type=int, default=50)
+        parser.add_argument(
+            "--layer-latency-ms", type=float, default=1.0,
+            help="Round trip added to each group_send of the in-memory channel layer, standing in for Redis",
+        )
+
+    def handle(self, *args, **options):
+        in_memory = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+        with override_settings(CHANNEL_LAYERS=in_memory):
+            institution, users, tasks = create_approval_fixture(options["approvers"], options["workflows"])
+            try:
+                self.approve(users[0], tasks, options["layer_latency_ms"] / 1000)
+            finally:
+                delete_approval_fixture(institution, users)
+
+    def approve(self, user, tasks, latency):
+        layer = get_channel_layer()
+        group_send = layer.group_send
+        sends = {"total": 0, "in_transaction": 0}
+        # The request's own connection object: the sends run on the event
+        # loop's thread, where ``connection`` would be another one
+        database = connections["default"]
+
+        async def slow_group_send(group, message):
+            sends["total"] += 1
+            sends["in_transaction"] += database.in_atomic_block
+            await asyncio.sleep(latency)
+            await group_send(group, message)
+
+        layer.group_send = slow_group_send
+        view = ApproveTaskDetailAPIView.as_view()
+        factory = APIRequestFactory()
+        timings = []
+        for task in tasks:
+            request = factory.patch(f"/task/{task.pk}/status/", {"status": "completed"}, format="json")
+            force_authenticate(request, user)
+            started = time.perf_counter()
+            # Route the request through the middleware as the URL resolver would
+            response = NotificationBatchMiddleware(lambda request: view(request, task_id=task.pk))(request)
+            timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                self.stderr.write(f"Task {task.pk}: {response.status_code} {response.data}")
+
+        ordered = sorted(timings)
+        self.stdout.write(
+            f"{len(tasks)} approvals: p50 {statistics.median(ordered):.1f} ms  "
+            f"p95 {ordered[int(len(ordered) * 0.95) - 1]:.1f} ms  max {ordered[-1]:.1f} ms"
+        )
+        self.stdout.write(
+            f"{sends['total'] / len(tasks):.0f} channel layer sends per approval, "
+            f"{sends['in_transaction'] / len(tasks):.0f} of them inside a transaction"
+        )
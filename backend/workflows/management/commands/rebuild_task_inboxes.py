@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from workflows.inbox import INBOX_BATCH_SIZE, rebuild_task_inboxes
+
+
+class Command(BaseCommand):
+    help = "Rebuild the approver task inboxes from the approval steps, one step per transaction"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=INBOX_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        total = 0
+        for step_id, entries in rebuild_task_inboxes(batch_size=options["batch_size"]):
+            total += entries
+            self.stdout.write(f"Step {step_id}: {entries} inbox rows")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} inbox rows"))
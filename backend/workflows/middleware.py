@@ -1,9 +1,12 @@
+from urllib.parse import parse_qs
+
 from channels.middleware import BaseMiddleware
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
 from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from django.contrib.auth import get_user_model
+from workflows.notifications import notification_batch
 
 User = get_user_model()
 
@@ -18,10 +21,9 @@ def get_user(token_key):
 
 class TokenAuthMiddleware(BaseMiddleware):
     async def __call__(self, scope, receive, send):
-        query_string = scope.get('query_string', b'').decode()
-        query_params = dict(param.split('=') for param in query_string.split('&') if param)
-        
-        token = query_params.get('token', None)
+        query_params = parse_qs(scope.get('query_string', b'').decode())
+
+        token = query_params.get('token', [None])[0]
         
         if not token and 'headers' in scope:
             headers = dict(scope['headers'])
@@ -35,4 +37,21 @@ class TokenAuthMiddleware(BaseMiddleware):
         else:
             scope['user'] = AnonymousUser()
         
-        return await super().__call__(scope, receive, send)
\ No newline at end of file
+        return await super().__call__(scope, receive, send)
+
+
+class NotificationBatchMiddleware:
+    """
+    Send the notifications committed during a request as one batch when it ends.
+
+    Helpers in ``workflows.notifications`` queue their messages until the
+    transaction commits; this gathers those of the whole request so they
+    leave together instead of one channel layer round trip at a time.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with notification_batch():
+            return self.get_response(request)
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-17 20:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_rename_institution_role_institution_and_more'),
+        ('workflows', '0002_task_inbox_sequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskInboxEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('not_started', 'Not Started'), ('pending', 'Pending'), ('completed', 'Completed'), ('rejected', 'Rejected'), ('terminated', 'Terminated')], max_length=20)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to='workflows.approvaltask')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_inbox', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'task')},
+            },
+        ),
+    ]
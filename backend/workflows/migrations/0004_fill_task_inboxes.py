@@ -0,0 +1,47 @@
+from itertools import islice
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 1000
+
+
+def fill_inboxes(apps, schema_editor):
+    # A copy of workflows.inbox.fill_task_inboxes as it was when this
+    # migration was written, so later changes to that module cannot change
+    # it. Before the status index exists, so it is built once over the rows.
+    ApprovalTask = apps.get_model('workflows', 'ApprovalTask')
+    ApprovorRole = apps.get_model('workflows', 'InstitutionApprovalStepApprovorRole')
+    ApprovorUser = apps.get_model('workflows', 'InstitutionApprovalStepApprovorUser')
+    TaskInboxEntry = apps.get_model('workflows', 'TaskInboxEntry')
+
+    step_ids = ApprovalTask.objects.order_by('step_id').values_list('step_id', flat=True).distinct()
+    for step_id in list(step_ids):
+        with transaction.atomic():
+            by_role = ApprovorRole.objects.filter(
+                step_id=step_id, approver_role__user_roles__isnull=False
+            ).values_list('approver_role__user_roles__user_id', flat=True)
+            explicit = ApprovorUser.objects.filter(step_id=step_id).values_list('approver_user__user_id', flat=True)
+            approvers = set(by_role.union(explicit))
+            if not approvers:
+                continue
+            tasks = ApprovalTask.objects.filter(step_id=step_id).values_list('pk', 'status')
+            entries = (
+                TaskInboxEntry(user_id=user_id, task_id=task_id, status=status)
+                for task_id, status in tasks.iterator(chunk_size=BATCH_SIZE)
+                for user_id in approvers
+            )
+            while batch := list(islice(entries, BATCH_SIZE)):
+                TaskInboxEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+    # One transaction per approval step rather than one for every inbox
+    atomic = False
+
+    dependencies = [
+        ('workflows', '0003_task_inbox_entry'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_inboxes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workflows', '0004_fill_task_inboxes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='taskinboxentry',
+            index=models.Index(fields=['user', 'status', 'task'], name='task_inbox_user_status_idx'),
+        ),
+    ]
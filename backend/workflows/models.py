@@ -140,21 +140,59 @@ class ApprovalTask(models.Model):
             self.approved_by = profile
             self.save(update_fields=["status", "updated_at", "comment", "approved_by"])
 
-            # Terminate other tasks
-            terminated_tasks = ApprovalTask.objects.filter(
+            # Terminate other tasks, keeping them for the notifications below
+            terminated_tasks = list(ApprovalTask.objects.filter(
                 content_type=self.content_type,
                 object_id=self.object_id
-            ).exclude(id=self.id).filter(status__in=["not_started", "pending"])
+            ).exclude(id=self.id).filter(status__in=["not_started", "pending"]).select_related("step"))
 
-            terminated_tasks.update(status="terminated")
+            ApprovalTask.objects.filter(pk__in=[task.pk for task in terminated_tasks]).update(status="terminated")
+            for task in terminated_tasks:
+                task.status = "terminated"
+
+            # update() skips the post_save that keeps inboxes in step
+            from workflows.inbox import update_inbox_status
+            update_inbox_status(terminated_tasks)
 
             # Notify task rejection
             from workflows.notifications import notify_task_rejection
             notify_task_rejection(self)
 
             # Notify terminated tasks
-            from workflows.notifications import notify_task_update
-            for task in terminated_tasks:
-                notify_task_update(task)
+            from workflows.notifications import notify_task_updates
+            notify_task_updates(terminated_tasks)
 
             self.content_object.finish_workflow()
+
+
+class TaskInboxSequence(models.Model):
+    """Sequence number of the last task delta pushed to a user, see ``workflows.notifications``."""
+
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name="task_inbox_sequence")
+    sequence = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user} - {self.sequence}"
+
+
+class TaskInboxEntry(models.Model):
+    """
+    One task in one approver's inbox, see ``workflows.inbox``.
+
+    Kept in step with the task's approvers and, through ``status``, with
+    the task's status, so an inbox page is a range of one index instead of
+    a join across both ways of approving a step.
+    """
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="task_inbox")
+    task = models.ForeignKey(ApprovalTask, on_delete=models.CASCADE, related_name="inbox_entries")
+    status = models.CharField(max_length=20, choices=ApprovalTask.STATUS_CHOICES)
+
+    class Meta:
+        unique_together = ("user", "task")
+        indexes = [
+            models.Index(fields=["user", "status", "task"], name="task_inbox_user_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.task_id} [{self.status}]"
@@ -1,52 +1,205 @@
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
-import json
+from django.db import transaction
+from django.db.models import F
 
-def notify_task_update(task):
-    """Send WebSocket notification about task update"""
+logger = logging.getLogger(__name__)
+
+TASK_CREATED = "created"
+TASK_STATUS_CHANGED = "status_changed"
+TASK_REMOVED = "removed"
+
+
+_batch = ContextVar("notification_batch", default=None)
+
+
+def notification_group(user_id):
+    return f"user_{user_id}_notifications"
+
+
+def send_to_group(group, message):
+    """
+    Send ``message`` to ``group`` once the current transaction commits.
+
+    Nothing goes out for a transaction that rolls back, and no channel
+    layer round trip happens while its row locks are held. Inside
+    ``notification_batch`` the message waits for the end of the batch.
+    """
+    transaction.on_commit(partial(_committed, group, message))
+
+
+def _committed(group, message):
+    batch = _batch.get()
+    if batch is None:
+        dispatch([(group, message)])
+    else:
+        batch.append((group, message))
+
+
+def dispatch(messages):
+    """
+    Send ``(group, message)`` pairs with one ``group_send`` per group, all at once.
+
+    Several messages for one group travel as a single ``notification_batch``
+    message that the consumer unpacks in order. The sends run concurrently
+    on one event loop, so with the Redis layer a batch costs about one
+    round trip instead of one per message. The data they describe is
+    already committed, so a failing layer is logged rather than raised.
+    """
+    if not messages:
+        return
+    by_group = {}
+    for group, message in messages:
+        by_group.setdefault(group, []).append(message)
     channel_layer = get_channel_layer()
 
-    # Get all users who should be notified (approvers and users with approver roles)
-    approver_users = set()
+    async def send_all():
+        await asyncio.gather(*(
+            channel_layer.group_send(
+                group, queued[0] if len(queued) == 1 else {"type": "notification_batch", "messages": queued}
+            )
+            for group, queued in by_group.items()
+        ))
+
+    try:
+        async_to_sync(send_all)()
+    except Exception:
+        logger.exception("Could not send %s notifications", len(messages))
 
-    # Add users with approver roles
-    for role in task.step.roles.all():
-        for user_role in role.approver_role.user_roles.all():
-            approver_users.add(user_role.user.id)
 
-    # Add explicit approvers
-    for approver in task.step.approver.all():
-        approver_users.add(approver.approver_user.user.id)
+@contextmanager
+def notification_batch():
+    """Hold the messages committed inside the block and send them as one batch at its end."""
+    messages = []
+    token = _batch.set(messages)
+    try:
+        yield messages
+    finally:
+        _batch.reset(token)
+        dispatch(messages)
+
+
+def next_sequences(user_ids):
+    """
+    Advance the task inbox sequence of each of ``user_ids`` by one, returning ``{user_id: sequence}``.
+
+    Rows are locked in user order before the update so concurrent pushes to
+    overlapping users queue up instead of deadlocking.
+    """
+    from workflows.models import TaskInboxSequence
+
+    user_ids = sorted(user_ids)
+    if not user_ids:
+        return {}
+    with transaction.atomic():
+        TaskInboxSequence.objects.bulk_create(
+            [TaskInboxSequence(user_id=user_id) for user_id in user_ids], ignore_conflicts=True
+        )
+        rows = TaskInboxSequence.objects.filter(user_id__in=user_ids)
+        list(rows.select_for_update().order_by("user_id").values_list("pk", flat=True))
+        rows.update(sequence=F("sequence") + 1)
+        return dict(rows.values_list("user_id", "sequence"))
+
+
+def push_task_deltas(changes):
+    """
+    Push ``changes``, a list of ``(event, task)`` pairs, to the inboxes they touch.
+
+    ``event`` is ``TASK_CREATED``, ``TASK_STATUS_CHANGED`` or ``TASK_REMOVED``.
+    Each task is serialized once, and every approver of an affected task
+    gets a single ``task_delta`` message with the deltas for their inbox
+    and their next sequence number. A client that sees a sequence other
+    than the one after its last asks for ``task_snapshot`` instead of
+    replaying; deltas carry the whole task, so applying one the snapshot
+    already holds is harmless.
+    """
+    if not changes:
+        return
 
     # Import here to avoid circular import
+    from workflows.approvers import step_approvers
+    from workflows.models import ApprovalTask
     from workflows.serializers import ApprovalTaskSerializer
 
-    # Serialize task data
-    serializer = ApprovalTaskSerializer(task)
-    task_data = serializer.data
-
-    # Send notification to each user
-    for user_id in approver_users:
-        async_to_sync(channel_layer.group_send)(
-            f"user_{user_id}_notifications",
-            {
-                "type": "notification_message",
-                "message": f"You have a new task to approve: {task.step.step_name}",
-                "task": task_data
-            }
+    approvers = step_approvers({task.step_id for _, task in changes})
+    latest = {}
+    for event, task in changes:
+        latest[task.pk] = (event, task)
+    current = ApprovalTask.objects.filter(pk__in=[pk for pk, (event, _) in latest.items() if event != TASK_REMOVED])
+    serialized = {
+        row["id"]: row
+        for row in ApprovalTaskSerializer(ApprovalTaskSerializer.setup_eager_loading(current), many=True).data
+    }
+
+    deltas_by_user = {}
+    for task_id, (event, task) in latest.items():
+        delta = {"event": event, "task_id": task_id}
+        if event != TASK_REMOVED:
+            delta["task"] = serialized[task_id]
+        for user_id in approvers[task.step_id]:
+            deltas_by_user.setdefault(user_id, []).append(delta)
+
+    sequences = next_sequences(deltas_by_user)
+    for user_id, deltas in deltas_by_user.items():
+        send_to_group(
+            notification_group(user_id),
+            {"type": "task_delta", "sequence": sequences[user_id], "deltas": deltas},
         )
 
-        # Also send updated tasks list
-        send_updated_tasks_to_user(user_id)
+
+def task_snapshot(user):
+    """
+    ``user``'s whole task inbox with the sequence number it is current as of.
+
+    The sequence is read before the tasks, so a delta racing the snapshot
+    is either in it or numbered after it, never lost.
+    """
+    # Import here to avoid circular import
+    from workflows.inbox import inbox_tasks
+    from workflows.models import TaskInboxSequence
+    from workflows.serializers import ApprovalTaskSerializer
+
+    sequence = TaskInboxSequence.objects.filter(user=user).values_list("sequence", flat=True).first() or 0
+    tasks = ApprovalTaskSerializer.setup_eager_loading(inbox_tasks(user))
+    return {"sequence": sequence, "tasks": ApprovalTaskSerializer(tasks, many=True).data}
+
+
+def notify_task_update(task):
+    """Send WebSocket notification about task update"""
+    notify_task_updates([task])
+
+
+def notify_task_updates(tasks):
+    """Tell the approvers of ``tasks`` about their new status, one message per approver"""
+    from workflows.approvers import step_approvers
+
+    approvers = step_approvers({task.step_id for task in tasks})
+
+    for task in tasks:
+        for user_id in approvers[task.step_id]:
+            send_to_group(
+                notification_group(user_id),
+                {
+                    "type": "notification_message",
+                    "message": f"You have a new task to approve: {task.step.step_name}",
+                    "task_id": task.pk,
+                }
+            )
+
+    push_task_deltas([(TASK_STATUS_CHANGED, task) for task in tasks])
 
 def notify_task_completion(task):
     """Notify about task completion"""
-    channel_layer = get_channel_layer()
-
     # Notify the task creator/owner if applicable
     if hasattr(task.content_object, 'created_by') and task.content_object.created_by:
         user_id = task.content_object.created_by.id
-        async_to_sync(channel_layer.group_send)(
+        send_to_group(
             f"user_{user_id}_notifications",
             {
                 "type": "notification_message",
@@ -56,12 +209,10 @@ def notify_task_completion(task):
 
 def notify_task_rejection(task):
     """Notify about task rejection"""
-    channel_layer = get_channel_layer()
-
     # Notify the task creator/owner if applicable
     if hasattr(task.content_object, 'created_by') and task.content_object.created_by:
         user_id = task.content_object.created_by.id
-        async_to_sync(channel_layer.group_send)(
+        send_to_group(
             f"user_{user_id}_notifications",
             {
                 "type": "notification_message",
@@ -69,75 +220,24 @@ def notify_task_rejection(task):
             }
         )
 
-def send_updated_tasks_to_user(user_id):
-    """Send updated tasks list to a specific user"""
-    from django.contrib.auth import get_user_model
-    User = get_user_model()
-
-    try:
-        user = User.objects.get(id=user_id)
-        user_roles = user.user_roles.values_list("role_id", flat=True)
-
-        # Import here to avoid circular import
-        from django.db.models import Q
-        from workflows.models import ApprovalTask
-        from workflows.serializers import ApprovalTaskSerializer
-
-        tasks = ApprovalTask.objects.filter(
-            Q(step__roles__approver_role__id__in=user_roles) |
-            Q(step__approver__approver_user__user__id=user.id)
-        ).distinct()
-
-        serializer = ApprovalTaskSerializer(tasks, many=True)
-        tasks_data = serializer.data
-
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f"user_{user_id}_notifications",
-            {
-                "type": "tasks_update",
-                "tasks": tasks_data
-            }
-        )
-    except User.DoesNotExist:
-        pass
-
 def notify_workflow_participants(task, status_change, user):
     """Notify all participants in a workflow about status changes"""
-    channel_layer = get_channel_layer()
-
     # Import here to avoid circular import
-    from django.db.models import Q
-    from workflows.models import ApprovalTask
-
-    # Get all tasks related to this workflow
-    related_tasks = ApprovalTask.objects.filter(
-        content_type=task.content_type,
-        object_id=task.object_id
-    )
+    from workflows.approvers import workflow_approvers
 
     # Collect all users involved in this workflow
-    involved_users = set()
-    for related_task in related_tasks:
-        # Add users with approver roles
-        for role in related_task.step.roles.all():
-            for user_role in role.approver_role.user_roles.all():
-                involved_users.add(user_role.user.id)
-
-        # Add explicit approvers
-        for approver in related_task.step.approver.all():
-            involved_users.add(approver.approver_user.user.id)
+    involved_users = workflow_approvers(task)
 
     # Send notification to all involved users
     for user_id in involved_users:
         if user_id != user.id:
-            async_to_sync(channel_layer.group_send)(
-                f"user_{user_id}_notifications",
+            send_to_group(
+                notification_group(user_id),
                 {
                     "type": "notification_message",
                     "message": f"Task '{task.step.step_name}' has been {status_change} by {user.fullname}"
                 }
             )
 
-            # Also send updated tasks list
-            send_updated_tasks_to_user(user_id)
+    # Only the inboxes holding the task changed, the acting user's included
+    push_task_deltas([(TASK_STATUS_CHANGED, task)])
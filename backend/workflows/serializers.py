@@ -1,5 +1,6 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
-from users.serializers import ProfileSerializer
+from users.serializers import CustomUserSerializer, ProfileSerializer
 from workflows.models import (
     ApprovalTask,
     InstitutionApprovalStep,
@@ -66,34 +67,37 @@ class InstitutionApprovalStepSerializer(serializers.ModelSerializer):
             "level",
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset, prefix=""):
+        """Load the action, approver roles and approver profiles of the steps at ``prefix``."""
+        approver_users = InstitutionApprovalStepApprovorUser.objects.select_related("approver_user__user")
+        return queryset.select_related(f"{prefix}action__category").prefetch_related(
+            Prefetch(
+                f"{prefix}roles",
+                queryset=InstitutionApprovalStepApprovorRole.objects.select_related("approver_role"),
+            ),
+            Prefetch(
+                f"{prefix}approver",
+                queryset=CustomUserSerializer.setup_eager_loading(approver_users, prefix="approver_user__user__"),
+            ),
+        )
+
     def get_roles(self, obj):
         # list of raw role-IDs
-        return list(
-            InstitutionApprovalStepApprovorRole.objects
-                .filter(step=obj)
-                .values_list("approver_role_id", flat=True)
-        )
+        return [step_role.approver_role_id for step_role in obj.roles.all()]
 
     def get_roles_details(self, obj):
-        # fetch the actual Role objects and serialize them
-        qs = Role.objects.filter(
-            id__in=self.get_roles(obj)
-        )
-        return WorkFlowRoleSerializer(qs, many=True).data
+        # the actual Role objects, serialized
+        roles = [step_role.approver_role for step_role in obj.roles.all()]
+        return WorkFlowRoleSerializer(roles, many=True).data
 
     def get_approvers(self, obj):
         # return the PKs of the through‐model instances
-        return list(
-            InstitutionApprovalStepApprovorUser.objects
-                .filter(step=obj)
-                .values_list("id", flat=True)
-        )
+        return [approver.id for approver in obj.approver.all()]
 
     def get_approvers_details(self, obj):
-        # grab the through‐model queryset
-        qs = InstitutionApprovalStepApprovorUser.objects.filter(step=obj)
-        # serialize each with its own ID + nested Profile
-        return InstitutionApproverUserSerializer(qs, many=True).data
+        # serialize each through‐model row with its own ID + nested Profile
+        return InstitutionApproverUserSerializer(obj.approver.all(), many=True).data
 
     def create(self, validated_data:dict):
         request = self.context.get("request")
@@ -144,5 +148,11 @@ class ApprovalTaskSerializer(serializers.ModelSerializer):
         model = ApprovalTask
         fields = ["id", "step", "status", "updated_at", "content_object", "object_id", "comment", "approved_by"]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load the steps and the objects under approval of every task."""
+        queryset = queryset.select_related("step").prefetch_related("content_object")
+        return InstitutionApprovalStepSerializer.setup_eager_loading(queryset, prefix="step__")
+
     def get_content_object(self, obj):
         return str(obj.content_object)
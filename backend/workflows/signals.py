@@ -1,5 +1,100 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.db import transaction as db_transaction
 from django.dispatch import receiver
 from django.contrib.contenttypes.models import ContentType
-from workflows.models import WorkflowAction, InstitutionApprovalStep, ApprovalTask
+from users.models import Profile, UserRole
+from workflows.approvers import invalidate_role_approvers, invalidate_step_approvers
+from workflows.inbox import add_to_inboxes, sync_user_inboxes, update_inbox_status
+from workflows.models import (
+    WorkflowAction,
+    InstitutionApprovalStep,
+    ApprovalTask,
+    InstitutionApprovalStepApprovorRole,
+    InstitutionApprovalStepApprovorUser,
+)
+from workflows.notifications import TASK_CREATED, TASK_REMOVED, push_task_deltas
+
+
+@receiver(post_save, sender=ApprovalTask)
+def push_created_task(sender, instance, created, **kwargs):
+    if created:
+        push_task_deltas([(TASK_CREATED, instance)])
+
+
+@receiver(post_save, sender=ApprovalTask)
+def update_task_inboxes(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if created:
+        add_to_inboxes([instance])
+    elif update_fields is None or "status" in update_fields:
+        update_inbox_status([instance])
+
+
+# Before the delete, while the step's approvers can still be looked up
+@receiver(pre_delete, sender=ApprovalTask)
+def push_removed_task(sender, instance, **kwargs):
+    push_task_deltas([(TASK_REMOVED, instance)])
+
+
+@receiver(post_save, sender=InstitutionApprovalStepApprovorRole)
+@receiver(post_delete, sender=InstitutionApprovalStepApprovorRole)
+@receiver(post_save, sender=InstitutionApprovalStepApprovorUser)
+@receiver(post_delete, sender=InstitutionApprovalStepApprovorUser)
+def drop_step_approvers(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_step_approvers([instance.step_id])
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+def drop_role_approvers(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_role_approvers(instance.role_id)
+
+
+# An edited row may move a step or role, so the cache of the one it leaves goes too
+@receiver(pre_save, sender=InstitutionApprovalStepApprovorRole)
+@receiver(pre_save, sender=InstitutionApprovalStepApprovorUser)
+@receiver(pre_save, sender=UserRole)
+def drop_previous_approvers(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    if sender is UserRole:
+        for role_id in UserRole.objects.filter(pk=instance.pk).exclude(role_id=instance.role_id).values_list("role_id", flat=True):
+            invalidate_role_approvers(role_id)
+    else:
+        invalidate_step_approvers(
+            sender.objects.filter(pk=instance.pk).exclude(step_id=instance.step_id).values_list("step_id", flat=True)
+        )
+
+
+def _inbox_users(sender, instance):
+    """Ids of the users whose inbox depends on ``instance``, a role holder or approver row."""
+    if sender is UserRole:
+        return {instance.user_id}
+    if sender is InstitutionApprovalStepApprovorUser:
+        return set(Profile.objects.filter(pk=instance.approver_user_id).values_list("user_id", flat=True))
+    return set(UserRole.objects.filter(role_id=instance.approver_role_id).values_list("user_id", flat=True))
+
+
+# Remember who the row served before an edit, whose inbox may lose tasks
+@receiver(pre_save, sender=InstitutionApprovalStepApprovorRole)
+@receiver(pre_save, sender=InstitutionApprovalStepApprovorUser)
+@receiver(pre_save, sender=UserRole)
+def remember_inbox_users(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    previous = sender.objects.filter(pk=instance.pk).first()
+    instance._previous_inbox_users = _inbox_users(sender, previous) if previous else set()
+
+
+@receiver(post_save, sender=InstitutionApprovalStepApprovorRole)
+@receiver(post_delete, sender=InstitutionApprovalStepApprovorRole)
+@receiver(post_save, sender=InstitutionApprovalStepApprovorUser)
+@receiver(post_delete, sender=InstitutionApprovalStepApprovorUser)
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+def sync_approver_inboxes(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sync_user_inboxes(_inbox_users(sender, instance) | getattr(instance, "_previous_inbox_users", set()))
@@ -1,3 +1,523 @@
-from django.test import TestCase
+import asyncio
+from urllib.parse import parse_qs, urlparse
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken
+
+from institution.models import Branch, Institution, UserBranch
+from users.models import CustomUser, Permission, PermissionCategory, Profile, Role, RolePermission, UserRole
+from utilities.testing import QueryBudgetMixin
+
+from . import views
+from .approvers import step_approvers, task_approvers, workflow_approvers
+from .inbox import rebuild_task_inboxes
+from .middleware import TokenAuthMiddleware
+from .models import (
+    ApprovalTask,
+    InstitutionApprovalStep,
+    InstitutionApprovalStepApprovorRole,
+    InstitutionApprovalStepApprovorUser,
+    TaskInboxEntry,
+    TaskInboxSequence,
+    WorkflowAction,
+    WorkflowCategory,
+)
+from .notifications import (
+    TASK_CREATED,
+    TASK_REMOVED,
+    TASK_STATUS_CHANGED,
+    notification_batch,
+    notification_group,
+    notify_task_update,
+    notify_workflow_participants,
+    push_task_deltas,
+    task_snapshot,
+)
+from .routing import websocket_urlpatterns
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class WorkflowEndpointQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.institution = Institution.objects.create(
+            institution_owner=cls.user, institution_name='Baifam', created_by=cls.user
+        )
+        actions = []
+        for index in range(3):
+            category = WorkflowCategory.objects.create(code=f'category-{index}', label=f'Category {index}')
+            for number in range(2):
+                actions.append(WorkflowAction.objects.create(category=category, code=f'action-{index}-{number}', label=f'Action {number}'))
+
+        # Approvers with roles, permissions and branches, so every nested prefetch runs
+        permission_category = PermissionCategory.objects.create(permission_category_name='Approvals', permission_category_description='-')
+        cls.branch = branch = Branch.objects.create(institution=cls.institution, branch_name='Main', branch_location='Nairobi')
+        content_types = [ContentType.objects.get_for_model(Institution), ContentType.objects.get_for_model(Branch)]
+        for index, action in enumerate(actions):
+            step = InstitutionApprovalStep.objects.create(Institution=cls.institution, step_name=f'Step {index}', action=action, level=1)
+            role = Role.objects.create(name=f'Role {index}', description='-', institution=cls.institution)
+            RolePermission.objects.create(role=role, permission=Permission.objects.create(
+                permission_code=f'approve-{index}', permission_name=f'Approve {index}', category=permission_category
+            ))
+            UserRole.objects.create(user=cls.user, role=role)
+            InstitutionApprovalStepApprovorRole.objects.create(step=step, approver_role=role)
+            approver = CustomUser.objects.create_user(email=f'approver{index}@example.com', fullname=f'Approver {index}')
+            UserRole.objects.create(user=approver, role=role)
+            UserBranch.objects.create(user=approver, branch=branch)
+            profile, _ = Profile.objects.update_or_create(user=approver, defaults={'institution': cls.institution})
+            InstitutionApprovalStepApprovorUser.objects.create(step=step, approver_user=profile)
+            content_object = cls.institution if index % 2 else branch
+            ApprovalTask.objects.create(
+                step=step, content_type=content_types[index % 2 == 0], object_id=content_object.id, status='pending'
+            )
+
+    def get(self, view, **kwargs):
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, self.user)
+        with self.assertQueryBudget(view):
+            return view.as_view()(request, **kwargs)
+
+    def test_workflow_action_list(self):
+        response = self.get(views.WorkflowActionAPIView)
+        self.assertEqual(len(response.data), 6)
+
+    def test_approval_step_list(self):
+        response = self.get(views.InstitutionApprovalStepAPIView, Institution_id=self.institution.id)
+        self.assertEqual(len(response.data), 6)
+        step = response.data[0]
+        self.assertEqual(len(step['roles']), 1)
+        self.assertEqual(step['roles_details'], [{'name': 'role 0'}])
+        self.assertEqual(step['approvers_details'][0]['approver_user']['user']['email'], 'approver0@example.com')
+        self.assertEqual(len(step['approvers_details'][0]['approver_user']['user']['roles']), 1)
+
+    def test_task_list(self):
+        response = self.get(views.ApproveTaskAPIView)
+        self.assertEqual(len(response.data), 6)
+        self.assertCountEqual(
+            {task['content_object'] for task in response.data}, {str(self.institution), str(self.branch)}
+        )
+
+    def test_task_inbox(self):
+        response = self.get(views.TaskInboxAPIView)
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertEqual(
+            [task['id'] for task in response.data['results']],
+            sorted(ApprovalTask.objects.values_list('id', flat=True), reverse=True),
+        )
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class TaskDeltaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.institution = Institution.objects.create(
+            institution_owner=cls.owner, institution_name='Baifam', created_by=cls.owner
+        )
+        category = WorkflowCategory.objects.create(code='product', label='Product')
+        action = WorkflowAction.objects.create(category=category, code='approve-product', label='Approve product')
+        first = InstitutionApprovalStep.objects.create(Institution=cls.institution, step_name='Review', action=action, level=1)
+        second = InstitutionApprovalStep.objects.create(Institution=cls.institution, step_name='Sign off', action=action, level=2)
+
+        role = Role.objects.create(name='Reviewer', description='-', institution=cls.institution)
+        InstitutionApprovalStepApprovorRole.objects.create(step=first, approver_role=role)
+        cls.reviewers = []
+        for index in range(3):
+            user = CustomUser.objects.create_user(email=f'reviewer{index}@example.com', fullname=f'Reviewer {index}')
+            UserRole.objects.create(user=user, role=role)
+            cls.reviewers.append(user)
+        cls.signer = CustomUser.objects.create_user(email='signer@example.com', fullname='Signer')
+        signer_profile, _ = Profile.objects.update_or_create(user=cls.signer, defaults={'institution': cls.institution})
+        InstitutionApprovalStepApprovorUser.objects.create(step=second, approver_user=signer_profile)
+        cls.outsider = CustomUser.objects.create_user(email='outsider@example.com', fullname='Outsider')
+        for user in [*cls.reviewers, cls.outsider]:
+            Profile.objects.update_or_create(user=user, defaults={'institution': cls.institution})
+
+        content_type = ContentType.objects.get_for_model(Institution)
+        cls.review = ApprovalTask.objects.create(
+            step=first, content_type=content_type, object_id=cls.institution.id, status='pending'
+        )
+        cls.sign_off = ApprovalTask.objects.create(step=second, content_type=content_type, object_id=cls.institution.id)
+
+    def setUp(self):
+        cache.clear()
+        self.layer = get_channel_layer()
+        self.channels = {}
+        for user in [*self.reviewers, self.signer, self.outsider]:
+            self.channels[user.id] = async_to_sync(self.layer.new_channel)()
+            async_to_sync(self.layer.group_add)(notification_group(user.id), self.channels[user.id])
+
+    def received(self, user, message_type='task_delta'):
+        async def drain():
+            messages = []
+            while True:
+                try:
+                    messages.append(await asyncio.wait_for(self.layer.receive(self.channels[user.id]), 0.05))
+                except asyncio.TimeoutError:
+                    return messages
+        return [message for message in async_to_sync(drain)() if message['type'] == message_type]
+
+    def sequence(self, user):
+        return TaskInboxSequence.objects.filter(user=user).values_list('sequence', flat=True).first() or 0
+
+    def test_approval_sends_each_approver_one_delta(self):
+        before = {user.id: self.sequence(user) for user in [*self.reviewers, self.signer]}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.review.mark_completed(self.reviewers[0])
+            notify_workflow_participants(self.review, 'completed', self.reviewers[0])
+
+        for reviewer in self.reviewers:
+            [message] = self.received(reviewer)
+            self.assertEqual(message['sequence'], before[reviewer.id] + 1)
+            [delta] = message['deltas']
+            self.assertEqual(delta['event'], TASK_STATUS_CHANGED)
+            self.assertEqual(delta['task']['id'], self.review.id)
+            self.assertEqual(delta['task']['status'], 'completed')
+        [message] = self.received(self.signer)
+        self.assertEqual(message['sequence'], before[self.signer.id] + 1)
+        self.assertEqual(message['deltas'][0]['task']['status'], 'pending')
+        self.assertEqual(self.received(self.outsider, 'notification_message'), [])
+
+    def test_one_message_per_push_with_consecutive_sequences(self):
+        before = self.sequence(self.signer)
+        with self.captureOnCommitCallbacks(execute=True):
+            push_task_deltas([(TASK_STATUS_CHANGED, self.sign_off), (TASK_STATUS_CHANGED, self.review)])
+            push_task_deltas([(TASK_STATUS_CHANGED, self.sign_off)])
+
+        messages = self.received(self.signer)
+        self.assertEqual([message['sequence'] for message in messages], [before + 1, before + 2])
+        self.assertEqual([len(message['deltas']) for message in messages], [1, 1])
+
+        snapshot = task_snapshot(self.signer)
+        self.assertEqual(snapshot['sequence'], before + 2)
+        self.assertEqual([task['id'] for task in snapshot['tasks']], [self.sign_off.id])
+
+    def test_rejection_reports_terminated_tasks(self):
+        with mock.patch.object(Institution, 'finish_workflow', create=True), self.captureOnCommitCallbacks(execute=True):
+            self.review.mark_rejected(self.reviewers[1])
+
+        [message] = self.received(self.signer)
+        [delta] = message['deltas']
+        self.assertEqual((delta['task_id'], delta['task']['status']), (self.sign_off.id, 'terminated'))
+
+    def test_created_and_removed_tasks(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            task = ApprovalTask.objects.create(
+                step=self.sign_off.step, content_type=self.sign_off.content_type, object_id=self.institution.id + 1
+            )
+            task_id = task.id
+            task.delete()
+
+        created, removed = self.received(self.signer)
+        self.assertEqual(created['deltas'][0]['event'], TASK_CREATED)
+        self.assertEqual(created['deltas'][0]['task']['id'], task_id)
+        self.assertEqual(removed['deltas'], [{'event': TASK_REMOVED, 'task_id': task_id}])
+        self.assertEqual(removed['sequence'], created['sequence'] + 1)
+        self.assertEqual(self.received(self.reviewers[0]), [])
+
+    def test_nothing_is_sent_before_commit_or_after_rollback(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            push_task_deltas([(TASK_STATUS_CHANGED, self.sign_off)])
+            self.assertEqual(self.received(self.signer), [])
+        try:
+            with transaction.atomic():
+                push_task_deltas([(TASK_STATUS_CHANGED, self.sign_off)])
+                raise RuntimeError
+        except RuntimeError:
+            pass
+
+        self.assertEqual(len(callbacks), 1)
+        for callback in callbacks:
+            callback()
+        [message] = self.received(self.signer)
+
+    def test_a_batch_sends_committed_messages_together_at_its_end(self):
+        sent = []
+        with mock.patch('workflows.notifications.dispatch', side_effect=sent.append):
+            with notification_batch():
+                with self.captureOnCommitCallbacks(execute=True):
+                    notify_workflow_participants(self.review, 'completed', self.reviewers[0])
+                self.assertEqual(sent, [])
+
+        [batch] = sent
+        groups = [group for group, message in batch if message['type'] == 'task_delta']
+        self.assertCountEqual(groups, [notification_group(user.id) for user in self.reviewers])
+        self.assertEqual(len([message for group, message in batch if message['type'] == 'notification_message']), 3)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class StepApproverTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.institution = Institution.objects.create(institution_owner=owner, institution_name='Baifam', created_by=owner)
+        category = WorkflowCategory.objects.create(code='product', label='Product')
+        action = WorkflowAction.objects.create(category=category, code='approve-product', label='Approve product')
+        cls.steps = [
+            InstitutionApprovalStep.objects.create(Institution=cls.institution, step_name=f'Step {level}', action=action, level=level)
+            for level in (1, 2)
+        ]
+        cls.roles = [Role.objects.create(name=f'Role {index}', description='-', institution=cls.institution) for index in range(2)]
+        for step, role in zip(cls.steps, cls.roles):
+            InstitutionApprovalStepApprovorRole.objects.create(step=step, approver_role=role)
+        cls.users = [CustomUser.objects.create_user(email=f'user{index}@example.com', fullname=f'User {index}') for index in range(3)]
+        cls.user_role = UserRole.objects.create(user=cls.users[0], role=cls.roles[0])
+        UserRole.objects.create(user=cls.users[1], role=cls.roles[1])
+        profile, _ = Profile.objects.update_or_create(user=cls.users[2], defaults={'institution': cls.institution})
+        cls.explicit = InstitutionApprovalStepApprovorUser.objects.create(step=cls.steps[0], approver_user=profile)
+        content_type = ContentType.objects.get_for_model(Institution)
+        cls.tasks = [
+            ApprovalTask.objects.create(step=step, content_type=content_type, object_id=cls.institution.id) for step in cls.steps
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_approvers_are_resolved_once_and_cached(self):
+        first, second = self.steps
+        with self.assertNumQueries(1):
+            approvers = step_approvers([first.id, second.id])
+        self.assertEqual(approvers, {first.id: {self.users[0].id, self.users[2].id}, second.id: {self.users[1].id}})
+
+        with self.assertNumQueries(0):
+            self.assertEqual(task_approvers(self.tasks[1]), {self.users[1].id})
+        with self.assertNumQueries(1):
+            self.assertEqual(workflow_approvers(self.tasks[0]), {user.id for user in self.users})
+
+    def test_role_changes_drop_the_cache(self):
+        first, second = self.steps
+        step_approvers([first.id, second.id])
+
+        UserRole.objects.create(user=self.users[2], role=self.roles[1])
+        self.assertEqual(task_approvers(self.tasks[1]), {self.users[1].id, self.users[2].id})
+
+        self.user_role.role = self.roles[1]
+        self.user_role.save()
+        self.assertEqual(task_approvers(self.tasks[0]), {self.users[2].id})
+        self.assertEqual(task_approvers(self.tasks[1]), {user.id for user in self.users})
+
+    def test_approver_row_changes_drop_the_cache(self):
+        first, second = self.steps
+        step_approvers([first.id, second.id])
+
+        self.explicit.delete()
+        self.assertEqual(task_approvers(self.tasks[0]), {self.users[0].id})
+
+        InstitutionApprovalStepApprovorRole.objects.create(step=second, approver_role=self.roles[0])
+        self.assertEqual(task_approvers(self.tasks[1]), {self.users[0].id, self.users[1].id})
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class TaskInboxTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        cls.institution = Institution.objects.create(institution_owner=owner, institution_name='Baifam', created_by=owner)
+        category = WorkflowCategory.objects.create(code='product', label='Product')
+        action = WorkflowAction.objects.create(category=category, code='approve-product', label='Approve product')
+        cls.review_step = InstitutionApprovalStep.objects.create(Institution=cls.institution, step_name='Review', action=action, level=1)
+        sign_off_step = InstitutionApprovalStep.objects.create(Institution=cls.institution, step_name='Sign off', action=action, level=2)
+
+        cls.role = Role.objects.create(name='Reviewer', description='-', institution=cls.institution)
+        cls.other_role = Role.objects.create(name='Auditor', description='-', institution=cls.institution)
+        cls.step_role = InstitutionApprovalStepApprovorRole.objects.create(step=cls.review_step, approver_role=cls.role)
+        cls.reviewer, cls.signer, cls.outsider = [
+            CustomUser.objects.create_user(email=f'{name}@example.com', fullname=name.title())
+            for name in ('reviewer', 'signer', 'outsider')
+        ]
+        cls.user_role = UserRole.objects.create(user=cls.reviewer, role=cls.role)
+        for user in (cls.reviewer, cls.signer, cls.outsider):
+            Profile.objects.update_or_create(user=user, defaults={'institution': cls.institution})
+        InstitutionApprovalStepApprovorUser.objects.create(step=sign_off_step, approver_user=cls.signer.profile)
+
+        content_type = ContentType.objects.get_for_model(Institution)
+        cls.reviews, cls.sign_offs = [], []
+        for object_id in range(cls.institution.id, cls.institution.id + 5):
+            cls.reviews.append(ApprovalTask.objects.create(
+                step=cls.review_step, content_type=content_type, object_id=object_id, status='pending'
+            ))
+            cls.sign_offs.append(ApprovalTask.objects.create(step=sign_off_step, content_type=content_type, object_id=object_id))
+
+    def setUp(self):
+        cache.clear()
+
+    def inbox(self, user):
+        return dict(TaskInboxEntry.objects.filter(user=user).values_list('task_id', 'status'))
+
+    def test_new_tasks_and_status_changes_reach_the_inbox(self):
+        self.assertEqual(self.inbox(self.reviewer), {task.id: 'pending' for task in self.reviews})
+        self.assertEqual(self.inbox(self.signer), {task.id: 'not_started' for task in self.sign_offs})
+        self.assertEqual(self.inbox(self.outsider), {})
+
+        with mock.patch.object(Institution, 'finish_workflow', create=True), self.captureOnCommitCallbacks(execute=True):
+            self.reviews[0].mark_rejected(self.reviewer)
+        self.assertEqual(self.inbox(self.reviewer)[self.reviews[0].id], 'rejected')
+        self.assertEqual(self.inbox(self.signer)[self.sign_offs[0].id], 'terminated')
+
+    def test_approver_changes_move_tasks_between_inboxes(self):
+        review_ids = {task.id for task in self.reviews}
+
+        user_role = UserRole.objects.create(user=self.outsider, role=self.role)
+        self.assertEqual(set(self.inbox(self.outsider)), review_ids)
+        user_role.delete()
+        self.assertEqual(self.inbox(self.outsider), {})
+
+        InstitutionApprovalStepApprovorUser.objects.create(step=self.review_step, approver_user=self.outsider.profile)
+        self.assertEqual(set(self.inbox(self.outsider)), review_ids)
+
+        self.user_role.role = self.other_role
+        self.user_role.save()
+        self.assertEqual(self.inbox(self.reviewer), {})
+
+        self.step_role.approver_role = self.other_role
+        self.step_role.save()
+        self.assertEqual(set(self.inbox(self.reviewer)), review_ids)
+        self.step_role.delete()
+        self.assertEqual(self.inbox(self.reviewer), {})
+
+    def test_rebuild_repairs_drifted_inboxes(self):
+        TaskInboxEntry.objects.filter(user=self.reviewer).delete()
+        TaskInboxEntry.objects.create(user=self.outsider, task=self.sign_offs[0], status='not_started')
+
+        self.assertEqual(sum(entries for _, entries in rebuild_task_inboxes()), 10)
+        self.assertEqual(set(self.inbox(self.reviewer)), {task.id for task in self.reviews})
+        self.assertEqual(self.inbox(self.outsider), {})
+
+    def get_inbox(self, user, **params):
+        request = APIRequestFactory().get('/task/inbox/', params)
+        force_authenticate(request, user)
+        with self.assertQueryBudget(views.TaskInboxAPIView):
+            return views.TaskInboxAPIView.as_view()(request)
+
+    def test_inbox_and_snapshot_are_served_under_the_workflow_api(self):
+        client = APIClient()
+        client.force_authenticate(self.reviewer)
+        self.assertEqual(reverse('task-inbox'), '/api/workflow/task/inbox/')
+        response = client.get(reverse('task-inbox'), {'status': 'pending'})
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertEqual(len(client.get(reverse('task-snapshot')).data['tasks']), 5)
+
+    def test_inbox_pages_newest_first_and_filters_by_status(self):
+        ApprovalTask.objects.filter(pk=self.reviews[4].pk).update(status='completed')
+        TaskInboxEntry.objects.filter(task=self.reviews[4]).update(status='completed')
+
+        first = self.get_inbox(self.reviewer, status='pending,not_started', page_size=3)
+        self.assertEqual([task['id'] for task in first.data['results']], [task.id for task in self.reviews[3::-1][:3]])
+        cursor = parse_qs(urlparse(first.data['next']).query)['cursor'][0]
+        second = self.get_inbox(self.reviewer, status='pending,not_started', page_size=3, cursor=cursor)
+        self.assertEqual([task['id'] for task in second.data['results']], [self.reviews[0].id])
+        self.assertIsNone(second.data['next'])
+
+        completed = self.get_inbox(self.reviewer, status='completed')
+        self.assertEqual([task['id'] for task in completed.data['results']], [self.reviews[4].id])
+        self.assertEqual(len(self.get_inbox(self.signer).data['results']), 5)
+        self.assertEqual(self.get_inbox(self.outsider).data['results'], [])
+
+        request = APIRequestFactory().get('/task/inbox/', {'status': 'pending,approved'})
+        force_authenticate(request, self.reviewer)
+        response = views.TaskInboxAPIView.as_view()(request)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'detail': 'Unknown status: approved'})
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    NOTIFICATION_HEARTBEAT_SECONDS=60,
+)
+class NotificationConsumerTests(TransactionTestCase):
+    # database_sync_to_async closes connections, which TestCase's wrapping transaction cannot survive
+    application = TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    def setUp(self):
+        cache.clear()
+        owner = CustomUser.objects.create_user(email='owner@example.com', fullname='Owner')
+        institution = Institution.objects.create(institution_owner=owner, institution_name='Baifam', created_by=owner)
+        category = WorkflowCategory.objects.create(code='product', label='Product')
+        action = WorkflowAction.objects.create(category=category, code='approve-product', label='Approve product')
+        step = InstitutionApprovalStep.objects.create(Institution=institution, step_name='Review', action=action, level=1)
+        role = Role.objects.create(name='Reviewer', description='-', institution=institution)
+        InstitutionApprovalStepApprovorRole.objects.create(step=step, approver_role=role)
+        self.approver = CustomUser.objects.create_user(email='approver@example.com', fullname='Approver')
+        UserRole.objects.create(user=self.approver, role=role)
+        self.task = ApprovalTask.objects.create(
+            step=step, content_type=ContentType.objects.get_for_model(Institution), object_id=institution.id, status='pending'
+        )
+
+    def communicator(self, user=None):
+        path = 'api/ws/notifications/'
+        if user is not None:
+            path += f'?token={AccessToken.for_user(user)}'
+        return WebsocketCommunicator(self.application, path)
+
+    async def connect(self, user):
+        communicator = self.communicator(user)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator, await communicator.receive_json_from()
+
+    def test_rejects_connections_without_a_valid_token(self):
+        async def scenario():
+            for communicator in [self.communicator(), WebsocketCommunicator(self.application, 'api/ws/notifications/?token=junk')]:
+                connected, _ = await communicator.connect()
+                self.assertFalse(connected)
+        async_to_sync(scenario)()
+
+    def test_snapshot_then_deltas(self):
+        async def scenario():
+            communicator, snapshot = await self.connect(self.approver)
+            self.assertEqual(snapshot['type'], 'tasks_snapshot')
+            self.assertEqual([task['id'] for task in snapshot['tasks']], [self.task.id])
+
+            await database_sync_to_async(push_task_deltas)([(TASK_STATUS_CHANGED, self.task)])
+            delta = await communicator.receive_json_from()
+            self.assertEqual(delta['type'], 'task_delta')
+            self.assertEqual(delta['sequence'], snapshot['sequence'] + 1)
+            self.assertEqual(delta['deltas'][0]['task_id'], self.task.id)
+
+            await communicator.send_json_to({'type': 'fetch_tasks'})
+            refreshed = await communicator.receive_json_from()
+            self.assertEqual((refreshed['type'], refreshed['sequence']), ('tasks_snapshot', delta['sequence']))
+            await communicator.disconnect()
+        async_to_sync(scenario)()
+
+    def test_unpacks_a_batch_in_order(self):
+        def notify():
+            with notification_batch():
+                notify_task_update(self.task)
+
+        async def scenario():
+            communicator, snapshot = await self.connect(self.approver)
+            await database_sync_to_async(notify)()
+            notification = await communicator.receive_json_from()
+            self.assertEqual((notification['type'], notification['task_id']), ('notification', self.task.id))
+            delta = await communicator.receive_json_from()
+            self.assertEqual((delta['type'], delta['sequence']), ('task_delta', snapshot['sequence'] + 1))
+            await communicator.disconnect()
+        async_to_sync(scenario)()
+
+    def test_ping_and_heartbeat(self):
+        async def scenario():
+            communicator, _ = await self.connect(self.approver)
+            await communicator.send_json_to({'type': 'ping'})
+            self.assertEqual(await communicator.receive_json_from(), {'type': 'pong'})
+            await communicator.send_to(text_data='not json')
+            self.assertEqual((await communicator.receive_json_from())['type'], 'error')
+            await communicator.disconnect()
+
+            with self.settings(NOTIFICATION_HEARTBEAT_SECONDS=0.01):
+                communicator, _ = await self.connect(self.approver)
+                self.assertEqual(await communicator.receive_json_from(), {'type': 'heartbeat'})
+                await communicator.disconnect()
+        async_to_sync(scenario)()
@@ -3,6 +3,8 @@ from django.urls import path
 from workflows.views import (
     ApproveTaskAPIView,
     ApproveTaskDetailAPIView,
+    TaskInboxAPIView,
+    TaskSnapshotAPIView,
     InstitutionApprovalStepReorderAPIView,
     WorkflowActionAPIView,
     InstitutionApprovalStepAPIView,
@@ -10,6 +12,8 @@ from workflows.views import (
 
 urlpatterns = [
     path("task/", ApproveTaskAPIView.as_view(), name="task"),
+    path("task/inbox/", TaskInboxAPIView.as_view(), name="task-inbox"),
+    path("task/snapshot/", TaskSnapshotAPIView.as_view(), name="task-snapshot"),
     path("task/<int:task_id>/status/", ApproveTaskDetailAPIView.as_view(), name="update-task-status"),
     path(
         "Institution-approval-step/<int:Institution_id>/",
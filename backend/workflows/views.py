@@ -1,6 +1,6 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status, permissions
+from rest_framework import serializers, status, permissions
 from general.serializers import MessageResponseSerializer
 from users.models import Profile, UserRole
 from users.serializers import CustomUserSerializer
@@ -10,12 +10,14 @@ from workflows.models import (
     InstitutionApprovalStepApprovorRole,
     WorkflowAction,
     InstitutionApprovalStepApprovorUser,
+    TaskInboxEntry,
 )
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
 from django.db import transaction
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import OpenApiParameter, extend_schema, inline_serializer
 
+from utilities.pagination import KeysetPagination
+from workflows.inbox import inbox_tasks
 from workflows.request_serializers import ApprovalTaskStatusUpdateSerializer
 from workflows.serializers import (
     InstitutionApprovalStepSerializer,
@@ -27,6 +29,8 @@ channel_layer = get_channel_layer()
 
 
 class ApproveTaskAPIView(APIView):
+    # Loading the objects under approval takes a query per kind of object
+    query_budget = {'GET': 10}
     @extend_schema(
         responses={200: ApprovalTaskSerializer(many=True)},
         description="This lets authenticated user view all tasks assigned to his role.",
@@ -34,20 +38,74 @@ class ApproveTaskAPIView(APIView):
         tags=["WorkFlows"],
     )
     def get(self, request):
-        user = request.user
-        user_roles = user.user_roles.values_list("role_id", flat=True)
-
-        tasks = ApprovalTask.objects.filter(
-            # 1) any step whose through‐model row’s approver_role is in my user_roles
-            Q(step__roles__approver_role__id__in=user_roles)
-            |
-            # 2) OR tasks where I’m explicitly the approver
-            Q(step__approver__approver_user__user__id=user.id)
-        ).distinct()  # collapse duplicate joins back into unique tasks
+        tasks = ApprovalTaskSerializer.setup_eager_loading(inbox_tasks(request.user))
         serializer = ApprovalTaskSerializer(tasks, many=True)
         return Response(serializer.data)
 
 
+class TaskInboxAPIView(APIView):
+    # The page of inbox entries, then the tasks as ApproveTaskAPIView loads them
+    query_budget = {'GET': 11}
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="status", required=False, type=str, location=OpenApiParameter.QUERY,
+                description="Comma separated statuses to list, e.g. `pending,not_started`. All by default.",
+            ),
+            OpenApiParameter(name="cursor", required=False, type=str, location=OpenApiParameter.QUERY),
+            OpenApiParameter(name="page_size", required=False, type=int, location=OpenApiParameter.QUERY),
+        ],
+        responses={200: ApprovalTaskSerializer(many=True)},
+        description="This lets authenticated user page through the tasks assigned to them, newest first.",
+        summary="Page self tasks",
+        tags=["WorkFlows"],
+    )
+    def get(self, request):
+        statuses = [value for value in request.query_params.get("status", "").split(",") if value]
+        unknown = set(statuses) - {choice for choice, _ in ApprovalTask.STATUS_CHOICES}
+        if unknown:
+            return Response(
+                {"detail": f"Unknown status: {', '.join(sorted(unknown))}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        entries = TaskInboxEntry.objects.filter(user=request.user).only("task")
+        if statuses:
+            entries = entries.filter(status__in=statuses)
+        paginator = KeysetPagination(ordering=('-task_id',))
+        page = paginator.paginate_queryset(entries, request)
+        tasks = ApprovalTaskSerializer.setup_eager_loading(
+            ApprovalTask.objects.filter(pk__in=[entry.task_id for entry in page])
+        )
+        tasks = {task.pk: task for task in tasks}
+        # A task deleted since its entry was read is left out
+        serializer = ApprovalTaskSerializer(
+            [tasks[entry.task_id] for entry in page if entry.task_id in tasks], many=True
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+
+class TaskSnapshotAPIView(APIView):
+    @extend_schema(
+        description=(
+            "The authenticated user's whole task inbox with the sequence number of the last task delta it includes. "
+            "Clients fetch it when the deltas pushed over the notification socket skip a sequence number."
+        ),
+        responses={200: inline_serializer(
+            name="TaskSnapshot",
+            fields={
+                "sequence": serializers.IntegerField(),
+                "tasks": ApprovalTaskSerializer(many=True),
+            },
+        )},
+        summary="Snapshot of self tasks",
+        tags=["WorkFlows"],
+    )
+    def get(self, request):
+        from workflows.notifications import task_snapshot
+
+        return Response(task_snapshot(request.user))
+
+
 class ApproveTaskDetailAPIView(APIView):
     @extend_schema(
         request=ApprovalTaskStatusUpdateSerializer,
@@ -133,6 +191,7 @@ class ApproveTaskDetailAPIView(APIView):
 
 
 class WorkflowActionAPIView(APIView):
+    query_budget = {'GET': 2}
     @extend_schema(
         responses={200: WorkflowActionSerializer(many=True)},
         description="This lets someone view all possible worflow actions they can set.",
@@ -140,12 +199,13 @@ class WorkflowActionAPIView(APIView):
         tags=["WorkFlows"],
     )
     def get(self, request):
-        workflow_actions = WorkflowAction.objects.all()
+        workflow_actions = WorkflowAction.objects.select_related("category")
         serializer = WorkflowActionSerializer(workflow_actions, many=True)
         return Response(serializer.data)
 
 
 class InstitutionApprovalStepAPIView(APIView):
+    query_budget = {'GET': 7}
     @extend_schema(
         responses={200: InstitutionApprovalStepSerializer(many=True)},
         description="This lets someone view all possible approvals a Institution has structured.",
@@ -154,14 +214,14 @@ class InstitutionApprovalStepAPIView(APIView):
     )
     def get(self, request, Institution_id):
         step_id = request.query_params.get("step", None)
+        Institution_approval_steps = InstitutionApprovalStepSerializer.setup_eager_loading(
+            InstitutionApprovalStep.objects.filter(Institution__id=Institution_id)
+        )
         if step_id:
-            single_Institution_approval_step = InstitutionApprovalStep.objects.filter(
-                id=step_id, Institution__id=Institution_id
-            ).first()
+            single_Institution_approval_step = Institution_approval_steps.filter(id=step_id).first()
             serializer = InstitutionApprovalStepSerializer(single_Institution_approval_step)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
-        Institution_approval_steps = InstitutionApprovalStep.objects.filter(Institution__id=Institution_id)
         serializer = InstitutionApprovalStepSerializer(Institution_approval_steps, many=True)
         return Response(serializer.data)
 
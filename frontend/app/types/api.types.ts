@@ -251,6 +251,12 @@ export interface IPaginatedResponse<T> {
   results: T[];
 }
 
+export interface ICursorPaginatedResponse<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+}
+
 export interface IResponse<T> {
   status: string;
   message: string;
@@ -373,6 +379,7 @@ export interface ICallGroup {
   description: string;
   created_by: number | null;
   institution: IUserInstitution;
+  contact_counts: Record<string, number>;
   created_at: string;
   updated_at: string;
 }
@@ -10,6 +10,7 @@ import {
   IContactFormData,
   IContactStatus,
   IPaginatedResponse,
+  ICursorPaginatedResponse,
   IUser,
   IUserProfile,
   ICallGroupContact,
@@ -30,6 +31,22 @@ type IContactCreationData = {
   status: string;
 };
 
+// Largest page the cursor paginated endpoints serve
+const MAX_PAGE_SIZE = 100;
+
+// Follows the cursor of a keyset paginated list until the last page
+const getAllPages = async <T>(url: string): Promise<T[]> => {
+  const results: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const response = await apiRequest.get(url, { params: { page_size: MAX_PAGE_SIZE, ...(cursor ? { cursor } : {}) } });
+    const page = response.data as ICursorPaginatedResponse<T>;
+    results.push(...page.results);
+    cursor = page.next ? new URL(page.next).searchParams.get("cursor") : null;
+  } while (cursor);
+  return results;
+};
+
 export const callsAPI = {
   getCallDetails: async ({ callUuid }: { callUuid: string }) => {
     try {
@@ -43,8 +60,7 @@ export const callsAPI = {
 
   getByInstitution: async ({ institutionId }: { institutionId: number }) => {
     try {
-      const response = await apiRequest.get(`call/institution/${institutionId}/`);
-      return response.data as ICall[];
+      return await getAllPages<ICall>(`call/institution/${institutionId}/`);
     } catch (error) {
       console.error("Error fetching calls by institution:", error);
       throw error;
@@ -215,8 +231,7 @@ export const contactsAPI = {
 
   getContactsByInstitution: async ({ institutionId }: { institutionId: number }) => {
     try {
-      const response = await apiRequest.get(`call/contacts/institution/${institutionId}/`);
-      return response.data as IContact[];
+      return await getAllPages<IContact>(`call/contacts/institution/${institutionId}/`);
     } catch (error) {
       console.error("Error fetching contacts by institution:", error);
       throw error;
@@ -374,8 +389,7 @@ export const contactsAPI = {
 
   getCallGroupContactsByInstitution: async ({ institutionId }: { institutionId: number }) => {
     try {
-      const response = await apiRequest.get(`call/group-contacts/${institutionId}/`)
-      return response as ICallGroupContact[]
+      return await getAllPages<ICallGroupContact>(`call/group-contacts/${institutionId}/`)
     } catch (error) {
       throw error
     }
@@ -611,8 +625,7 @@ export const callGroupAPI = {
 
   getContacts: async ({ callGroupUuid }: { callGroupUuid: string }) => {
     try {
-      const response = await apiRequest.get(`/call/groups/contacts/${callGroupUuid}/`);
-      return response.data as ICallGroupContact[];
+      return await getAllPages<ICallGroupContact>(`/call/groups/contacts/${callGroupUuid}/`);
     } catch (error) {
       console.error("Error fetching CallGroup details:", error);
       throw error;